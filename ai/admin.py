@@ -0,0 +1,87 @@
+from django.contrib import admin
+
+from .models import (
+    BackcardCacheEntry,
+    GenerationJob,
+    LLMUsage,
+    LLMUsageDaily,
+    TopicCacheEntry,
+)
+
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "user", "status", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("created_at", "updated_at", "started_at", "finished_at")
+
+
+@admin.register(BackcardCacheEntry)
+class BackcardCacheEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        "front_card",
+        "source_language",
+        "target_language",
+        "model_name",
+        "hits",
+        "expires_at",
+    )
+    list_filter = ("source_language", "target_language", "model_name")
+    search_fields = ("front_card",)
+    readonly_fields = ("key", "prompt_hash", "created_at", "updated_at")
+
+
+@admin.register(TopicCacheEntry)
+class TopicCacheEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        "topic",
+        "source_language",
+        "target_language",
+        "model_name",
+        "hits",
+        "expires_at",
+    )
+    list_filter = ("source_language", "target_language", "model_name")
+    search_fields = ("topic",)
+    readonly_fields = ("key", "prompt_hash", "created_at", "updated_at")
+
+
+@admin.register(LLMUsage)
+class LLMUsageAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "endpoint",
+        "user",
+        "backend",
+        "model_name",
+        "outcome",
+        "cache_hit",
+        "duration_ms",
+        "ttft_ms",
+        "prompt_tokens",
+        "completion_tokens",
+        "cost",
+    )
+    list_filter = ("endpoint", "backend", "model_name", "outcome", "cache_hit")
+    date_hierarchy = "created_at"
+    raw_id_fields = ("user",)
+
+
+@admin.register(LLMUsageDaily)
+class LLMUsageDailyAdmin(admin.ModelAdmin):
+    list_display = (
+        "date",
+        "endpoint",
+        "user",
+        "backend",
+        "model_name",
+        "calls",
+        "errors",
+        "cache_hits",
+        "prompt_tokens",
+        "completion_tokens",
+        "cost",
+    )
+    list_filter = ("endpoint", "backend", "model_name")
+    date_hierarchy = "date"
+    raw_id_fields = ("user",)
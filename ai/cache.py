@@ -0,0 +1,442 @@
+"""
+Caching of generated backcards and topic cards.
+
+Most backcard requests are for common words in a handful of language pairs,
+and the answer does not depend on who asks. Results are cached in two tiers:
+
+- an in-process LRU, answering repeated words without any I/O;
+- the ``BackcardCacheEntry`` table, shared by every worker and user.
+
+The key is a hash of the normalized word or phrase, both languages, the model
+name and a hash of the prompt, so changing the prompt or the model starts
+from an empty cache without any explicit flush. Callers that route requests
+to several models pass the model that answered, so an answer is only served
+for the model it came from. ``purge`` removes expired entries and those left
+behind by an older prompt or model.
+
+Topic cards are cached as a pool per normalized topic in the
+``TopicCacheEntry`` table (see ``TopicCache``). A request is served from a
+pool with at least as many cards, as a shuffled sample, so smaller requests
+for a topic cost nothing once a larger one has been made; topics that are
+only spelled differently ("Food", "foods", "Food & drinks") find each other
+by the similarity of their character trigrams.
+"""
+
+import collections
+import datetime
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+import unicodedata
+
+from django.db import DatabaseError
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import BackcardCacheEntry, TopicCacheEntry
+from .schemas import BackcardResponse, TopicCard, TopicGenerationResponse
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[\W_]+")
+# Left out of topics, so "food and drinks" matches "food & drinks"
+_TOPIC_STOP_WORDS = {"a", "an", "and", "for", "in", "of", "the", "to", "with"}
+
+
+def normalize_text(text):
+    """Normalize user input so trivially different spellings share a cache entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode()).hexdigest()[:16]
+
+
+class BackcardCache:
+    """
+    Two-tier cache of ``BackcardResponse`` objects.
+
+    Args:
+        model_name (str): Model the cached responses were generated with,
+            unless a call names another one.
+        prompt (str): System prompt the cached responses were generated with.
+        max_entries (int): Size of the in-process LRU tier.
+        ttl (timedelta): How long an entry stays valid.
+        model_names (set): Every model entries are generated with, kept by
+            ``purge``; defaults to ``model_name``.
+    """
+
+    def __init__(
+        self, model_name, prompt, max_entries=2048, ttl=None, model_names=None
+    ):
+        self.model_name = model_name or ""
+        self.model_names = set(model_names or [self.model_name])
+        self.prompt_hash = prompt_hash(prompt)
+        self.max_entries = max_entries
+        self.ttl = ttl or datetime.timedelta(days=30)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_db = 0
+        self.misses = 0
+
+    def key(self, front_card, source_language, target_language, model_name=None):
+        raw = "\x1f".join(
+            [
+                normalize_text(front_card),
+                source_language.upper(),
+                target_language.upper(),
+                model_name or self.model_name,
+                self.prompt_hash,
+            ]
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key, response, expires_at):
+        with self._lock:
+            self._entries[key] = (response, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(
+        self,
+        front_card,
+        source_language,
+        target_language,
+        stale=False,
+        model_name=None,
+    ):
+        """
+        Return the cached response, or None on a miss.
+
+        With ``stale``, expired entries that have not been purged yet are
+        returned too, for when no fresh answer can be generated.
+        """
+        key = self.key(front_card, source_language, target_language, model_name)
+        now = timezone.now()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and (stale or cached[1] > now):
+                self._entries.move_to_end(key)
+                self.hits_memory += 1
+                return cached[0]
+
+        entries = BackcardCacheEntry.objects.filter(key=key)
+        if not stale:
+            entries = entries.filter(expires_at__gt=now)
+        entry = entries.only("response", "expires_at").first()
+        if entry is None:
+            self._count("misses")
+            return None
+
+        try:
+            BackcardCacheEntry.objects.filter(pk=entry.pk).update(hits=F("hits") + 1)
+        except DatabaseError:
+            logger.warning("Could not count a backcard cache hit", exc_info=True)
+        response = BackcardResponse.model_validate(entry.response)
+        self._remember(key, response, entry.expires_at)
+        self._count("hits_db")
+        return response
+
+    def set(
+        self, front_card, source_language, target_language, response, model_name=None
+    ):
+        """
+        Store a freshly generated response in both tiers, under the model
+        that generated it.
+
+        A failed database write is logged and otherwise ignored, so a busy
+        database never costs the caller a response it already has.
+        """
+        model_name = model_name or self.model_name
+        key = self.key(front_card, source_language, target_language, model_name)
+        expires_at = timezone.now() + self.ttl
+        try:
+            BackcardCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "model_name": model_name,
+                    "prompt_hash": self.prompt_hash,
+                    "front_card": normalize_text(front_card)[:255],
+                    "source_language": source_language,
+                    "target_language": target_language,
+                    "response": response.model_dump(exclude_none=True),
+                    "expires_at": expires_at,
+                },
+            )
+        except DatabaseError:
+            logger.warning("Could not store a backcard cache entry", exc_info=True)
+        self._remember(key, response, expires_at)
+
+    def invalidate(self, front_card, source_language, target_language, model_name=None):
+        """Drop one entry from both tiers."""
+        key = self.key(front_card, source_language, target_language, model_name)
+        with self._lock:
+            self._entries.pop(key, None)
+        BackcardCacheEntry.objects.filter(key=key).delete()
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+
+    def purge(self):
+        """
+        Delete expired entries and entries made with another model or prompt.
+
+        Returns:
+            int: The number of deleted entries.
+        """
+        deleted, _ = BackcardCacheEntry.objects.filter(
+            Q(expires_at__lte=timezone.now())
+            | ~Q(model_name__in=self.model_names)
+            | ~Q(prompt_hash=self.prompt_hash)
+        ).delete()
+        self.clear_memory()
+        return deleted
+
+    def stats(self):
+        """Return hit and miss counters of this process."""
+        with self._lock:
+            lookups = self.hits_memory + self.hits_db + self.misses
+            return {
+                "hits_memory": self.hits_memory,
+                "hits_db": self.hits_db,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits_memory + self.hits_db) / lookups if lookups else 0.0
+                ),
+                "memory_entries": len(self._entries),
+            }
+
+
+def normalize_topic(topic):
+    """
+    Normalize a topic so that spelling variants share a cache entry.
+
+    Punctuation and a few English stop words are dropped, and a plural ``s``
+    is taken off each word: "Foods & Drinks" becomes "food drink".
+    """
+    words = []
+    for word in _NON_WORD.sub(" ", normalize_text(topic)).split():
+        if word in _TOPIC_STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def trigrams(text):
+    """Character trigrams of each word of ``text``, padded with spaces."""
+    grams = collections.Counter()
+    for word in text.split():
+        padded = f" {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a, b):
+    """Cosine similarity of the trigram counts of two normalized topics."""
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    dot = sum(count * grams_b[gram] for gram, count in grams_a.items())
+    if not dot:
+        return 0.0
+    norm_a = math.sqrt(sum(count * count for count in grams_a.values()))
+    norm_b = math.sqrt(sum(count * count for count in grams_b.values()))
+    return dot / (norm_a * norm_b)
+
+
+class TopicCache:
+    """
+    Cache of topic card pools, with a lookup of similar topics.
+
+    Args:
+        model_name (str): Model the cached cards were generated with,
+            unless a call names another one.
+        prompt (str): System prompt the cached cards were generated with.
+        ttl (timedelta): How long a pool stays valid.
+        min_similarity (float): Similarity from which another cached topic
+                                counts as the same; above 1 turns the lookup
+                                off.
+        candidates (int): Most recent pools of the language pair compared
+                          with a topic that has no pool of its own.
+        model_names (set): Every model pools are generated with, kept by
+            ``purge``; defaults to ``model_name``.
+    """
+
+    def __init__(
+        self,
+        model_name,
+        prompt,
+        ttl=None,
+        min_similarity=0.65,
+        candidates=1000,
+        model_names=None,
+    ):
+        self.model_name = model_name or ""
+        self.model_names = set(model_names or [self.model_name])
+        self.prompt_hash = prompt_hash(prompt)
+        self.ttl = ttl or datetime.timedelta(days=30)
+        self.min_similarity = min_similarity
+        self.candidates = candidates
+        self._lock = threading.Lock()
+        self.hits_exact = 0
+        self.hits_similar = 0
+        self.misses = 0
+
+    def key(self, topic, source_language, target_language, model_name=None):
+        raw = "\x1f".join(
+            [
+                normalize_topic(topic),
+                source_language.upper(),
+                target_language.upper(),
+                model_name or self.model_name,
+                self.prompt_hash,
+            ]
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _entries(self, source_language, target_language, model_name=None):
+        return TopicCacheEntry.objects.filter(
+            source_language=source_language,
+            target_language=target_language,
+            model_name=model_name or self.model_name,
+            prompt_hash=self.prompt_hash,
+            expires_at__gt=timezone.now(),
+        )
+
+    def _similar(self, topic, source_language, target_language, model_name=None):
+        """Return the pool whose topic is most similar to ``topic``, or None."""
+        if self.min_similarity > 1:
+            return None
+        normalized = normalize_topic(topic)
+        entries = self._entries(source_language, target_language, model_name)
+        best, best_score = None, self.min_similarity
+        for pk, candidate in entries.order_by("-updated_at").values_list("pk", "topic")[
+            : self.candidates
+        ]:
+            score = similarity(normalized, candidate)
+            if score >= best_score:
+                best, best_score = pk, score
+        if best is None:
+            return None
+        return entries.filter(pk=best).only("cards").first()
+
+    def get(
+        self,
+        topic,
+        source_language,
+        target_language,
+        count,
+        exclude=(),
+        model_name=None,
+    ):
+        """
+        Return ``count`` cards for ``topic`` from a cached pool, or None.
+
+        The topic's own pool is looked up first, then the pool of the most
+        similar cached topic, among the pools of ``model_name``. Cards whose
+        normalized front is in ``exclude`` are left out, and pools with fewer
+        than ``count`` other cards are not used.
+        """
+        entries = self._entries(source_language, target_language, model_name)
+        key = self.key(topic, source_language, target_language, model_name)
+        entry = entries.filter(key=key).only("cards").first()
+        counter = "hits_exact"
+        if entry is None:
+            entry = self._similar(topic, source_language, target_language, model_name)
+            counter = "hits_similar"
+        pool = [
+            card
+            for card in (entry.cards if entry else [])
+            if normalize_text(card["front"]) not in exclude
+        ]
+        if len(pool) < count:
+            self._count("misses")
+            return None
+
+        try:
+            TopicCacheEntry.objects.filter(pk=entry.pk).update(hits=F("hits") + 1)
+        except DatabaseError:
+            logger.warning("Could not count a topic cache hit", exc_info=True)
+        self._count(counter)
+        return TopicGenerationResponse(
+            cards=[
+                TopicCard.model_validate(card) for card in random.sample(pool, count)
+            ]
+        )
+
+    def set(self, topic, source_language, target_language, response, model_name=None):
+        """
+        Add freshly generated cards to the pool of ``topic`` kept for the
+        model that generated them.
+
+        Cards whose normalized front is in the pool already are not added
+        again. A failed database write is logged and otherwise ignored.
+        """
+        model_name = model_name or self.model_name
+        key = self.key(topic, source_language, target_language, model_name)
+        try:
+            entry = TopicCacheEntry.objects.filter(key=key).only("cards").first()
+            cards = entry.cards if entry else []
+            seen = {normalize_text(card["front"]) for card in cards}
+            for card in response.cards:
+                front = normalize_text(card.front)
+                if front and front not in seen:
+                    seen.add(front)
+                    cards.append(card.model_dump(exclude_none=True))
+            TopicCacheEntry.objects.update_or_create(
+                key=key,
+                defaults={
+                    "model_name": model_name,
+                    "prompt_hash": self.prompt_hash,
+                    "topic": normalize_topic(topic)[:255],
+                    "source_language": source_language,
+                    "target_language": target_language,
+                    "cards": cards,
+                    "expires_at": timezone.now() + self.ttl,
+                },
+            )
+        except DatabaseError:
+            logger.warning("Could not store a topic cache entry", exc_info=True)
+
+    def purge(self):
+        """
+        Delete expired pools and pools made with another model or prompt.
+
+        Returns:
+            int: The number of deleted pools.
+        """
+        deleted, _ = TopicCacheEntry.objects.filter(
+            Q(expires_at__lte=timezone.now())
+            | ~Q(model_name__in=self.model_names)
+            | ~Q(prompt_hash=self.prompt_hash)
+        ).delete()
+        return deleted
+
+    def stats(self):
+        """Return hit and miss counters of this process."""
+        with self._lock:
+            lookups = self.hits_exact + self.hits_similar + self.misses
+            return {
+                "hits_exact": self.hits_exact,
+                "hits_similar": self.hits_similar,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits_exact + self.hits_similar) / lookups if lookups else 0.0
+                ),
+            }
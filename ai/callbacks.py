@@ -0,0 +1,88 @@
+"""
+LangChain callbacks of the chat model clients, see ai.usage.
+"""
+
+import asyncio
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .models import LLMUsage
+from .usage import usage_recorder
+
+
+def token_usage(response):
+    """Return the prompt and completion tokens reported in an ``LLMResult``."""
+    for generations in response.generations:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class _Call:
+    __slots__ = ("first_token", "model_name", "started")
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.started = time.monotonic()
+        self.first_token = None
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Measure each chat model call and queue its usage record.
+
+    Runs inline, in the thread or task making the call, so the usage scope of
+    the caller applies; it only reads the clock and appends to a queue.
+    """
+
+    run_inline = True
+
+    def __init__(self, recorder=usage_recorder, backend=""):
+        self.recorder = recorder
+        self.backend = backend
+        self._calls = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        self._calls[run_id] = _Call(
+            params.get("model_name") or params.get("model") or ""
+        )
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        call = self._calls.get(run_id)
+        if call is not None and call.first_token is None:
+            call.first_token = time.monotonic()
+
+    def _finish(self, run_id, outcome, prompt_tokens=0, completion_tokens=0):
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        now = time.monotonic()
+        self.recorder.record(
+            call.model_name,
+            outcome=outcome,
+            duration_ms=(now - call.started) * 1000,
+            ttft_ms=(
+                None
+                if call.first_token is None
+                else (call.first_token - call.started) * 1000
+            ),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            backend=self.backend,
+        )
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, LLMUsage.OUTCOME_SUCCESS, *token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        if isinstance(error, (GeneratorExit, asyncio.CancelledError)):
+            outcome = LLMUsage.OUTCOME_CANCELLED
+        else:
+            outcome = LLMUsage.OUTCOME_ERROR
+        self._finish(run_id, outcome)
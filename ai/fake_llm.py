@@ -0,0 +1,463 @@
+"""
+A stand-in for the OpenAI chat model, for load tests and local development.
+
+``FakeChatModel`` answers the structured-output and streaming calls the
+usecases make with deterministic, schema-valid content derived from the
+prompt, so the same request always gets the same cards. Only the latency and
+the injected errors are random. Select it with ``AI_LLM_BACKEND=fake`` (see
+ai.settings).
+
+``make_server`` (``python manage.py run_fake_llm_server``) serves the same
+answers over an OpenAI-compatible ``/v1/chat/completions`` endpoint. Point
+the regular backend at it with ``OPENAI_BASE_URL`` to also exercise the
+OpenAI client and its HTTP connections.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from ai.resilience import TransientProviderError
+from ai.schemas import BackcardResponse, BatchBackcardResponse, TopicGenerationResponse
+
+SCHEMAS = {
+    schema.__name__: schema
+    for schema in (BackcardResponse, BatchBackcardResponse, TopicGenerationResponse)
+}
+
+# Rough size of a token, used for streaming pace and usage counts
+CHARS_PER_TOKEN = 4
+
+
+class FakeLLMError(TransientProviderError):
+    """An error injected by the fake model."""
+
+
+class FakeLLMTimeout(FakeLLMError):
+    """The fake model took longer than its timeout."""
+
+
+def _find(pattern, text, default=""):
+    match = re.search(pattern, text, re.DOTALL)
+    return match.group(1) if match else default
+
+
+def _backcard(word, source_language, target_language):
+    return {
+        "translation": f"{word} ({target_language})",
+        "definition": f"Definition of {word} ({source_language})",
+        "example_sentences": f"An example sentence with {word}.",
+        "example_sentences_translated": f"({target_language}) An example sentence with {word}.",
+        "pronunciation": f"/{word.lower()}/",
+    }
+
+
+def fake_answer(schema_name, prompt):
+    """
+    Answer a user message of the usecases with the given output schema.
+
+    Args:
+        schema_name (str): Name of a schema in ``SCHEMAS``.
+        prompt (str): The user message, as built by the usecase.
+
+    Returns:
+        dict: Arguments of the tool call, valid for the schema.
+    """
+    source_language = _find(r"source_language:(\w+)", prompt)
+    target_language = _find(r"target_language:(\w+)", prompt)
+    if schema_name == BackcardResponse.__name__:
+        word = _find(r"front_card:```(.*?)```", prompt)
+        answer = _backcard(word, source_language, target_language)
+    elif schema_name == BatchBackcardResponse.__name__:
+        answer = {
+            "backcards": [
+                {
+                    "word_or_phrase": word,
+                    **_backcard(word, source_language, target_language),
+                }
+                for word in re.findall(r"^\d+\. ```(.*?)```$", prompt, re.MULTILINE)
+            ]
+        }
+    elif schema_name == TopicGenerationResponse.__name__:
+        topic = _find(r"topic:```(.*?)```", prompt)
+        count = int(_find(r"count:(\d+)", prompt, "10"))
+        # Shards of a large request get different focuses and so different cards
+        focus = _find(r"focus:```(.*?)```", prompt)
+        prefix = hashlib.sha1(focus.encode()).hexdigest()[:4] + "-" if focus else ""
+        answer = {"cards": []}
+        for i in range(1, count + 1):
+            front = f"{topic} {prefix}{i}"
+            answer["cards"].append(
+                {
+                    "front": front,
+                    "back": f"{front} ({target_language})",
+                    "pronunciation": f"/{front.lower()}/",
+                    "definition": f"Definition of {front} ({source_language})",
+                    "example_sentence": f"An example sentence with {front}.",
+                    "example_sentence_translated": f"({target_language}) An example sentence with {front}.",
+                }
+            )
+    else:
+        raise ValueError(f"The fake model cannot answer with {schema_name}")
+    return SCHEMAS[schema_name].model_validate(answer).model_dump(exclude_none=True)
+
+
+def _pieces(text):
+    return [text[i : i + CHARS_PER_TOKEN] for i in range(0, len(text), CHARS_PER_TOKEN)]
+
+
+def _tokens(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers tool calls with ``fake_answer``.
+
+    Args:
+        latency (float): Median seconds before the first token.
+        latency_sigma (float): Spread of a log-normal latency distribution
+                               around the median; 0 for a constant latency.
+        tokens_per_second (float): Pace at which the answer is produced after
+                                   the first token; 0 for all at once.
+        error_rate (float): Share of calls that raise ``FakeLLMError``.
+        timeout (float): Seconds after which a call whose first token has not
+                         come yet raises ``FakeLLMTimeout``; None to wait.
+        seed (int): Seed of the latency and error draws.
+    """
+
+    model_name: str = "fake"
+    latency: float = 0.5
+    latency_sigma: float = 0.0
+    tokens_per_second: float = 0.0
+    error_rate: float = 0.0
+    timeout: float | None = None
+    seed: int | None = None
+
+    _random: random.Random = PrivateAttr()
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self):
+        return "fake"
+
+    @property
+    def _identifying_params(self):
+        return {"model_name": self.model_name}
+
+    def first_token_delay(self):
+        if self.latency_sigma:
+            return self.latency * self._random.lognormvariate(0, self.latency_sigma)
+        return self.latency
+
+    def wait_delay(self, seconds):
+        """Return how long to wait, and whether the call times out after that."""
+        if self.timeout is not None and seconds > self.timeout:
+            return self.timeout, True
+        return seconds, False
+
+    def timed_out(self):
+        raise FakeLLMTimeout(f"No answer within {self.timeout} seconds")
+
+    def token_delay(self):
+        return 1 / self.tokens_per_second if self.tokens_per_second else 0
+
+    def maybe_fail(self):
+        if self.error_rate and self._random.random() < self.error_rate:
+            raise FakeLLMError("Injected fake model error")
+
+    def bind_tools(self, tools, *, tool_choice=None, **kwargs):
+        return self.bind(
+            tools=[convert_to_openai_tool(tool) for tool in tools],
+            tool_choice=tool_choice,
+            **kwargs,
+        )
+
+    def answer(self, messages, tools=None, tool_choice=None):
+        """Return the tool name (None for plain text) and the answer text."""
+        self.maybe_fail()
+        prompt = messages[-1].content
+        if not tools:
+            return None, f"Fake answer to: {prompt}"
+        names = [tool["function"]["name"] for tool in tools]
+        name = tool_choice if tool_choice in names else names[0]
+        return name, json.dumps(fake_answer(name, prompt), ensure_ascii=False)
+
+    @staticmethod
+    def _usage(messages, text):
+        usage = {
+            "input_tokens": sum(_tokens(str(m.content)) for m in messages),
+            "output_tokens": _tokens(text),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return usage
+
+    def _message(self, messages, name, text):
+        usage = self._usage(messages, text)
+        if name is None:
+            return AIMessage(content=text, usage_metadata=usage)
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": name,
+                    "args": json.loads(text),
+                    "id": f"call_{uuid.uuid4().hex}",
+                }
+            ],
+            usage_metadata=usage,
+        )
+
+    def _chunks(self, messages, name, text):
+        call_id = f"call_{uuid.uuid4().hex}"
+        pieces = _pieces(text)
+        for i, piece in enumerate(pieces):
+            if name is None:
+                message = AIMessageChunk(content=piece)
+            else:
+                message = AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": name if i == 0 else None,
+                            "args": piece,
+                            "id": call_id if i == 0 else None,
+                            "index": 0,
+                        }
+                    ],
+                )
+            if i == len(pieces) - 1:
+                # Like OpenAI with stream_usage, the last chunk carries the usage
+                message.usage_metadata = self._usage(messages, text)
+            yield ChatGenerationChunk(message=message)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        name, text = self.answer(
+            messages, kwargs.get("tools"), kwargs.get("tool_choice")
+        )
+        delay, timed_out = self.wait_delay(self.first_token_delay())
+        time.sleep(delay)
+        if timed_out:
+            self.timed_out()
+        time.sleep(self.token_delay() * _tokens(text))
+        message = self._message(messages, name, text)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        name, text = self.answer(
+            messages, kwargs.get("tools"), kwargs.get("tool_choice")
+        )
+        delay, timed_out = self.wait_delay(self.first_token_delay())
+        await asyncio.sleep(delay)
+        if timed_out:
+            self.timed_out()
+        await asyncio.sleep(self.token_delay() * _tokens(text))
+        message = self._message(messages, name, text)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        name, text = self.answer(
+            messages, kwargs.get("tools"), kwargs.get("tool_choice")
+        )
+        delay, timed_out = self.wait_delay(self.first_token_delay())
+        time.sleep(delay)
+        if timed_out:
+            self.timed_out()
+        for i, chunk in enumerate(self._chunks(messages, name, text)):
+            if i:
+                time.sleep(self.token_delay())
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any):
+        name, text = self.answer(
+            messages, kwargs.get("tools"), kwargs.get("tool_choice")
+        )
+        delay, timed_out = self.wait_delay(self.first_token_delay())
+        await asyncio.sleep(delay)
+        if timed_out:
+            self.timed_out()
+        for i, chunk in enumerate(self._chunks(messages, name, text)):
+            if i:
+                await asyncio.sleep(self.token_delay())
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class _Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers ``POST .../chat/completions`` like the OpenAI API would."""
+
+    protocol_version = "HTTP/1.1"
+    model = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_chunk(self, body):
+        data = f"data: {body}\n\n".encode()
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        model = self.model
+        messages = [
+            _Message(message.get("content") or "") for message in request["messages"]
+        ]
+        tool_choice = request.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            tool_choice = tool_choice["function"]["name"]
+        response_format = request.get("response_format") or {}
+        try:
+            if response_format.get("type") == "json_schema":
+                # Structured output as JSON content rather than a tool call
+                model.maybe_fail()
+                schema_name = response_format["json_schema"]["name"]
+                name = None
+                text = json.dumps(
+                    fake_answer(schema_name, messages[-1].content), ensure_ascii=False
+                )
+            else:
+                name, text = model.answer(messages, request.get("tools"), tool_choice)
+        except FakeLLMError as exc:
+            self._send_json(
+                500, {"error": {"message": str(exc), "type": "server_error"}}
+            )
+            return
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        call_id = f"call_{uuid.uuid4().hex}"
+        base = {
+            "id": completion_id,
+            "created": int(time.time()),
+            "model": request["model"],
+        }
+        finish_reason = "stop" if name is None else "tool_calls"
+        prompt_tokens = sum(_tokens(message.content) for message in messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _tokens(text),
+            "total_tokens": prompt_tokens + _tokens(text),
+        }
+        delay, timed_out = model.wait_delay(model.first_token_delay())
+        time.sleep(delay)
+        if timed_out:
+            self._send_json(
+                504,
+                {
+                    "error": {
+                        "message": f"No answer within {model.timeout} seconds",
+                        "type": "timeout",
+                    }
+                },
+            )
+            return
+
+        if not request.get("stream"):
+            time.sleep(model.token_delay() * _tokens(text))
+            if name is None:
+                message = {"role": "assistant", "content": text}
+            else:
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": call_id,
+                            "type": "function",
+                            "function": {"name": name, "arguments": text},
+                        }
+                    ],
+                }
+            self._send_json(
+                200,
+                {
+                    **base,
+                    "object": "chat.completion",
+                    "choices": [
+                        {"index": 0, "message": message, "finish_reason": finish_reason}
+                    ],
+                    "usage": usage,
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, piece in enumerate(_pieces(text)):
+            if i:
+                time.sleep(model.token_delay())
+            if name is None:
+                delta = {"content": piece}
+            else:
+                call = {"index": 0, "function": {"arguments": piece}}
+                if i == 0:
+                    call.update(id=call_id, type="function")
+                    call["function"]["name"] = name
+                delta = {"tool_calls": [call]}
+            if i == 0:
+                delta["role"] = "assistant"
+            chunk = {
+                **base,
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+            }
+            self._send_chunk(json.dumps(chunk))
+        last = {
+            **base,
+            "object": "chat.completion.chunk",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+            "usage": usage,
+        }
+        self._send_chunk(json.dumps(last))
+        self._send_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def make_server(host="127.0.0.1", port=8001, model=None):
+    """
+    Return an HTTP server answering OpenAI chat completion requests.
+
+    Args:
+        model (FakeChatModel): Supplies the answers, latency and errors.
+    """
+    handler = type("Handler", (FakeOpenAIHandler,), {"model": model or FakeChatModel()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
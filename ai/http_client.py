@@ -0,0 +1,131 @@
+"""
+HTTP connections shared by the OpenAI clients.
+
+Each ``ChatOpenAI`` would otherwise open its own connection pool, and with
+one client per setting and route (see ai.routing) a worker pays several TCP
+and TLS handshakes before its connections are warm, and again whenever a
+client is rebuilt. ``ai.settings.build_llm`` hands every client the same
+``httpx.Client`` and ``httpx.AsyncClient`` instead, so a process keeps one
+pool of keep-alive connections per endpoint. With the ``h2`` package
+installed and ``AI_HTTP2`` on, calls are multiplexed over HTTP/2.
+
+The pool itself lives in the transport and is created per process on first
+use: a worker forked from a process that already made calls opens its own
+connections rather than writing to its parent's sockets. Async connections
+belong to the event loop that opened them, so each loop gets its own pool.
+
+Only imported once a real client is built, like httpx and openai.
+"""
+
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+
+import httpx
+from openai import DEFAULT_TIMEOUT
+
+from .settings import (
+    HTTP2,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+)
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def http2_available():
+    return HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+def _pool_options():
+    return {
+        "http2": http2_available(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+class ProcessTransport(httpx.BaseTransport):
+    """Sends requests through the connection pool of the current process."""
+
+    def __init__(self):
+        self._pid = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def pool(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # An inherited pool holds the parent's sockets: drop, never close
+                self._pid = os.getpid()
+                self._pool = httpx.HTTPTransport(**_pool_options())
+            return self._pool
+
+    def handle_request(self, request):
+        return self.pool().handle_request(request)
+
+    def close(self):
+        with self._lock:
+            pool, pid = self._pool, self._pid
+            self._pool = self._pid = None
+        if pool is not None and pid == os.getpid():
+            pool.close()
+
+
+class AsyncProcessTransport(httpx.AsyncBaseTransport):
+    """Sends requests through the pool of the current process and event loop."""
+
+    def __init__(self):
+        self._pid = None
+        self._pools = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def pool(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pools = weakref.WeakKeyDictionary()
+            if loop not in self._pools:
+                self._pools[loop] = httpx.AsyncHTTPTransport(**_pool_options())
+            return self._pools[loop]
+
+    async def handle_async_request(self, request):
+        return await self.pool().handle_async_request(request)
+
+    async def aclose(self):
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+
+def _client(kind):
+    with _lock:
+        if kind not in _clients:
+            # Like the OpenAI client's own default client; the timeout of
+            # each call is set per request
+            options = {"timeout": DEFAULT_TIMEOUT, "follow_redirects": True}
+            _clients[kind] = (
+                httpx.Client(transport=ProcessTransport(), **options)
+                if kind == "sync"
+                else httpx.AsyncClient(transport=AsyncProcessTransport(), **options)
+            )
+        return _clients[kind]
+
+
+def client():
+    """Return the process-wide ``httpx.Client`` of the OpenAI clients."""
+    return _client("sync")
+
+
+def async_client():
+    """Return the process-wide ``httpx.AsyncClient`` of the OpenAI clients."""
+    return _client("async")
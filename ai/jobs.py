@@ -0,0 +1,187 @@
+"""
+Background execution of AI generation requests.
+
+The generate endpoints under ``ai-generation/jobs/`` store a ``GenerationJob``
+and answer ``202 Accepted`` right away; the LLM call is made by a worker that
+polls the table (``python manage.py run_generation_worker``). No broker is
+needed: a job is claimed with a conditional UPDATE from ``pending`` to
+``running``, so any number of worker processes and threads can share the
+table without running a job twice.
+
+Jobs are claimed in ``(priority, id)`` order. Backcard jobs have a lower
+priority value than topic jobs, so a user waiting on a single card is never
+queued behind a batch of topic lists.
+"""
+
+import datetime
+import logging
+import threading
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import usage
+from .models import GenerationJob
+
+logger = logging.getLogger(__name__)
+
+# Jobs claimed this long ago are assumed to belong to a dead worker
+STALE_JOB_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+def enqueue(user, kind, payload):
+    """
+    Store a generation job for the worker.
+
+    Args:
+        user (CustomUser): The user the job runs for.
+        kind (str): ``GenerationJob.KIND_BACKCARD`` or ``GenerationJob.KIND_TOPIC``.
+        payload (dict): Keyword arguments of the usecase's ``generate``.
+
+    Returns:
+        GenerationJob: The pending job.
+    """
+    return GenerationJob.objects.create(
+        user=user,
+        kind=kind,
+        priority=GenerationJob.PRIORITIES[kind],
+        payload=payload,
+    )
+
+
+def claim_next_job():
+    """
+    Claim the most urgent pending job, or return None if there is none.
+
+    A few candidates are read first and then claimed one by one with a
+    conditional UPDATE; losing the race for one simply moves on to the next.
+    """
+    candidates = (
+        GenerationJob.objects.filter(status=GenerationJob.STATUS_PENDING)
+        .order_by("priority", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = GenerationJob.objects.filter(
+            id=job_id, status=GenerationJob.STATUS_PENDING
+        ).update(status=GenerationJob.STATUS_RUNNING, started_at=timezone.now())
+        if claimed:
+            return GenerationJob.objects.get(id=job_id)
+    return None
+
+
+def execute(job):
+    """Run the usecase of a job and return the JSON-ready result."""
+    from .usecases import generate_back_card_usecase, generate_topic_usecase
+
+    if job.kind == GenerationJob.KIND_BACKCARD:
+        response = generate_back_card_usecase.generate(**job.payload)
+    elif job.kind == GenerationJob.KIND_TOPIC:
+        response = generate_topic_usecase.generate_many(**job.payload)
+    else:
+        raise ValueError(f"Unknown job kind: {job.kind}")
+    return response.model_dump(exclude_none=True)
+
+
+def run_job(job):
+    """Execute a claimed job and store its result or error."""
+    try:
+        with usage.scope(job.user_id, f"job-{job.kind}"):
+            job.result = execute(job)
+        job.status = GenerationJob.STATUS_SUCCEEDED
+    except Exception as exc:
+        logger.exception("Generation job %s failed", job.pk)
+        job.error = str(exc) or exc.__class__.__name__
+        job.status = GenerationJob.STATUS_FAILED
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at", "updated_at"])
+    return job
+
+
+def run_pending(limit=None):
+    """
+    Run pending jobs in the current thread until the queue is empty.
+
+    Args:
+        limit (int): Stop after this many jobs.
+
+    Returns:
+        int: The number of jobs that were run.
+    """
+    done = 0
+    while limit is None or done < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        done += 1
+    return done
+
+
+def requeue_stale_jobs(timeout=STALE_JOB_TIMEOUT):
+    """Put jobs left ``running`` by a crashed worker back in the queue."""
+    return GenerationJob.objects.filter(
+        status=GenerationJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - timeout,
+    ).update(status=GenerationJob.STATUS_PENDING, started_at=None)
+
+
+class JobWorker:
+    """
+    A pool of threads that poll for and run generation jobs.
+
+    LLM calls spend nearly all their time waiting on the network, so one
+    process with a handful of threads keeps many requests in flight. Every
+    ``requeue_every`` polls, starting with the first, a thread also puts the
+    jobs of crashed workers back in the queue, so a long-running worker picks
+    them up without a restart.
+    """
+
+    def __init__(self, threads=4, poll_interval=1.0, requeue_every=60):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.requeue_every = requeue_every
+        self._stop = threading.Event()
+        self._pool = []
+
+    def _loop(self):
+        polls = 0
+        while not self._stop.is_set():
+            close_old_connections()
+            try:
+                if polls % self.requeue_every == 0:
+                    requeue_stale_jobs()
+                ran = run_pending(limit=1)
+            except Exception:
+                logger.exception("Generation worker failed to claim a job")
+                ran = 0
+            polls += 1
+            if not ran:
+                self._stop.wait(self.poll_interval)
+        close_old_connections()
+
+    def start(self):
+        self._stop.clear()
+        self._pool = [
+            threading.Thread(
+                target=self._loop, name=f"generation-worker-{i}", daemon=True
+            )
+            for i in range(self.threads)
+        ]
+        for thread in self._pool:
+            thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._pool:
+            thread.join(timeout)
+        self._pool = []
+
+    def run_forever(self):
+        """Start the pool and block until interrupted."""
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self._pool):
+                self._stop.wait(self.poll_interval)
+        finally:
+            self.stop()
@@ -0,0 +1,76 @@
+import decimal
+
+from django.core.management.base import BaseCommand
+
+from ai.pregenerate import frequent_words, pregenerate
+from ai.settings import (
+    PREGENERATE_DAILY_BUDGET,
+    PREGENERATE_MAX_WORDS,
+    USAGE_RECORDING,
+)
+from ai.usecases import generate_back_cards_usecase
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate and cache the backcards of the words most users have a card "
+        "for. Run it off-peak; a run that hits a limit is resumed by running "
+        "it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=500,
+            help="Most common words considered per language pair.",
+        )
+        parser.add_argument(
+            "--min-users",
+            type=int,
+            default=2,
+            help="Users that must have a card for a word.",
+        )
+        parser.add_argument(
+            "--max-words",
+            type=int,
+            default=PREGENERATE_MAX_WORDS,
+            help="Words generated in this run at most.",
+        )
+        parser.add_argument(
+            "--budget",
+            type=decimal.Decimal,
+            default=PREGENERATE_DAILY_BUDGET,
+            help="USD the pre-generation calls may cost per day; 0 for no limit.",
+        )
+        parser.add_argument(
+            "--max-minutes",
+            type=float,
+            default=None,
+            help="Minutes after which no new batch is started.",
+        )
+
+    def handle(self, *args, **options):
+        budget = options["budget"] or None
+        if budget and not USAGE_RECORDING:
+            self.stderr.write(
+                "AI_USAGE_RECORDING is off, so the budget cannot be enforced."
+            )
+        words = frequent_words(top=options["top"], min_users=options["min_users"])
+        stats = pregenerate(
+            generate_back_cards_usecase,
+            words,
+            max_words=options["max_words"],
+            budget=budget,
+            max_seconds=(
+                options["max_minutes"] * 60 if options["max_minutes"] else None
+            ),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {stats['generated']} backcards "
+                f"({stats['failed']} failed, {stats['already_cached']} already "
+                f"cached, {stats['skipped']} routed to another model) for {len(words)} language pairs; "
+                f"${stats['spent_today']} spent today, stopped: {stats['stopped']}."
+            )
+        )
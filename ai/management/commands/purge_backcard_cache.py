@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ai.usecases import generate_back_card_usecase
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete cached backcards that expired or were generated with another "
+        "model or prompt than the current ones."
+    )
+
+    def handle(self, *args, **options):
+        deleted = generate_back_card_usecase.cache.purge()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} cached backcards."))
@@ -0,0 +1,25 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ai import usage
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete per-call LLM usage rows older than a number of days. The daily "
+        "totals are kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=30,
+            help="Keep the rows of this many days.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = usage.purge(timezone.now() - datetime.timedelta(days=options["days"]))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} LLM usage rows."))
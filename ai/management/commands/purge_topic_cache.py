@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ai.usecases import generate_topic_usecase
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete cached topic cards that expired or were generated with another "
+        "model or prompt than the current ones."
+    )
+
+    def handle(self, *args, **options):
+        deleted = generate_topic_usecase.cache.purge()
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} cached topic card pools.")
+        )
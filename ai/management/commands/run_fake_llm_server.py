@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+
+from ai.fake_llm import FakeChatModel, make_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve deterministic fake answers on an OpenAI-compatible chat "
+        "completions endpoint, for load tests. Point the web server at it with "
+        "OPENAI_BASE_URL=http://HOST:PORT/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8001)
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.5,
+            help="Median seconds before the first token.",
+        )
+        parser.add_argument(
+            "--latency-sigma",
+            type=float,
+            default=0.0,
+            help="Spread of the log-normal latency distribution; 0 for constant.",
+        )
+        parser.add_argument(
+            "--tokens-per-second",
+            type=float,
+            default=0.0,
+            help="Pace of the answer after the first token; 0 for all at once.",
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0.0,
+            help="Share of requests answered with HTTP 500.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=None,
+            help="Seconds after which a request without a first token is "
+            "answered with HTTP 504; waits by default.",
+        )
+
+    def handle(self, *args, **options):
+        model = FakeChatModel(
+            latency=options["latency"],
+            latency_sigma=options["latency_sigma"],
+            tokens_per_second=options["tokens_per_second"],
+            error_rate=options["error_rate"],
+            timeout=options["timeout"],
+        )
+        server = make_server(options["host"], options["port"], model)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Fake LLM server listening on "
+                f"http://{options['host']}:{options['port']}/v1"
+            )
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Fake LLM server stopped.")
+        finally:
+            server.server_close()
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from ai.jobs import JobWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued AI generation jobs. Start one or more of these next to the "
+        "web server; backcard jobs are always picked before topic jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Number of jobs run concurrently.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds an idle thread waits before polling again.",
+        )
+        parser.add_argument(
+            "--requeue-every",
+            type=int,
+            default=60,
+            help="Polls between two sweeps for jobs left running by a crashed worker.",
+        )
+
+    def handle(self, *args, **options):
+        worker = JobWorker(
+            threads=options["threads"],
+            poll_interval=options["poll_interval"],
+            requeue_every=options["requeue_every"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Generation worker running {worker.threads} threads.")
+        )
+        try:
+            worker.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write("Generation worker stopped.")
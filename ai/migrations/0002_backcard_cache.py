@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ai", "0001_generation_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BackcardCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("model_name", models.CharField(max_length=100)),
+                ("prompt_hash", models.CharField(max_length=16)),
+                ("front_card", models.CharField(max_length=255)),
+                ("source_language", models.CharField(max_length=10)),
+                ("target_language", models.CharField(max_length=10)),
+                ("response", models.JSONField()),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ai", "0003_llm_usage"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name="llmusagedaily",
+            name="unique_llm_usage_daily",
+        ),
+        migrations.AddField(
+            model_name="llmusage",
+            name="backend",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddField(
+            model_name="llmusagedaily",
+            name="backend",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name="llmusagedaily",
+            constraint=models.UniqueConstraint(
+                fields=("user", "date", "endpoint", "backend", "model_name"),
+                name="unique_llm_usage_daily",
+            ),
+        ),
+    ]
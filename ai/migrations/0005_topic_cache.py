@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ai", "0004_llm_usage_backend"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TopicCacheEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("model_name", models.CharField(max_length=100)),
+                ("prompt_hash", models.CharField(max_length=16)),
+                ("topic", models.CharField(max_length=255)),
+                ("source_language", models.CharField(max_length=10)),
+                ("target_language", models.CharField(max_length=10)),
+                ("cards", models.JSONField()),
+                ("hits", models.PositiveIntegerField(default=0)),
+                ("expires_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "verbose_name_plural": "topic cache entries",
+                "indexes": [
+                    models.Index(
+                        fields=["source_language", "target_language", "model_name"],
+                        name="ai_topiccac_source__50ed3c_idx",
+                    )
+                ],
+            },
+        ),
+    ]
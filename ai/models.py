@@ -1,13 +1,193 @@
-import typing
 import dataclasses
+from django.conf import settings
+from django.db import models
+from leitner.models import BaseModel
 
 
 @dataclasses.dataclass
 class LLMConfiguration:
     model_name: str
     temperature: float
-    model_kwargs: typing.Dict = dataclasses.field(default_factory=dict)
+    model_kwargs: dict = dataclasses.field(default_factory=dict)
     max_tokens: int = 2000
-    top_p: typing.Optional[float] = None
-    frequency_penalty: typing.Optional[float] = None
-    presence_penalty: typing.Optional[float] = None
+    top_p: float | None = None
+    frequency_penalty: float | None = None
+    presence_penalty: float | None = None
+    # Budgets of the provider shared by every call to this model, see
+    # ai.ratelimit; None for no limit
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+    # Seconds one attempt and all attempts of a call may take, see
+    # ai.resilience
+    timeout: float | None = None
+    deadline: float | None = None
+
+
+class GenerationJob(BaseModel):
+    """
+    An AI generation request that is run by the job worker instead of inside
+    the HTTP request, see ai.jobs.
+    """
+
+    KIND_BACKCARD = "backcard"
+    KIND_TOPIC = "topic"
+    KIND_CHOICES = [(KIND_BACKCARD, "Backcard"), (KIND_TOPIC, "Topic cards")]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    # Lower runs first: interactive backcards go ahead of bulk topic lists
+    PRIORITIES = {KIND_BACKCARD: 0, KIND_TOPIC: 10}
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    priority = models.SmallIntegerField()
+    status = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING
+    )
+    payload = models.JSONField()
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "priority", "id"])]
+
+    def __str__(self):
+        return f"{self.kind} job {self.pk} ({self.status})"
+
+
+class BackcardCacheEntry(BaseModel):
+    """
+    A generated backcard shared by all users and workers, see ai.cache.
+
+    ``key`` covers the normalized input, the model and the prompt, so entries
+    made with an older prompt or model are never read again and can be purged.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    prompt_hash = models.CharField(max_length=16)
+    front_card = models.CharField(max_length=255)
+    source_language = models.CharField(max_length=10)
+    target_language = models.CharField(max_length=10)
+    response = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.front_card} ({self.source_language}->{self.target_language})"
+
+
+class TopicCacheEntry(BaseModel):
+    """
+    A pool of generated cards for a topic, shared by all users, see ai.cache.
+
+    ``topic`` is normalized so that near matches can be found by comparing
+    it with the topic of other requests in the same language pair.
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    prompt_hash = models.CharField(max_length=16)
+    topic = models.CharField(max_length=255)
+    source_language = models.CharField(max_length=10)
+    target_language = models.CharField(max_length=10)
+    cards = models.JSONField()
+    hits = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = "topic cache entries"
+        indexes = [
+            models.Index(fields=["source_language", "target_language", "model_name"])
+        ]
+
+    def __str__(self):
+        return f"{self.topic} ({self.source_language}->{self.target_language})"
+
+
+class LLMUsage(models.Model):
+    """
+    One chat model call, or one backcard answered from the cache, see ai.usage.
+
+    Rows are written in batches by a background thread and are only ever
+    inserted, so there is no ``updated_at``. ``LLMUsageDaily`` keeps the
+    totals once old rows are purged.
+    """
+
+    OUTCOME_SUCCESS = "success"
+    OUTCOME_ERROR = "error"
+    OUTCOME_CANCELLED = "cancelled"
+    OUTCOME_CHOICES = [
+        (OUTCOME_SUCCESS, "Success"),
+        (OUTCOME_ERROR, "Error"),
+        (OUTCOME_CANCELLED, "Cancelled"),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE
+    )
+    endpoint = models.CharField(max_length=64)
+    # Name of the endpoint that answered, see ai.routing; empty for cache hits
+    backend = models.CharField(max_length=64, blank=True, default="")
+    model_name = models.CharField(max_length=100)
+    cache_hit = models.BooleanField(default=False)
+    outcome = models.CharField(max_length=16, choices=OUTCOME_CHOICES)
+    duration_ms = models.PositiveIntegerField(default=0)
+    # Only known for streamed calls
+    ttft_ms = models.PositiveIntegerField(null=True, blank=True)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    completion_tokens = models.PositiveIntegerField(default=0)
+    cost = models.DecimalField(max_digits=12, decimal_places=6, default=0)
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name_plural = "LLM usage"
+
+    def __str__(self):
+        return f"{self.endpoint} {self.model_name} ({self.outcome})"
+
+
+class LLMUsageDaily(models.Model):
+    """Totals of ``LLMUsage`` per user, day, endpoint, backend and model."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    endpoint = models.CharField(max_length=64)
+    backend = models.CharField(max_length=64, blank=True, default="")
+    model_name = models.CharField(max_length=100)
+    calls = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveBigIntegerField(default=0)
+    completion_tokens = models.PositiveBigIntegerField(default=0)
+    cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+    duration_ms = models.PositiveBigIntegerField(default=0)
+    # Sum and count of the time to first token of streamed calls
+    ttft_ms = models.PositiveBigIntegerField(default=0)
+    streamed_calls = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "LLM usage per day"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date", "endpoint", "backend", "model_name"],
+                name="unique_llm_usage_daily",
+            )
+        ]
+        indexes = [models.Index(fields=["date"])]
+
+    def __str__(self):
+        return f"{self.date} {self.endpoint} {self.model_name}"
@@ -0,0 +1,199 @@
+"""
+Incremental and tolerant parsing of structured output.
+
+When a model streams a tool call, its JSON arguments arrive as arbitrary text
+fragments. ``JSONArrayItemParser`` is fed those fragments and returns each
+element of the array under a given key as soon as the element's closing brace
+has arrived, without waiting for the rest of the document.
+
+The same parser salvages the complete elements of an answer that was cut off
+by ``max_tokens`` or is malformed further on, and ``salvage_object`` the
+complete fields of a single object, so the usecases can keep what arrived
+and ask the model for the missing remainder only (see ``ai.usecases``).
+``stats`` counts how often that happens and the tokens it saves.
+"""
+
+import collections
+import json
+import threading
+
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+def count(event, amount=1):
+    with _stats_lock:
+        _stats[event] += amount
+
+
+def stats():
+    """
+    Structured answers of this process that failed to parse, how many were
+    repaired locally or needed a retry, and the tokens saved.
+
+    ``tokens_saved`` is what repeating the failed calls would have cost,
+    less the tokens of the calls that asked for their remainder.
+    """
+    with _stats_lock:
+        counters = dict(_stats)
+    calls = counters.get("calls", 0)
+    retries = counters.get("remainder_retries", 0) + counters.get("full_retries", 0)
+    return {
+        "calls": calls,
+        "parse_failures": counters.get("parse_failures", 0),
+        "repaired": counters.get("repaired", 0),
+        "remainder_retries": counters.get("remainder_retries", 0),
+        "full_retries": counters.get("full_retries", 0),
+        "retry_rate": retries / calls if calls else 0.0,
+        "tokens_saved": counters.get("failed_tokens", 0)
+        - counters.get("retry_tokens", 0),
+    }
+
+
+def raw_arguments(message):
+    """Return the JSON text of the first tool call of ``message``, or its content."""
+    for tool_call in getattr(message, "invalid_tool_calls", None) or []:
+        return tool_call.get("args") or ""
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        return json.dumps(tool_call["args"])
+    content = getattr(message, "content", "")
+    return content if isinstance(content, str) else ""
+
+
+def total_tokens(message):
+    """Return the tokens ``message`` cost, or 0 when they were not reported."""
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+def salvage_items(text, key):
+    """Return the complete objects of the array under ``key`` in ``text``."""
+    return JSONArrayItemParser(key).feed(text or "")
+
+
+def salvage_object(text):
+    """
+    Return the complete fields of the first JSON object in ``text``.
+
+    Reading stops at the first field that is cut off or malformed; the
+    fields before it are kept.
+    """
+    text = text or ""
+    start = text.find("{")
+    if start < 0:
+        return {}
+    decoder = json.JSONDecoder()
+    fields = {}
+    position = start + 1
+    while True:
+        position = _skip(text, position, ",")
+        if position >= len(text) or text[position] != '"':
+            return fields
+        try:
+            key, position = decoder.raw_decode(text, position)
+            position = _skip(text, position)
+            if text[position : position + 1] != ":":
+                return fields
+            value, position = decoder.raw_decode(text, _skip(text, position + 1))
+        except json.JSONDecodeError:
+            return fields
+        fields[key] = value
+
+
+def _skip(text, position, extra=""):
+    """Return the position of the next character that is not white space or ``extra``."""
+    while position < len(text) and (
+        text[position].isspace() or text[position] in extra
+    ):
+        position += 1
+    return position
+
+
+class JSONArrayItemParser:
+    """
+    Extract the objects of a top-level array (e.g. ``{"cards": [{...}, ...]}``)
+    from a JSON document that arrives in pieces.
+
+    Args:
+        key (str): Key of the array in the top-level object.
+
+    ``complete`` turns true once the closing bracket of the array arrived,
+    so a document that was cut short can be told from a finished one.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.complete = False
+        self._buffer = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None
+        self._in_array = False
+        self._item_start = None
+
+    def feed(self, text):
+        """
+        Consume the next fragment of the document.
+
+        Returns:
+            list[dict]: The array items completed by this fragment.
+        """
+        self._buffer += text
+        items = []
+        buffer = self._buffer
+        for position in range(self._position, len(buffer)):
+            char = buffer[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start : position]
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = position + 1
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_string == self.key:
+                    self._in_array = True
+                elif char == "{" and self._in_array and self._depth == 3:
+                    self._item_start = position
+            elif char in "}]":
+                if char == "}" and self._in_array and self._depth == 3:
+                    item = buffer[self._item_start : position + 1]
+                    self._item_start = None
+                    try:
+                        items.append(json.loads(item))
+                    except json.JSONDecodeError:
+                        pass
+                elif char == "]" and self._in_array and self._depth == 2:
+                    self._in_array = False
+                    self.complete = True
+                self._depth -= 1
+            elif char == "," and self._depth == 1:
+                self._last_string = None
+
+        self._position = len(buffer)
+        # Keep only what an unfinished item still needs
+        keep_from = self._item_start if self._item_start is not None else len(buffer)
+        if self._in_string and self._string_start - 1 < keep_from:
+            keep_from = self._string_start - 1
+        self._shift(keep_from)
+        return items
+
+    def _shift(self, offset):
+        if offset <= 0:
+            return
+        self._buffer = self._buffer[offset:]
+        self._position -= offset
+        if self._item_start is not None:
+            self._item_start -= offset
+        if self._string_start is not None:
+            self._string_start -= offset
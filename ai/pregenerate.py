@@ -0,0 +1,190 @@
+"""
+Pre-generation of backcards for the words many users learn.
+
+Backcard requests follow a long tail: a few thousand common words make up a
+large share of them. ``frequent_words`` finds the source texts the most
+users have a card for, per language pair, and ``pregenerate`` sends those
+without a fresh cache entry through the batch usecase, which stores every
+answer in the backcard cache. An interactive request for one of them is
+then a cache hit.
+
+Run it off-peak with ``python manage.py pregenerate_backcards``. Its calls
+are recorded under the ``pregenerate-backcards`` endpoint and use the batch
+share of the provider's rate limit. A run stops at the word limit, the time
+limit, or once the day's spending on the endpoint reaches the budget, and
+each chunk is cached as soon as it is answered: running it again picks up
+the words that are still missing. Words the interactive usecase routes to
+another model than the batch one (by default, phrases) are skipped, as their
+cached answers would never be served.
+"""
+
+import decimal
+import logging
+import time
+
+from django.db.models import Count, Sum
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from leitner.models import Card
+
+from . import usage
+from .models import BackcardCacheEntry, LLMUsageDaily
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "pregenerate-backcards"
+
+# Longer source texts are sentences rather than vocabulary
+MAX_WORD_LENGTH = 100
+# Cache keys looked up per query, below SQLite's limit of query parameters
+KEYS_PER_QUERY = 500
+
+
+def frequent_words(top=500, min_users=2):
+    """
+    Return the most common source texts of all boxes, per language pair.
+
+    Texts are compared trimmed and lowercased and ranked by the number of
+    users with a card for them.
+
+    Returns:
+        dict: ``{(source_language, target_language): [word, ...]}``, the
+        words of each pair most common first.
+    """
+    rows = (
+        Card.objects.annotate(word=Lower(Trim("source_text")))
+        .exclude(word="")
+        .values(
+            "box__source_language__code",
+            "box__target_language__code",
+            "word",
+        )
+        .annotate(users=Count("box__user", distinct=True))
+        .filter(users__gte=min_users)
+        .order_by("-users", "word")
+    )
+    words = {}
+    for row in rows.iterator():
+        if len(row["word"]) > MAX_WORD_LENGTH:
+            continue
+        pair = (
+            row["box__source_language__code"].upper(),
+            row["box__target_language__code"].upper(),
+        )
+        pair_words = words.setdefault(pair, [])
+        if len(pair_words) < top:
+            pair_words.append(row["word"])
+    return words
+
+
+def uncached(cache, words, source_language, target_language, model_name=None):
+    """Return the words without a fresh entry of ``model_name`` in ``cache``."""
+    keys = {
+        cache.key(word, source_language, target_language, model_name): word
+        for word in words
+    }
+    ordered, cached = list(keys), set()
+    for start in range(0, len(ordered), KEYS_PER_QUERY):
+        cached.update(
+            BackcardCacheEntry.objects.filter(
+                key__in=ordered[start : start + KEYS_PER_QUERY],
+                expires_at__gt=timezone.now(),
+            ).values_list("key", flat=True)
+        )
+    return [word for key, word in keys.items() if key not in cached]
+
+
+def spent_today():
+    """Return what the endpoint's calls cost today, as recorded so far."""
+    usage.usage_recorder.flush()
+    total = LLMUsageDaily.objects.filter(
+        date=timezone.localdate(), endpoint=ENDPOINT
+    ).aggregate(cost=Sum("cost"))["cost"]
+    return total or decimal.Decimal(0)
+
+
+def pregenerate(
+    usecase,
+    words,
+    max_words=2000,
+    budget=None,
+    max_seconds=None,
+    chunk_size=None,
+):
+    """
+    Generate and cache the backcards of ``words`` that are not cached yet.
+
+    Args:
+        usecase (GenerateBackCardsUsecase): The batch usecase; its backcard
+            usecase's cache is warmed.
+        words (dict): ``{(source_language, target_language): [word, ...]}``,
+            as returned by ``frequent_words``.
+        max_words (int): Words sent to the model in this run at most.
+        budget (Decimal): USD the endpoint may spend per day, or None.
+        max_seconds (float): Seconds after which no new chunk is started.
+        chunk_size (int): Words per ``generate`` call; defaults to the batch
+            size times the concurrency of the usecase.
+
+    Returns:
+        dict: Words ``already_cached``, ``generated``, ``failed`` and
+        ``skipped`` as routed to another model, the cost ``spent_today`` and why the run ended in ``stopped``.
+    """
+    cache = usecase.backcard_usecase.cache
+    model_name = usecase.cache_model()
+    chunk_size = chunk_size or usecase.batch_size * usecase.concurrency
+    started = time.monotonic()
+    stats = {
+        "already_cached": 0,
+        "generated": 0,
+        "failed": 0,
+        "skipped": 0,
+        "stopped": "done",
+    }
+
+    def stop_reason():
+        if stats["generated"] + stats["failed"] >= max_words:
+            return "max_words"
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            return "max_seconds"
+        if budget is not None and spent_today() >= budget:
+            return "budget"
+        return None
+
+    with usage.scope(None, ENDPOINT):
+        for (source_language, target_language), pair_words in words.items():
+            routed = [
+                word
+                for word in pair_words
+                if usecase.backcard_usecase.cache_model(word) == model_name
+            ]
+            stats["skipped"] += len(pair_words) - len(routed)
+            pair_words = routed
+            missing = uncached(
+                cache, pair_words, source_language, target_language, model_name
+            )
+            stats["already_cached"] += len(pair_words) - len(missing)
+            for start in range(0, len(missing), chunk_size):
+                reason = stop_reason()
+                if reason:
+                    stats["stopped"] = reason
+                    break
+                left = max_words - stats["generated"] - stats["failed"]
+                chunk = missing[start : start + min(chunk_size, left)]
+                backcards, errors = usecase.generate(
+                    chunk, source_language, target_language
+                )
+                stats["generated"] += len(backcards)
+                stats["failed"] += len(errors)
+                if errors:
+                    logger.warning(
+                        "Could not pre-generate %s %s->%s backcards",
+                        len(errors),
+                        source_language,
+                        target_language,
+                    )
+            if stats["stopped"] != "done":
+                break
+
+    stats["spent_today"] = spent_today()
+    return stats
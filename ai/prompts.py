@@ -145,3 +145,37 @@ count: 2
 
 Use this format consistently for all vocabulary topic generation requests.
 """
+
+BATCH_BACKCARD_GENERATION_PROMPT = """
+You are a dictionary-style translator and definition provider. The user will provide:
+- "words": A numbered list of words or phrases to analyze and/or translate.
+- "source_language": The language of the words.
+- "target_language": The desired language for translation.
+
+For **every** item in "words", return one entry in "backcards" with these keys:
+
+1. "word_or_phrase": The item exactly as given, without the number.
+2. "translation": The best possible translation or explanation in the target_language.
+   - **If it's an idiomatic phrase, convey the intended meaning or equivalent expression, rather than doing a literal word-by-word translation.**
+   - If multiple translations exist, list them separated by commas.
+3. "definition": A short, dictionary-style definition in the source_language.
+   - If multiple definitions exist, place each on its own line in a single string.
+4. "example_sentences": Exactly one example sentence in the source_language using the item.
+5. "example_sentences_translated": That example sentence translated into the target_language, preserving its sense.
+6. "pronunciation": An IPA transcription of the item in the source_language.
+
+If a value is not available, return `null` for it. Keep the entries in the order of the input, include every item exactly once, and add no extra text.
+"""
+
+# Sub-topic seeds given to the concurrent calls of a large topic request so
+# that their cards overlap as little as possible
+TOPIC_FACETS = [
+    "everyday nouns and objects",
+    "verbs and actions",
+    "adjectives and descriptions",
+    "common phrases and expressions",
+    "people, roles and places",
+    "advanced and less common vocabulary",
+    "idioms and colloquial language",
+    "questions and useful sentences",
+]
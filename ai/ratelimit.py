@@ -0,0 +1,155 @@
+"""
+Provider-wide rate limiting of the chat model calls.
+
+OpenAI limits requests and tokens per minute for each model across the
+whole organization. Without coordination every worker sends as soon as it
+can, the provider answers 429 to all of them at once and their retries
+collide again. Instead, every call of the usecases first takes its share
+from two token buckets per model, requests and tokens, kept in the Django
+cache (see ``ai.throttling.TokenBucket``) so all workers draw from the same
+budget. Tokens are counted the way OpenAI does: the prompt plus
+``max_tokens``.
+
+A call that does not fit waits until the buckets have refilled enough,
+with some jitter so waiting workers do not retry in lockstep. If that would
+take longer than ``max_wait`` the call is shed with ``ProviderBusy`` (503).
+Batch work (topic lists, batched backcards) may not use the last
+``reserve`` share of either bucket, so interactive backcards still get
+through while batches wait.
+"""
+
+import asyncio
+import collections
+import math
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .throttling import TokenBucket
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+# The buckets hold this many seconds of the per-minute budget, as the
+# provider enforces its limits over windows shorter than a minute
+BURST_SECONDS = 10
+# Upper bound of the random delay added to each wait
+JITTER = 0.25
+
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(event, priority):
+    with _stats_lock:
+        _stats[f"{priority}_{event}"] += 1
+
+
+def stats():
+    """Calls admitted, made to wait, and shed by this process, per priority."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+class ProviderBusy(APIException):
+    """The provider's rate limit cannot take the call soon enough."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The AI provider is busy. Please try again shortly."
+    default_code = "provider_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by DRF
+        self.wait = math.ceil(wait)
+
+
+def estimate_tokens(messages, max_tokens):
+    """Tokens the provider counts for a call: the prompt plus ``max_tokens``."""
+    characters = sum(len(str(message.content)) for message in messages)
+    return characters // 4 + max_tokens
+
+
+class ProviderLimiter:
+    """
+    Admit the calls of one ``LLMConfiguration`` within its provider budget.
+
+    Args:
+        setting (LLMConfiguration): Model, ``max_tokens`` and budgets.
+        priority (str): INTERACTIVE or BATCH.
+        max_wait (float): Seconds a call may wait before it is shed.
+        reserve (float): Share of each bucket that BATCH calls may not use.
+    """
+
+    def __init__(self, setting, priority=INTERACTIVE, max_wait=10, reserve=0.2):
+        self.model_name = setting.model_name
+        self.max_tokens = setting.max_tokens
+        self.priority = priority
+        self.max_wait = max_wait
+        self.requests = self._bucket(setting.requests_per_minute, "requests")
+        self.tokens = self._bucket(setting.tokens_per_minute, "tokens")
+        self.reserve = reserve if priority == BATCH else 0
+
+    @staticmethod
+    def _bucket(per_minute, unit):
+        if not per_minute:
+            return None
+        return TokenBucket(
+            capacity=max(1, per_minute * BURST_SECONDS // 60),
+            per_hour=per_minute * 60,
+            prefix=f"ai:provider:{unit}",
+        )
+
+    def try_acquire(self, tokens, model_name=None):
+        """
+        Take one request and ``tokens`` from the buckets, or nothing.
+
+        The budget is that of ``model_name``, or the setting's model.
+
+        Returns:
+            float: 0 if the call may go ahead, otherwise the seconds to wait.
+        """
+        model_name = model_name or self.model_name
+        taken = []
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket is None:
+                continue
+            result = bucket.consume(
+                model_name,
+                amount,
+                reserve=math.floor(bucket.capacity * self.reserve),
+            )
+            if not result.allowed:
+                for previous, previous_amount in taken:
+                    previous.refund(model_name, previous_amount)
+                return max(result.retry_after, 0.001)
+            taken.append((bucket, amount))
+        return 0
+
+    def _admit(self, wait, deadline):
+        """Return the seconds to sleep before trying again, or raise."""
+        if wait > deadline - time.monotonic():
+            _count("shed", self.priority)
+            raise ProviderBusy(wait)
+        _count("waited", self.priority)
+        return wait + random.uniform(0, JITTER)
+
+    def acquire(self, messages, model_name=None):
+        """Block until the call with ``messages`` fits in the budget."""
+        tokens = estimate_tokens(messages, self.max_tokens)
+        deadline = time.monotonic() + self.max_wait
+        while wait := self.try_acquire(tokens, model_name):
+            time.sleep(self._admit(wait, deadline))
+        _count("admitted", self.priority)
+
+    async def aacquire(self, messages, model_name=None):
+        """Async version of ``acquire``; waits without blocking the loop."""
+        tokens = estimate_tokens(messages, self.max_tokens)
+        deadline = time.monotonic() + self.max_wait
+        while wait := await sync_to_async(self.try_acquire)(tokens, model_name):
+            await asyncio.sleep(self._admit(wait, deadline))
+        _count("admitted", self.priority)
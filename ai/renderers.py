@@ -0,0 +1,25 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets streaming views accept ``Accept: text/event-stream``.
+
+    Streaming views return a ``StreamingHttpResponse`` that is not rendered;
+    this renderer only formats regular responses (validation errors) as a
+    single ``error`` event.
+    """
+
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return sse_event("error", data).encode(self.charset)
@@ -0,0 +1,196 @@
+"""
+Retries and circuit breaking of the chat model calls.
+
+Each ``LLMConfiguration`` sets a ``timeout`` for one attempt, enforced by
+the client, and a ``deadline`` for all attempts of a call together.
+Transient provider errors (timeouts, connection errors, 429 and 5xx
+answers) are retried up to ``RetryPolicy.max_retries`` times with
+exponential backoff and full jitter, as long as the deadline allows. Other
+errors, such as an invalid request or an answer that does not match the
+schema, are raised at once.
+
+A ``CircuitBreaker`` per route (backend and model, see ai.routing) counts
+consecutive transient failures. Once it opens, calls fail over to another
+route or fail at once with ``ProviderUnavailable`` (503) instead of holding
+a worker for the whole deadline; after ``reset_timeout`` one probe call is
+let through, and its outcome closes or reopens the breaker. The breakers
+are per process, so each worker finds out on its own.
+"""
+
+import collections
+import math
+import random
+import sys
+import threading
+import time
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_stats = collections.Counter()
+_stats_lock = threading.Lock()
+_breakers = {}
+
+
+def count(event):
+    with _stats_lock:
+        _stats[event] += 1
+
+
+class TransientProviderError(Exception):
+    """A provider failure that may go away when the call is repeated."""
+
+
+class ProviderUnavailable(APIException):
+    """The provider is failing and calls to it are not being made."""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The AI provider is unavailable. Please try again later."
+    default_code = "provider_unavailable"
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by DRF
+        self.wait = max(1, math.ceil(wait))
+
+
+def is_transient(exc):
+    """Whether ``exc`` is a provider failure worth retrying."""
+    if isinstance(exc, (TransientProviderError, TimeoutError, ConnectionError)):
+        return True
+    # Only loaded once a real client has been built
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(
+        exc,
+        (
+            openai.APIConnectionError,
+            openai.RateLimitError,
+            openai.InternalServerError,
+        ),
+    )
+
+
+class RetryPolicy:
+    """
+    When to repeat a failed call.
+
+    Args:
+        max_retries (int): Attempts after the first one.
+        deadline (float): Seconds all attempts may take together; None for
+                          no limit.
+        base_delay (float): Backoff before the first retry, doubled for each
+                            further one.
+        max_delay (float): Upper bound of the backoff.
+    """
+
+    def __init__(self, max_retries=2, deadline=None, base_delay=0.5, max_delay=8):
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def expires_at(self):
+        """Monotonic time by which a call starting now has to be done."""
+        return None if self.deadline is None else time.monotonic() + self.deadline
+
+    def delay(self, attempt, expires_at):
+        """
+        Seconds to wait before retrying after failed ``attempt`` (0-based).
+
+        Returns:
+            float: Or None when no retry is left or the deadline would pass.
+        """
+        if attempt >= self.max_retries:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if expires_at is not None and time.monotonic() + delay >= expires_at:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a provider keeps failing.
+
+    Args:
+        name (str): Shown in the metrics, usually the model name.
+        failure_threshold (int): Consecutive transient failures that open it.
+        reset_timeout (float): Seconds it stays open before a probe call.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """
+        Raise ``ProviderUnavailable`` unless a call may be made now.
+
+        While half open only one probe call is let through at a time.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_timeout - now
+            # A probe that never reported back is replaced after a while
+            if remaining <= 0:
+                self.state = self.HALF_OPEN
+                self._opened_at = now
+                return
+            self.rejected += 1
+        raise ProviderUnavailable(max(remaining, 1))
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.trips += 1
+                self._opened_at = time.monotonic()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected,
+            }
+
+
+def breaker(name, failure_threshold=5, reset_timeout=30):
+    """Return the process-wide breaker ``name``, creating it on first use."""
+    with _stats_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
+
+
+def stats():
+    """Retries, stale answers and breaker states of this process."""
+    with _stats_lock:
+        counters = dict(_stats)
+        breakers = list(_breakers.values())
+    return {
+        **counters,
+        "breakers": {item.name: item.stats() for item in breakers},
+    }
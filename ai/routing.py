@@ -0,0 +1,208 @@
+"""
+Choice of model and backend for each chat model call.
+
+Every call belongs to a task, such as ``back_card_word`` or
+``topic_generation``, and ``ROUTING_TIERS`` maps each task to a tier: a
+small, fast model for single words and a larger one for idioms and topic
+lists (``ai.settings``). A ``Backend`` is an OpenAI-compatible endpoint with
+a model for each tier: OpenAI itself, and optionally a secondary endpoint
+such as a local server.
+
+The router offers the backends in order of preference. A ``LatencyTracker``
+keeps the latency and outcome of the last calls of every route, and a
+backend whose route is degraded (too many errors, a p95 latency over the
+limit, or an open circuit breaker) is moved behind the healthy ones. The
+usecases fail over to the next route when a call fails.
+
+Decisions are counted per task and route in ``Router.stats``; the usage
+records carry the backend and model, so their effect on latency and cost
+shows in the usage summary.
+"""
+
+import collections
+import dataclasses
+import threading
+
+from . import resilience
+
+
+@dataclasses.dataclass(frozen=True)
+class Backend:
+    """
+    An OpenAI-compatible endpoint.
+
+    ``base_url`` and ``api_key`` of None use the OpenAI client's defaults,
+    ``OPENAI_BASE_URL`` and ``OPENAI_API_KEY``. Only backends with
+    ``rate_limited`` share the provider budgets of ai.ratelimit.
+    """
+
+    name: str
+    models: dict
+    base_url: str | None = None
+    api_key: str | None = None
+    rate_limited: bool = True
+
+    def __hash__(self):
+        return hash(self.name)
+
+
+@dataclasses.dataclass(frozen=True)
+class Route:
+    """One model on one backend."""
+
+    backend: Backend
+    model_name: str
+
+    @property
+    def name(self):
+        return f"{self.backend.name}:{self.model_name}"
+
+
+def percentile(values, fraction):
+    """Return the value below which ``fraction`` of the sorted ``values`` lie."""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class LatencyTracker:
+    """
+    Rolling latency and error rate of the last ``window`` calls per route.
+
+    Args:
+        window (int): Calls remembered per route.
+        min_calls (int): Calls needed before a route can count as degraded.
+        max_error_rate (float): Share of failed calls that degrades a route.
+        max_p95 (float): Seconds of p95 latency that degrade a route; None
+                         to ignore latency.
+    """
+
+    def __init__(self, window=100, min_calls=10, max_error_rate=0.5, max_p95=None):
+        self.window = window
+        self.min_calls = min_calls
+        self.max_error_rate = max_error_rate
+        self.max_p95 = max_p95
+        self._calls = collections.defaultdict(
+            lambda: collections.deque(maxlen=self.window)
+        )
+        self._lock = threading.Lock()
+
+    def record(self, route_name, seconds, ok):
+        with self._lock:
+            self._calls[route_name].append((seconds, ok))
+
+    def clear(self):
+        with self._lock:
+            self._calls.clear()
+
+    def summary(self, route_name):
+        """Calls, p50 and p95 latency of successful calls, and error rate."""
+        with self._lock:
+            calls = list(self._calls.get(route_name, ()))
+        latencies = sorted(seconds for seconds, ok in calls if ok)
+        errors = sum(not ok for _, ok in calls)
+        p50, p95 = percentile(latencies, 0.5), percentile(latencies, 0.95)
+        return {
+            "calls": len(calls),
+            "p50_ms": None if p50 is None else round(p50 * 1000),
+            "p95_ms": None if p95 is None else round(p95 * 1000),
+            "error_rate": errors / len(calls) if calls else 0,
+        }
+
+    def degraded(self, route_name):
+        summary = self.summary(route_name)
+        if summary["calls"] < self.min_calls:
+            return False
+        if summary["error_rate"] >= self.max_error_rate:
+            return True
+        return (
+            self.max_p95 is not None
+            and summary["p95_ms"] is not None
+            and summary["p95_ms"] > self.max_p95 * 1000
+        )
+
+
+class Router:
+    """
+    Pick the routes of a call from the task's tier and the backends' health.
+
+    Args:
+        backends (list[Backend]): In order of preference.
+        tiers (dict): Tier of each task.
+        tracker (LatencyTracker): Health of the routes.
+        breaker_failures (int): Consecutive failures that open a route's
+                                circuit breaker.
+        breaker_reset (float): Seconds a route's breaker stays open.
+    """
+
+    def __init__(
+        self, backends, tiers, tracker=None, breaker_failures=5, breaker_reset=30
+    ):
+        self.backends = backends
+        self.tiers = tiers
+        self.tracker = tracker or LatencyTracker()
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.decisions = collections.Counter()
+        self.failovers = 0
+        self._lock = threading.Lock()
+
+    def breaker(self, route):
+        return resilience.breaker(route.name, self.breaker_failures, self.breaker_reset)
+
+    def healthy(self, route):
+        return self.breaker(
+            route
+        ).state == resilience.CircuitBreaker.CLOSED and not self.tracker.degraded(
+            route.name
+        )
+
+    def routes(self, task):
+        """
+        Return the routes to try for ``task``, healthy backends first.
+
+        Raises:
+            KeyError: If ``task`` has no tier.
+        """
+        tier = self.tiers[task]
+        routes = [Route(backend, backend.models[tier]) for backend in self.backends]
+        # Stable, so the order of preference holds among equals
+        routes.sort(key=lambda route: not self.healthy(route))
+        with self._lock:
+            self.decisions[f"{task} -> {routes[0].name}"] += 1
+        return routes
+
+    def primary(self, task):
+        """The route of ``task`` on the preferred backend, whatever its health."""
+        backend = self.backends[0]
+        return Route(backend, backend.models[self.tiers[task]])
+
+    def route_names(self):
+        """Names of the routes of every backend and tier."""
+        return {
+            Route(backend, model_name).name
+            for backend in self.backends
+            for model_name in backend.models.values()
+        }
+
+    def record(self, route, seconds, ok):
+        """Remember the latency and outcome of a call on ``route``."""
+        self.tracker.record(route.name, seconds, ok)
+
+    def failed_over(self):
+        with self._lock:
+            self.failovers += 1
+
+    def stats(self):
+        with self._lock:
+            decisions = dict(self.decisions)
+            failovers = self.failovers
+        routes = {}
+        for backend in self.backends:
+            for model_name in dict.fromkeys(backend.models.values()):
+                route = Route(backend, model_name)
+                routes[route.name] = {
+                    **self.tracker.summary(route.name),
+                    "healthy": self.healthy(route),
+                }
+        return {"routes": routes, "decisions": decisions, "failovers": failovers}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Optional
 
 
 class BackcardResponse(BaseModel):
@@ -30,6 +30,22 @@ class BackcardResponse(BaseModel):
     }
 
 
+class BatchBackcard(BackcardResponse):
+    """Schema for one backcard in a batch generation response."""
+
+    word_or_phrase: str = Field(
+        ..., description="The word or phrase exactly as given in the input"
+    )
+
+
+class BatchBackcardResponse(BaseModel):
+    """Schema for batch backcard generation response."""
+
+    backcards: list[BatchBackcard] = Field(
+        ..., description="One backcard per input word or phrase, in input order"
+    )
+
+
 class TopicCard(BaseModel):
     """Schema for a single card in topic generation."""
 
@@ -61,7 +77,7 @@ class TopicCard(BaseModel):
 class TopicGenerationResponse(BaseModel):
     """Schema for topic generation response."""
 
-    cards: List[TopicCard] = Field(..., description="List of generated cards")
+    cards: list[TopicCard] = Field(..., description="List of generated cards")
 
     model_config = {
         "json_schema_extra": {
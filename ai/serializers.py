@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from leitner.constants import LANGUAGE_CHOICES
+from .models import GenerationJob
 
 
 class BackcardGenerationSerializer(serializers.Serializer):
@@ -10,6 +11,18 @@ class BackcardGenerationSerializer(serializers.Serializer):
     target_language = serializers.ChoiceField(choices=LANGUAGE_CHOICES, required=True)
 
 
+class BatchBackcardGenerationSerializer(serializers.Serializer):
+    """Serializer for batch backcard generation request."""
+
+    words = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=200,
+    )
+    source_language = serializers.ChoiceField(choices=LANGUAGE_CHOICES, required=True)
+    target_language = serializers.ChoiceField(choices=LANGUAGE_CHOICES, required=True)
+
+
 class TopicCardsGenerationSerializer(serializers.Serializer):
     """Serializer for topic cards generation request."""
 
@@ -29,3 +42,21 @@ class TopicCardsGenerationSerializer(serializers.Serializer):
         except (ValueError, TypeError):
             pass
         return 50
+
+
+class GenerationJobSerializer(serializers.ModelSerializer):
+    """Serializer for the status and result of a generation job."""
+
+    class Meta:
+        model = GenerationJob
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "result",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
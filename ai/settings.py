@@ -1,30 +1,301 @@
-from ai.models import LLMConfiguration
-import getpass
+"""
+Configuration of the AI generation usecases.
+
+The chat model clients are not built when this module is imported: ``get_llm``
+builds each one on first use and shares it afterwards. Processes that never
+generate anything (migrations, the job worker's idle time, most management
+commands) neither import LangChain nor need an OpenAI API key.
+"""
+
+import datetime
+import decimal
+import functools
 import os
-from langchain_openai import ChatOpenAI
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
+from ai.models import LLMConfiguration
+from ai.routing import Backend
+
 load_dotenv()
 
-if not os.environ.get("OPENAI_API_KEY"):
-    os.environ["OPENAI_API_KEY"] = getpass.getpass("Enter your OpenAI API key: ")
+# OPENAI_MODEL is the name used in .env.dist and memobox.settings
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME") or os.getenv(
+    "OPENAI_MODEL", "gpt-4.1-nano"
+)
+
+# "openai", or "fake" to answer from ai.fake_llm without calling OpenAI
+LLM_BACKEND = os.getenv("AI_LLM_BACKEND", "openai")
+# Fake backend: median latency and its log-normal spread, answer pace and
+# share of failing calls
+FAKE_LLM_LATENCY = float(os.getenv("AI_FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("AI_FAKE_LLM_LATENCY_SIGMA", "0"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.getenv("AI_FAKE_LLM_TOKENS_PER_SECOND", "0"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("AI_FAKE_LLM_ERROR_RATE", "0"))
+
+# Cached backcards are keyed by model name, so fake answers never mix with real ones
+MODEL_NAME = OPENAI_MODEL_NAME if LLM_BACKEND == "openai" else LLM_BACKEND
+
+# Rate limits of the provider for MODEL_NAME, shared by all workers (see
+# ai.ratelimit); 0 turns a limit off
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("AI_LLM_REQUESTS_PER_MINUTE", "500")) or None
+LLM_TOKENS_PER_MINUTE = int(os.getenv("AI_LLM_TOKENS_PER_MINUTE", "200000")) or None
+# Seconds a call waits for the budget before it is refused with 503, and the
+# share of the budget that only interactive calls may use
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("AI_LLM_RATE_LIMIT_MAX_WAIT", "10"))
+LLM_INTERACTIVE_RESERVE = float(os.getenv("AI_LLM_INTERACTIVE_RESERVE", "0.2"))
+
+# Retries of transient provider errors within a call's deadline, and the
+# circuit breaker opened by consecutive failures (see ai.resilience)
+LLM_MAX_RETRIES = int(os.getenv("AI_LLM_MAX_RETRIES", "2"))
+LLM_BREAKER_FAILURES = int(os.getenv("AI_LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("AI_LLM_BREAKER_RESET", "30"))
+
+# Model routing (see ai.routing). Each task is sent to the "small" or "large"
+# model of a backend; both default to OPENAI_MODEL_NAME.
+LARGE_MODEL_NAME = (
+    os.getenv("AI_LARGE_MODEL_NAME", OPENAI_MODEL_NAME)
+    if LLM_BACKEND == "openai"
+    else LLM_BACKEND
+)
+ROUTING_TIERS = {
+    "back_card_word": os.getenv("AI_ROUTE_BACK_CARD_WORD", "small"),
+    "back_card_phrase": os.getenv("AI_ROUTE_BACK_CARD_PHRASE", "large"),
+    "batch_back_card": os.getenv("AI_ROUTE_BATCH_BACK_CARD", "small"),
+    "topic_generation": os.getenv("AI_ROUTE_TOPIC_GENERATION", "large"),
+}
+# A secondary OpenAI-compatible endpoint, e.g. a local server, used when
+# the primary one fails or degrades
+FALLBACK_BASE_URL = os.getenv("AI_FALLBACK_BASE_URL")
+FALLBACK_API_KEY = os.getenv("AI_FALLBACK_API_KEY", "none")
+FALLBACK_MODEL_NAME = os.getenv("AI_FALLBACK_MODEL_NAME", OPENAI_MODEL_NAME)
+FALLBACK_LARGE_MODEL_NAME = os.getenv(
+    "AI_FALLBACK_LARGE_MODEL_NAME", FALLBACK_MODEL_NAME
+)
+# Calls remembered per route, and the error rate and p95 latency in seconds
+# over them that degrade a route; 0 ignores latency
+ROUTING_WINDOW = int(os.getenv("AI_ROUTING_WINDOW", "100"))
+ROUTING_MIN_CALLS = int(os.getenv("AI_ROUTING_MIN_CALLS", "10"))
+ROUTING_MAX_ERROR_RATE = float(os.getenv("AI_ROUTING_MAX_ERROR_RATE", "0.5"))
+ROUTING_MAX_P95 = float(os.getenv("AI_ROUTING_MAX_P95", "0")) or None
+
+BACKENDS = [
+    Backend(
+        name=LLM_BACKEND,
+        models={"small": MODEL_NAME, "large": LARGE_MODEL_NAME},
+    )
+]
+if FALLBACK_BASE_URL:
+    BACKENDS.append(
+        Backend(
+            name="fallback",
+            models={"small": FALLBACK_MODEL_NAME, "large": FALLBACK_LARGE_MODEL_NAME},
+            base_url=FALLBACK_BASE_URL,
+            api_key=FALLBACK_API_KEY,
+            rate_limited=False,
+        )
+    )
+
+# Connections to the OpenAI-compatible backends, shared by all clients of a
+# process (see ai.http_client); HTTP/2 needs the h2 package
+HTTP_MAX_CONNECTIONS = int(os.getenv("AI_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("AI_HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("AI_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP2 = os.getenv("AI_HTTP2", "True") == "True"
 
 back_card_setting = LLMConfiguration(
-    model_name=os.getenv("OPENAI_MODEL_NAME"), temperature=1, max_tokens=1000
+    model_name=MODEL_NAME,
+    temperature=1,
+    max_tokens=1000,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    timeout=15,
+    deadline=25,
 )
 
-back_card_llm = ChatOpenAI(
-    model=back_card_setting.model_name,
-    temperature=back_card_setting.temperature,
-    max_tokens=back_card_setting.max_tokens,
+# Batch calls return up to BACKCARD_BATCH_SIZE backcards at once
+batch_back_card_setting = LLMConfiguration(
+    model_name=MODEL_NAME,
+    temperature=1,
+    max_tokens=8000,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    timeout=60,
+    deadline=90,
 )
 
 topic_generation_setting = LLMConfiguration(
-    model_name=os.getenv("OPENAI_MODEL_NAME"), temperature=1, max_tokens=3000
+    model_name=MODEL_NAME,
+    temperature=1,
+    max_tokens=3000,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    timeout=45,
+    deadline=60,
 )
 
-topic_generation_llm = ChatOpenAI(
-    model=topic_generation_setting.model_name,
-    temperature=topic_generation_setting.temperature,
-    max_tokens=topic_generation_setting.max_tokens,
+LLM_SETTINGS = {
+    "back_card": back_card_setting,
+    "batch_back_card": batch_back_card_setting,
+    "topic_generation": topic_generation_setting,
+}
+
+_llms = {}
+_llms_lock = threading.Lock()
+
+
+def build_llm(setting, route=None):
+    """
+    Build a chat model client for an ``LLMConfiguration``, for the model and
+    backend of ``route`` if given.
+    """
+    from ai.callbacks import UsageCallbackHandler
+
+    backend = route.backend if route else BACKENDS[0]
+    callbacks = (
+        [UsageCallbackHandler(backend=backend.name)] if USAGE_RECORDING else None
+    )
+    if LLM_BACKEND == "fake":
+        from ai.fake_llm import FakeChatModel
+
+        return FakeChatModel(
+            timeout=setting.timeout,
+            latency=FAKE_LLM_LATENCY,
+            latency_sigma=FAKE_LLM_LATENCY_SIGMA,
+            tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND,
+            error_rate=FAKE_LLM_ERROR_RATE,
+            callbacks=callbacks,
+        )
+    if LLM_BACKEND != "openai":
+        raise ImproperlyConfigured(
+            f"Unknown AI_LLM_BACKEND {LLM_BACKEND!r}; use 'openai' or 'fake'."
+        )
+    if not backend.api_key and not os.environ.get("OPENAI_API_KEY"):
+        raise ImproperlyConfigured(
+            "OPENAI_API_KEY is not set; add it to the environment or .env file."
+        )
+    from langchain_openai import ChatOpenAI
+    from ai import http_client
+
+    # The OpenAI client's defaults unless the backend has its own endpoint
+    endpoint = {
+        key: value
+        for key, value in (("base_url", backend.base_url), ("api_key", backend.api_key))
+        if value
+    }
+    return ChatOpenAI(
+        model=route.model_name if route else setting.model_name,
+        **endpoint,
+        temperature=setting.temperature,
+        max_tokens=setting.max_tokens,
+        timeout=setting.timeout,
+        # Retried by the usecases, see ai.resilience
+        max_retries=0,
+        # Report token usage on streamed calls too
+        stream_usage=True,
+        http_client=http_client.client(),
+        http_async_client=http_client.async_client(),
+        callbacks=callbacks,
+    )
+
+
+def get_llm(name, route=None):
+    """
+    Return the shared chat model client configured under ``name`` in
+    ``LLM_SETTINGS``, for ``route`` if given, building it on first use.
+
+    Raises:
+        ImproperlyConfigured: If the backend is unknown or the OpenAI API
+            key is missing.
+    """
+    key = (name, route.name if route else None)
+    with _llms_lock:
+        if key not in _llms:
+            _llms[key] = build_llm(LLM_SETTINGS[name], route)
+        return _llms[key]
+
+
+def llm_factory(name):
+    """
+    Return a callable that builds the client ``name``, optionally for a
+    route, when first called.
+    """
+    return functools.partial(get_llm, name)
+
+
+def __getattr__(name):
+    # back_card_llm, batch_back_card_llm and topic_generation_llm are built
+    # on first access
+    if name.endswith("_llm") and name[: -len("_llm")] in LLM_SETTINGS:
+        return get_llm(name[: -len("_llm")])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Generated backcards are cached per word, language pair, model and prompt
+BACKCARD_CACHE_SIZE = int(os.getenv("AI_BACKCARD_CACHE_SIZE", "2048"))
+BACKCARD_CACHE_TTL = datetime.timedelta(
+    days=int(os.getenv("AI_BACKCARD_CACHE_TTL_DAYS", "30"))
 )
+
+# Words per batch backcard call and batch calls in flight per request
+BACKCARD_BATCH_SIZE = int(os.getenv("AI_BACKCARD_BATCH_SIZE", "25"))
+BACKCARD_BATCH_CONCURRENCY = int(os.getenv("AI_BACKCARD_BATCH_CONCURRENCY", "4"))
+
+# Concurrent calls when a topic request is split into shards of up to 50 cards
+TOPIC_FANOUT_CONCURRENCY = int(os.getenv("AI_TOPIC_FANOUT_CONCURRENCY", "5"))
+
+# Words of the target box named in the prompt of a topic request as words
+# not to generate; all of the box's words are filtered from the result
+TOPIC_EXCLUDE_HINT_SIZE = int(os.getenv("AI_TOPIC_EXCLUDE_HINT_SIZE", "100"))
+
+# Generated topic cards are pooled per normalized topic, language pair, model
+# and prompt (see ai.cache.TopicCache). Requests for a topic without a pool
+# use the pool of the most similar topic from TOPIC_CACHE_MIN_SIMILARITY
+# (0-1) on; a miss generates at least TOPIC_CACHE_POOL_SIZE cards.
+TOPIC_MODEL_NAME = BACKENDS[0].models[ROUTING_TIERS["topic_generation"]]
+TOPIC_CACHE_TTL = datetime.timedelta(
+    days=int(os.getenv("AI_TOPIC_CACHE_TTL_DAYS", "30"))
+)
+TOPIC_CACHE_MIN_SIMILARITY = float(os.getenv("AI_TOPIC_CACHE_MIN_SIMILARITY", "0.65"))
+TOPIC_CACHE_CANDIDATES = int(os.getenv("AI_TOPIC_CACHE_CANDIDATES", "1000"))
+TOPIC_CACHE_POOL_SIZE = int(os.getenv("AI_TOPIC_CACHE_POOL_SIZE", "0"))
+
+# Usage of every model call is recorded by a background thread (see ai.usage)
+# and written every USAGE_FLUSH_INTERVAL seconds
+USAGE_RECORDING = os.getenv("AI_USAGE_RECORDING", "True") == "True"
+USAGE_FLUSH_INTERVAL = float(os.getenv("AI_USAGE_FLUSH_INTERVAL", "2"))
+
+# Per-user quotas of the generation endpoints (see ai.throttling): one token
+# bucket of estimated LLM tokens per user, sized by the user's plan as
+# (capacity, tokens refilled per hour); None means no limit
+QUOTAS_ENABLED = os.getenv("AI_QUOTAS_ENABLED", "True") == "True"
+QUOTA_PLANS = {
+    "free": (
+        int(os.getenv("AI_QUOTA_FREE_CAPACITY", "20000")),
+        int(os.getenv("AI_QUOTA_FREE_PER_HOUR", "20000")),
+    ),
+    "pro": (
+        int(os.getenv("AI_QUOTA_PRO_CAPACITY", "100000")),
+        int(os.getenv("AI_QUOTA_PRO_PER_HOUR", "200000")),
+    ),
+    "unlimited": None,
+}
+
+# Backcards of the most common words are generated ahead of time by
+# "manage.py pregenerate_backcards" (see ai.pregenerate): words per run, and
+# USD its calls may cost per day (0 = no limit; needs usage recording)
+PREGENERATE_MAX_WORDS = int(os.getenv("AI_PREGENERATE_MAX_WORDS", "2000"))
+PREGENERATE_DAILY_BUDGET = decimal.Decimal(
+    os.getenv("AI_PREGENERATE_DAILY_BUDGET", "1.00")
+)
+
+# USD per million prompt and completion tokens; other models are recorded at 0
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
@@ -0,0 +1,230 @@
+"""
+Coalescing of identical concurrent LLM calls ("single flight").
+
+When many users ask for the same word at the same moment, only the first
+caller makes the LLM call; the others wait for its outcome. Within a process
+the waiters block on the leader's event (or future, for async callers).
+Across workers the leader holds a short-lived lock in the Django cache and
+publishes its outcome there, so this needs a cache backend shared by the
+workers (Redis, Memcached or the database cache) to coalesce between them.
+The lock holds a token of the leader's call and the outcome is stored under
+that token, so a waiter never reads the outcome of an earlier call.
+
+A failed call is not retried by the waiters: they all raise, the in-process
+ones with the leader's exception and the others with ``SingleFlightError``.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Long enough for waiters polling every ``poll_interval`` to see the outcome
+OUTCOME_TIMEOUT = 30
+
+
+class SingleFlightError(Exception):
+    """The call this caller waited on failed in another worker, or never finished."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Run at most one call per key at a time and share its outcome.
+
+    Args:
+        namespace (str): Prefix of the cache keys, one per kind of call.
+        lock_timeout (float): Seconds after which a leader is presumed dead
+                              and waiters stop waiting for it.
+        poll_interval (float): Seconds between polls of the shared outcome.
+    """
+
+    def __init__(self, namespace, lock_timeout=120, poll_interval=0.1):
+        self.namespace = namespace
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _keys(self, key):
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        prefix = f"ai:single-flight:{self.namespace}:{digest}"
+        return f"{prefix}:lock", f"{prefix}:outcome"
+
+    @staticmethod
+    def _outcome_key(outcome_prefix, token):
+        """Key of the outcome of the call whose lock holds ``token``."""
+        return f"{outcome_prefix}:{token}"
+
+    def _count(self, leader):
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+    @staticmethod
+    def _unpack(outcome):
+        state, value = outcome
+        if state == "error":
+            raise SingleFlightError(value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced}
+
+    def do(self, key, fn):
+        """
+        Return ``fn()``, or the result of an identical call already in flight.
+
+        Args:
+            key (str): Identifies identical calls.
+            fn (callable): Makes the call; only run by the leader.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self._count(leader=False)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._do_shared(key, fn)
+            return call.result
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, key, fn):
+        lock_key, outcome_prefix = self._keys(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            token = uuid.uuid4().hex
+            if cache.add(lock_key, token, self.lock_timeout):
+                self._count(leader=True)
+                outcome_key = self._outcome_key(outcome_prefix, token)
+                try:
+                    result = fn()
+                except Exception as exc:
+                    cache.set(
+                        outcome_key,
+                        ("error", str(exc) or exc.__class__.__name__),
+                        OUTCOME_TIMEOUT,
+                    )
+                    raise
+                else:
+                    cache.set(outcome_key, ("ok", result), OUTCOME_TIMEOUT)
+                    return result
+                finally:
+                    if cache.get(lock_key) == token:
+                        cache.delete(lock_key)
+
+            leader_token = cache.get(lock_key)
+            if leader_token is None:
+                continue
+            self._count(leader=False)
+            outcome_key = self._outcome_key(outcome_prefix, leader_token)
+            while True:
+                outcome = cache.get(outcome_key)
+                if outcome is not None:
+                    return self._unpack(outcome)
+                if cache.get(lock_key) != leader_token:
+                    # The leader just finished or died; take over in the latter case
+                    outcome = cache.get(outcome_key)
+                    if outcome is not None:
+                        return self._unpack(outcome)
+                    break
+                if time.monotonic() > deadline:
+                    raise SingleFlightError(
+                        "Timed out waiting for an identical request to finish"
+                    )
+                time.sleep(self.poll_interval)
+
+    async def ado(self, key, fn):
+        """Async version of ``do``; ``fn`` returns an awaitable."""
+        loop = asyncio.get_running_loop()
+        call_key = (id(loop), key)
+        future = self._async_calls.get(call_key)
+        if future is not None:
+            self._count(leader=False)
+            return await asyncio.shield(future)
+
+        future = self._async_calls[call_key] = loop.create_future()
+        try:
+            result = await self._ado_shared(key, fn)
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception retrieved in case nobody was waiting
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._async_calls[call_key]
+
+    async def _ado_shared(self, key, fn):
+        lock_key, outcome_prefix = self._keys(key)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            token = uuid.uuid4().hex
+            if await cache.aadd(lock_key, token, self.lock_timeout):
+                self._count(leader=True)
+                outcome_key = self._outcome_key(outcome_prefix, token)
+                try:
+                    result = await fn()
+                except Exception as exc:
+                    await cache.aset(
+                        outcome_key,
+                        ("error", str(exc) or exc.__class__.__name__),
+                        OUTCOME_TIMEOUT,
+                    )
+                    raise
+                else:
+                    await cache.aset(outcome_key, ("ok", result), OUTCOME_TIMEOUT)
+                    return result
+                finally:
+                    if await cache.aget(lock_key) == token:
+                        await cache.adelete(lock_key)
+
+            leader_token = await cache.aget(lock_key)
+            if leader_token is None:
+                continue
+            self._count(leader=False)
+            outcome_key = self._outcome_key(outcome_prefix, leader_token)
+            while True:
+                outcome = await cache.aget(outcome_key)
+                if outcome is not None:
+                    return self._unpack(outcome)
+                if await cache.aget(lock_key) != leader_token:
+                    outcome = await cache.aget(outcome_key)
+                    if outcome is not None:
+                        return self._unpack(outcome)
+                    break
+                if time.monotonic() > deadline:
+                    raise SingleFlightError(
+                        "Timed out waiting for an identical request to finish"
+                    )
+                await asyncio.sleep(self.poll_interval)
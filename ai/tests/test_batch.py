@@ -0,0 +1,209 @@
+from unittest.mock import Mock, patch
+
+import pytest
+from django.urls import reverse
+from langchain_core.messages import AIMessage
+from rest_framework import status
+
+from ai.cache import BackcardCache
+from ai.fake_llm import FakeChatModel
+from ai.schemas import BackcardResponse, BatchBackcard, BatchBackcardResponse
+from ai.usecases import GenerateBackCardsUsecase, GenerateBackCardUsecase
+
+
+def batch_answer(messages):
+    """Answer every numbered word of a batch prompt with its upper-cased form."""
+    lines = messages[1].content.split("\n")[1:-1]
+    words = [line.split("```")[1] for line in lines]
+    return BatchBackcardResponse(
+        backcards=[
+            BatchBackcard(word_or_phrase=word, translation=word.upper())
+            for word in words
+        ]
+    )
+
+
+@pytest.fixture
+def single_llm():
+    llm = Mock()
+    llm.with_structured_output.return_value.invoke.side_effect = lambda messages: (
+        BackcardResponse(translation="single")
+    )
+    return llm
+
+
+@pytest.fixture
+def batch_llm():
+    llm = Mock()
+    llm.with_structured_output.return_value.invoke.side_effect = batch_answer
+    return llm
+
+
+def make_usecase(single_llm, batch_llm, cache=None, batch_size=2):
+    backcard_usecase = GenerateBackCardUsecase(
+        llm=single_llm, prompt="Single prompt", cache=cache
+    )
+    return GenerateBackCardsUsecase(
+        llm=batch_llm,
+        prompt="Batch prompt",
+        backcard_usecase=backcard_usecase,
+        batch_size=batch_size,
+        concurrency=2,
+    )
+
+
+class TestGenerateBackCardsUsecase:
+    """Tests for batched backcard generation."""
+
+    def test_words_are_batched(self, single_llm, batch_llm):
+        usecase = make_usecase(single_llm, batch_llm)
+        batch_llm.with_structured_output.assert_called_once_with(
+            BatchBackcardResponse, include_raw=True
+        )
+
+        backcards, errors = usecase.generate(["one", "two", "three"], "EN", "DE")
+
+        assert {word: card.translation for word, card in backcards.items()} == {
+            "one": "ONE",
+            "two": "TWO",
+            "three": "THREE",
+        }
+        assert errors == {}
+        assert usecase.llm.invoke.call_count == 2
+        single_llm.with_structured_output.return_value.invoke.assert_not_called()
+        system_message = usecase.llm.invoke.call_args[0][0][0]
+        assert system_message.content == "Batch prompt"
+
+    def test_duplicates_share_one_slot(self, single_llm, batch_llm):
+        usecase = make_usecase(single_llm, batch_llm)
+
+        backcards, _ = usecase.generate(["Apple", "apple ", "pear"], "EN", "DE")
+
+        assert set(backcards) == {"Apple", "apple ", "pear"}
+        assert usecase.llm.invoke.call_count == 1
+
+    def test_omitted_words_fall_back_to_single_calls(self, single_llm, batch_llm):
+        usecase = make_usecase(single_llm, batch_llm)
+        usecase.llm.invoke.side_effect = lambda messages: BatchBackcardResponse(
+            backcards=[BatchBackcard(word_or_phrase="one", translation="ONE")]
+        )
+
+        backcards, errors = usecase.generate(["one", "two"], "EN", "DE")
+
+        assert backcards["one"].translation == "ONE"
+        assert backcards["two"].translation == "single"
+        assert errors == {}
+
+    def test_truncated_batch_keeps_its_complete_answers(self, single_llm, batch_llm):
+        usecase = make_usecase(single_llm, batch_llm, batch_size=3)
+        raw = AIMessage(
+            content="",
+            invalid_tool_calls=[
+                {
+                    "name": "BatchBackcardResponse",
+                    "args": '{"backcards": [{"word_or_phrase": "one", '
+                    '"translation": "ONE"}, {"word_or_phrase": "two", "transl',
+                    "id": "1",
+                }
+            ],
+        )
+        usecase.llm.invoke.side_effect = lambda messages: {
+            "raw": raw,
+            "parsed": None,
+            "parsing_error": ValueError("bad json"),
+        }
+
+        backcards, errors = usecase.generate(["one", "two", "three"], "EN", "DE")
+
+        assert {word: card.translation for word, card in backcards.items()} == {
+            "one": "ONE",
+            "two": "single",
+            "three": "single",
+        }
+        assert errors == {}
+        single = single_llm.with_structured_output.return_value.invoke
+        assert single.call_count == 2
+        assert all("one" not in call[0][0][1].content for call in single.call_args_list)
+
+    @pytest.mark.django_db
+    def test_omitted_words_are_parsed_and_cached(self, batch_llm):
+        cache = BackcardCache(model_name="gpt-test", prompt="Single prompt")
+        usecase = make_usecase(FakeChatModel(latency=0), batch_llm, cache=cache)
+        usecase.llm.invoke.side_effect = lambda messages: BatchBackcardResponse(
+            backcards=[BatchBackcard(word_or_phrase="one", translation="ONE")]
+        )
+
+        backcards, errors = usecase.generate(["one", "two"], "EN", "DE")
+
+        assert errors == {}
+        assert isinstance(backcards["two"], BackcardResponse)
+        assert cache.get("two", "EN", "DE") == backcards["two"]
+
+    def test_failed_batch_reports_errors(self, single_llm, batch_llm):
+        usecase = make_usecase(single_llm, batch_llm)
+
+        def flaky(messages):
+            if "one" in messages[1].content:
+                raise RuntimeError("timeout")
+            return batch_answer(messages)
+
+        usecase.llm.invoke.side_effect = flaky
+
+        backcards, errors = usecase.generate(["one", "two", "three"], "EN", "DE")
+
+        assert set(backcards) == {"three"}
+        assert errors == {"one": "timeout", "two": "timeout"}
+
+    @pytest.mark.django_db
+    def test_cache_is_consulted_and_filled(self, single_llm, batch_llm):
+        cache = BackcardCache(model_name="gpt-test", prompt="Single prompt")
+        cache.set("one", "EN", "DE", BackcardResponse(translation="cached"))
+        usecase = make_usecase(single_llm, batch_llm, cache=cache)
+
+        backcards, _ = usecase.generate(["one", "two"], "EN", "DE")
+
+        assert backcards["one"].translation == "cached"
+        assert "one" not in usecase.llm.invoke.call_args[0][0][1].content
+        assert cache.get("two", "EN", "DE").translation == "TWO"
+
+
+@pytest.mark.django_db
+class TestGenerateBackcardsView:
+    """Tests for the batch backcard endpoint."""
+
+    @patch("ai.views.generate_back_cards_usecase.generate")
+    def test_results_are_keyed_by_input(self, mock_generate, authenticated_client):
+        mock_generate.return_value = (
+            {"apple": BackcardResponse(translation="Apfel")},
+            {"pear": "timeout"},
+        )
+
+        response = authenticated_client.post(
+            reverse("ai:generate-backcards"),
+            {
+                "words": ["apple", "pear"],
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {
+            "backcards": {"apple": {"translation": "Apfel"}},
+            "errors": {"pear": "timeout"},
+        }
+        mock_generate.assert_called_once_with(
+            words=["apple", "pear"], source_language="EN", target_language="DE"
+        )
+
+    @patch("ai.views.generate_back_cards_usecase.generate")
+    def test_empty_list_is_rejected(self, mock_generate, authenticated_client):
+        response = authenticated_client.post(
+            reverse("ai:generate-backcards"),
+            {"words": [], "source_language": "EN", "target_language": "DE"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        mock_generate.assert_not_called()
@@ -0,0 +1,314 @@
+import datetime
+import re
+from unittest.mock import Mock, patch
+
+import pytest
+from django.db import OperationalError
+
+from ai.cache import (
+    BackcardCache,
+    TopicCache,
+    normalize_text,
+    normalize_topic,
+    similarity,
+)
+from ai.models import BackcardCacheEntry, TopicCacheEntry
+from ai.schemas import BackcardResponse, TopicCard, TopicGenerationResponse
+from ai.usecases import GenerateBackCardUsecase, GenerateTopicUsecase
+
+
+@pytest.fixture
+def cache():
+    return BackcardCache(model_name="gpt-test", prompt="Test prompt", max_entries=2)
+
+
+@pytest.fixture
+def structured_llm():
+    llm = Mock()
+    structured = Mock()
+    structured.invoke.return_value = BackcardResponse(translation="Apfel")
+    llm.with_structured_output.return_value = structured
+    return llm, structured
+
+
+def test_normalize_text():
+    assert normalize_text("  Apple\t Pie ") == "apple pie"
+    assert normalize_text("ＡＰＰＬＥ") == "apple"
+
+
+def test_key_covers_model_and_prompt(cache):
+    key = cache.key("apple", "EN", "DE")
+    assert key == cache.key(" Apple ", "en", "de")
+    assert key != cache.key("apple", "EN", "FR")
+    assert key != BackcardCache("gpt-other", "Test prompt").key("apple", "EN", "DE")
+    assert key != BackcardCache("gpt-test", "New prompt").key("apple", "EN", "DE")
+
+
+@pytest.mark.django_db
+class TestBackcardCache:
+    """Tests for the two cache tiers."""
+
+    def test_miss_then_memory_hit(self, cache):
+        assert cache.get("apple", "EN", "DE") is None
+        cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+
+        assert cache.get("Apple", "EN", "DE").translation == "Apfel"
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits_memory"] == 1
+
+    def test_db_tier_is_shared(self, cache):
+        cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+        other_worker = BackcardCache(model_name="gpt-test", prompt="Test prompt")
+
+        assert other_worker.get("apple", "EN", "DE").translation == "Apfel"
+        assert other_worker.stats()["hits_db"] == 1
+        assert BackcardCacheEntry.objects.get().hits == 1
+
+    def test_lru_evicts_oldest(self, cache):
+        for word in ("one", "two", "three"):
+            cache.set(word, "EN", "DE", BackcardResponse(translation=word))
+
+        assert cache.stats()["memory_entries"] == 2
+        assert cache.key("one", "EN", "DE") not in cache._entries
+
+    def test_expired_entries_are_ignored(self, cache):
+        cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+        cache.clear_memory()
+        BackcardCacheEntry.objects.update(
+            expires_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.UTC)
+        )
+
+        assert cache.get("apple", "EN", "DE") is None
+
+    def test_purge_removes_stale_versions(self, cache):
+        cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+        new_prompt = BackcardCache(model_name="gpt-test", prompt="New prompt")
+        new_prompt.set("pear", "EN", "DE", BackcardResponse(translation="Birne"))
+
+        assert new_prompt.purge() == 1
+        assert list(
+            BackcardCacheEntry.objects.values_list("front_card", flat=True)
+        ) == ["pear"]
+
+    def test_failed_db_write_keeps_memory_entry(self, cache):
+        with patch.object(
+            BackcardCacheEntry.objects,
+            "update_or_create",
+            side_effect=OperationalError("database is locked"),
+        ):
+            cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+
+        assert cache.get("apple", "EN", "DE").translation == "Apfel"
+        assert not BackcardCacheEntry.objects.exists()
+
+
+@pytest.mark.django_db
+class TestCachedUsecase:
+    """Tests for the cache in front of GenerateBackCardUsecase."""
+
+    def test_second_call_skips_llm(self, cache, structured_llm):
+        llm, structured = structured_llm
+        usecase = GenerateBackCardUsecase(llm=llm, prompt="Test prompt", cache=cache)
+
+        first = usecase.generate("apple", "EN", "DE")
+        second = usecase.generate("APPLE ", "EN", "DE")
+
+        assert first == second
+        structured.invoke.assert_called_once()
+
+    def test_without_cache_always_calls_llm(self, structured_llm):
+        llm, structured = structured_llm
+        usecase = GenerateBackCardUsecase(llm=llm, prompt="Test prompt")
+
+        usecase.generate("apple", "EN", "DE")
+        usecase.generate("apple", "EN", "DE")
+
+        assert structured.invoke.call_count == 2
+        assert not BackcardCacheEntry.objects.exists()
+
+
+def topic_cards(count, prefix="word"):
+    return TopicGenerationResponse(
+        cards=[TopicCard(front=f"{prefix} {i}", back=f"Wort {i}") for i in range(count)]
+    )
+
+
+@pytest.fixture
+def topic_cache():
+    return TopicCache(model_name="gpt-test", prompt="Test prompt")
+
+
+def test_normalize_topic():
+    assert normalize_topic("Foods & Drinks") == "food drink"
+    assert normalize_topic(" FOOD ") == normalize_topic("foods")
+    assert normalize_topic("Glass") == "glass"
+
+
+def test_topic_similarity():
+    assert similarity("food", "food drink") > 0.65
+    assert similarity("food", "fruit") == 0
+    assert similarity("kitchen", "chicken") < 0.65
+
+
+@pytest.mark.django_db
+class TestTopicCache:
+    """Tests for the pools of cached topic cards."""
+
+    def test_spelling_variants_share_a_pool(self, topic_cache):
+        topic_cache.set("Foods", "EN", "DE", topic_cards(10))
+
+        response = topic_cache.get("food", "EN", "DE", 10)
+
+        assert {card.front for card in response.cards} == {
+            f"word {i}" for i in range(10)
+        }
+        assert topic_cache.stats()["hits_exact"] == 1
+
+    def test_smaller_requests_get_a_sample(self, topic_cache):
+        topic_cache.set("Food", "EN", "DE", topic_cards(30))
+
+        response = topic_cache.get("Food", "EN", "DE", 5)
+
+        assert len(response.cards) == 5
+        assert len({card.front for card in response.cards}) == 5
+        assert topic_cache.get("Food", "EN", "DE", 31) is None
+
+    def test_excluded_words_are_left_out(self, topic_cache):
+        topic_cache.set("Food", "EN", "DE", topic_cards(10))
+
+        response = topic_cache.get("Food", "EN", "DE", 8, exclude={"word 0", "word 1"})
+
+        assert {card.front for card in response.cards} == {
+            f"word {i}" for i in range(2, 10)
+        }
+        assert (
+            topic_cache.get("Food", "EN", "DE", 9, exclude={"word 0", "word 1"}) is None
+        )
+
+    def test_similar_topic_is_used(self, topic_cache):
+        topic_cache.set("Food", "EN", "DE", topic_cards(10))
+
+        assert topic_cache.get("Food & drinks", "EN", "DE", 10) is not None
+        assert topic_cache.get("Fruit", "EN", "DE", 10) is None
+        assert topic_cache.get("Food", "EN", "FR", 10) is None
+        assert topic_cache.stats()["hits_similar"] == 1
+
+    def test_new_cards_are_added_to_the_pool(self, topic_cache):
+        topic_cache.set("Food", "EN", "DE", topic_cards(10))
+        topic_cache.set("food", "EN", "DE", topic_cards(15))
+
+        assert len(TopicCacheEntry.objects.get().cards) == 15
+
+    def test_purge_removes_expired_pools(self, topic_cache):
+        topic_cache.set("Food", "EN", "DE", topic_cards(10))
+        TopicCacheEntry.objects.update(
+            expires_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.UTC)
+        )
+
+        assert topic_cache.get("Food", "EN", "DE", 10) is None
+        assert topic_cache.purge() == 1
+
+
+@pytest.mark.django_db
+class TestCachedTopicUsecase:
+    """Tests for the cache in front of GenerateTopicUsecase."""
+
+    @staticmethod
+    def answer(messages):
+        """Answer with "word <i>" cards, leaving out the excluded words."""
+        content = messages[1].content
+        count = int(re.search(r"count:(\d+)", content).group(1))
+        excluded = re.search(r"exclude[^`]*```(.*?)```", content)
+        excluded = excluded.group(1).split("; ") if excluded else []
+        fronts = (f"word {i}" for i in range(count + len(excluded)))
+        return TopicGenerationResponse(
+            cards=[
+                TopicCard(front=front, back="Wort")
+                for front in fronts
+                if front not in excluded
+            ][:count]
+        )
+
+    def usecase(self, topic_cache, pool_size=0):
+        llm = Mock()
+        llm.with_structured_output.return_value.invoke.side_effect = self.answer
+        return GenerateTopicUsecase(
+            llm=llm, prompt="Test prompt", cache=topic_cache, pool_size=pool_size
+        )
+
+    def test_pool_serves_smaller_requests(self, topic_cache):
+        usecase = self.usecase(topic_cache, pool_size=20)
+
+        first = usecase.generate_many("Food", "EN", "DE", 5)
+        second = usecase.generate_many("foods", "EN", "DE", 20)
+
+        assert len(first.cards) == 5
+        assert len(second.cards) == 20
+        usecase.llm.invoke.assert_called_once()
+
+    def test_excluded_words_stay_in_the_shared_pool(self, topic_cache):
+        usecase = self.usecase(topic_cache, pool_size=20)
+
+        first, _ = usecase.generate_excluding(
+            "Food", "EN", "DE", 5, existing=["word 0", "word 1"]
+        )
+        second = usecase.generate_many("Food", "EN", "DE", 20)
+
+        assert "word 0" not in {card.front for card in first.cards}
+        assert {"word 0", "word 1"} <= {card.front for card in second.cards}
+
+    def test_stream_is_cached_once_complete(self, topic_cache):
+        usecase = self.usecase(topic_cache)
+        usecase.streaming_llm.stream.return_value = iter(
+            [
+                Mock(
+                    tool_call_chunks=[
+                        {"args": '{"cards": [{"front": "apple", "back": "Apfel"}]}'}
+                    ]
+                )
+            ]
+        )
+
+        assert [card.front for card in usecase.stream("Food", "EN", "DE", 1)] == [
+            "apple"
+        ]
+        assert [card.front for card in usecase.stream("Food", "EN", "DE", 1)] == [
+            "apple"
+        ]
+        usecase.streaming_llm.stream.assert_called_once()
+
+    def test_unfinished_stream_is_not_cached(self, topic_cache):
+        usecase = self.usecase(topic_cache)
+        usecase.streaming_llm.stream.side_effect = lambda messages: iter(
+            [
+                Mock(
+                    tool_call_chunks=[
+                        {"args": '{"cards": [{"front": "apple", "back": "Apfel"}, {'}
+                    ]
+                )
+            ]
+        )
+
+        assert [card.front for card in usecase.stream("Food", "EN", "DE", 2)] == [
+            "apple"
+        ]
+        assert not TopicCacheEntry.objects.exists()
+
+    def test_stream_closed_early_is_not_cached(self, topic_cache):
+        usecase = self.usecase(topic_cache)
+        usecase.streaming_llm.stream.return_value = iter(
+            [
+                Mock(
+                    tool_call_chunks=[
+                        {"args": '{"cards": [{"front": "apple", "back": "Apfel"}, '},
+                        {"args": '{"front": "pear", "back": "Birne"}]}'},
+                    ]
+                )
+            ]
+        )
+
+        cards = usecase.stream("Food", "EN", "DE", 2)
+        assert next(cards).front == "apple"
+        cards.close()
+
+        assert not TopicCacheEntry.objects.exists()
@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import threading
+
+import openai
+import pytest
+from langchain_openai import ChatOpenAI
+
+from ai import settings as ai_settings
+from ai.fake_llm import FakeChatModel, FakeLLMError, make_server
+from ai.schemas import BackcardResponse
+from ai.usecases import (
+    GenerateBackCardsUsecase,
+    GenerateBackCardUsecase,
+    GenerateTopicUsecase,
+)
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeChatModel(latency=0)
+
+
+@contextlib.contextmanager
+def serving(model):
+    server = make_server(port=0, model=model)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def fake_server():
+    with serving(FakeChatModel(latency=0)) as base_url:
+        yield base_url
+
+
+class TestFakeChatModel:
+    """Tests for the usecases running against the fake model."""
+
+    def test_backcard_is_deterministic(self, fake_llm):
+        usecase = GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt")
+
+        first = usecase.generate("apple", "EN", "DE")
+
+        assert isinstance(first, BackcardResponse)
+        assert first.translation == "apple (DE)"
+        assert usecase.generate("apple", "EN", "DE") == first
+
+    def test_batch_answers_every_word(self, fake_llm):
+        usecase = GenerateBackCardsUsecase(
+            llm=fake_llm,
+            prompt="Prompt",
+            backcard_usecase=GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt"),
+        )
+
+        backcards, errors = usecase.generate(["one", "two"], "EN", "DE")
+
+        assert backcards["two"].translation == "two (DE)"
+        assert errors == {}
+
+    def test_topic_fan_out_gets_distinct_cards(self, fake_llm):
+        usecase = GenerateTopicUsecase(llm=fake_llm, prompt="Prompt")
+
+        response = usecase.generate_many("Food", "EN", "DE", count=120)
+
+        assert len({card.front for card in response.cards}) == 120
+
+    def test_stream_yields_cards(self):
+        usecase = GenerateTopicUsecase(
+            llm=FakeChatModel(latency=0, tokens_per_second=10_000), prompt="Prompt"
+        )
+
+        cards = list(usecase.stream("Food", "EN", "DE", count=3))
+
+        assert [card.front for card in cards] == ["Food 1", "Food 2", "Food 3"]
+
+    def test_async_generate(self, fake_llm):
+        usecase = GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt")
+
+        response = asyncio.run(usecase.agenerate("apple", "EN", "DE"))
+
+        assert response.translation == "apple (DE)"
+
+    def test_errors_are_injected(self):
+        usecase = GenerateBackCardUsecase(
+            llm=FakeChatModel(latency=0, error_rate=1), prompt="Prompt"
+        )
+
+        with pytest.raises(FakeLLMError):
+            usecase.generate("apple", "EN", "DE")
+
+    def test_latency_is_drawn_around_the_median(self):
+        llm = FakeChatModel(latency=1, latency_sigma=0.5, seed=1)
+
+        delays = sorted(llm.first_token_delay() for _ in range(1001))
+
+        assert delays[0] != delays[-1]
+        assert 0.8 < delays[500] < 1.2
+
+    def test_backend_is_selected_by_setting(self, monkeypatch):
+        monkeypatch.setattr(ai_settings, "_llms", {})
+        monkeypatch.setattr(ai_settings, "LLM_BACKEND", "fake")
+        monkeypatch.setattr(ai_settings, "FAKE_LLM_LATENCY", 0.25)
+
+        llm = ai_settings.get_llm("back_card")
+
+        assert isinstance(llm, FakeChatModel)
+        assert llm.latency == 0.25
+
+
+class TestFakeServer:
+    """Tests for the OpenAI-compatible stand-in."""
+
+    def test_openai_client_gets_structured_output(self, fake_server):
+        llm = ChatOpenAI(model="fake", api_key="test", base_url=fake_server)
+        usecase = GenerateBackCardUsecase(llm=llm, prompt="Prompt")
+
+        assert usecase.generate("apple", "EN", "DE").translation == "apple (DE)"
+
+    def test_openai_client_streams_tool_call(self, fake_server):
+        llm = ChatOpenAI(model="fake", api_key="test", base_url=fake_server)
+        usecase = GenerateTopicUsecase(llm=llm, prompt="Prompt")
+
+        cards = list(usecase.stream("Food", "EN", "DE", count=2))
+
+        assert [card.back for card in cards] == ["Food 1 (DE)", "Food 2 (DE)"]
+
+    def test_slow_answer_times_out_with_an_error_status(self):
+        with serving(FakeChatModel(latency=5, timeout=0.01)) as base_url:
+            llm = ChatOpenAI(
+                model="fake", api_key="test", base_url=base_url, max_retries=0
+            )
+
+            with pytest.raises(openai.InternalServerError) as error:
+                llm.invoke("apple")
+
+        assert error.value.status_code == 504
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+from ai import http_client
+from ai import settings as ai_settings
+
+
+@pytest.fixture
+def openai_backend(monkeypatch):
+    monkeypatch.setattr(ai_settings, "_llms", {})
+    monkeypatch.setattr(ai_settings, "LLM_BACKEND", "openai")
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+
+def test_clients_share_one_http_client(openai_backend):
+    back_card = ai_settings.get_llm("back_card")
+    topic = ai_settings.get_llm("topic_generation")
+
+    assert back_card.root_client._client is http_client.client()
+    assert topic.root_client._client is http_client.client()
+    assert topic.root_async_client._client is http_client.async_client()
+
+
+def test_forked_process_gets_its_own_pool(monkeypatch):
+    transport = http_client.ProcessTransport()
+    parent = transport.pool()
+    assert transport.pool() is parent
+
+    monkeypatch.setattr(os, "getpid", lambda: -1)
+
+    assert transport.pool() is not parent
+
+
+def test_each_event_loop_gets_its_own_pool():
+    transport = http_client.AsyncProcessTransport()
+
+    async def pools():
+        return transport.pool(), transport.pool()
+
+    first, same = asyncio.run(pools())
+    second, _ = asyncio.run(pools())
+
+    assert first is same
+    assert second is not first
+
+
+def test_pool_settings(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_MAX_CONNECTIONS", 7)
+    monkeypatch.setattr(http_client, "HTTP2", False)
+
+    pool = http_client.ProcessTransport().pool()._pool
+
+    assert pool._max_connections == 7
+    assert pool._http2 is False
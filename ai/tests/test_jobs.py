@@ -0,0 +1,177 @@
+import datetime
+import time
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from ai.jobs import JobWorker, claim_next_job, enqueue, run_pending
+from ai.models import GenerationJob
+from ai.schemas import BackcardResponse, TopicCard, TopicGenerationResponse
+from leitner.models import CustomUser
+
+
+@pytest.fixture
+def user(db):
+    return CustomUser.objects.create_user(
+        email="jobs@example.com", name="Job User", password="testpass123"
+    )
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+BACKCARD_PAYLOAD = {
+    "front_card": "Hello",
+    "source_language": "EN",
+    "target_language": "DE",
+}
+TOPIC_PAYLOAD = {
+    "topic": "Food",
+    "source_language": "EN",
+    "target_language": "DE",
+    "count": 2,
+}
+
+
+@pytest.mark.django_db
+class TestJobEndpoints:
+    """Tests for queueing and polling generation jobs."""
+
+    def test_backcard_job_is_accepted(self, authenticated_client, user):
+        """Queueing returns 202 with the job id and does not call the LLM."""
+        with patch("ai.usecases.generate_back_card_usecase.generate") as generate:
+            response = authenticated_client.post(
+                reverse("ai:generate-backcard-job"),
+                {
+                    "word_or_phrase": "Hello",
+                    "source_language": "EN",
+                    "target_language": "DE",
+                },
+            )
+
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        job = GenerationJob.objects.get(id=response.data["id"])
+        assert job.user == user
+        assert job.status == GenerationJob.STATUS_PENDING
+        assert job.payload == BACKCARD_PAYLOAD
+        assert response["Location"] == reverse("ai:generation-job", args=[job.id])
+        generate.assert_not_called()
+
+    def test_topic_job_invalid_language(self, authenticated_client):
+        """Invalid input is rejected before a job is stored."""
+        response = authenticated_client.post(
+            reverse("ai:generate-topic-cards-job"),
+            {"topic": "Food", "source_language": "XX", "target_language": "DE"},
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert not GenerationJob.objects.exists()
+
+    def test_poll_finished_job(self, authenticated_client, user):
+        """The status endpoint returns the result once the worker ran the job."""
+        job = enqueue(user, GenerationJob.KIND_TOPIC, TOPIC_PAYLOAD)
+        cards = TopicGenerationResponse(cards=[TopicCard(front="apple", back="Apfel")])
+        with patch(
+            "ai.usecases.generate_topic_usecase.answer", return_value=(cards, {None})
+        ) as generate:
+            assert run_pending() == 1
+
+        generate.assert_called_once_with(**TOPIC_PAYLOAD, exclude=None)
+        response = authenticated_client.get(reverse("ai:generation-job", args=[job.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["status"] == GenerationJob.STATUS_SUCCEEDED
+        assert response.data["result"] == cards.model_dump(exclude_none=True)
+
+    def test_other_users_job_is_hidden(self, authenticated_client):
+        other = CustomUser.objects.create_user(
+            email="other@example.com", name="Other", password="testpass123"
+        )
+        job = enqueue(other, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+
+        response = authenticated_client.get(reverse("ai:generation-job", args=[job.id]))
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+class TestJobWorker:
+    """Tests for claiming and running jobs."""
+
+    def test_backcards_are_claimed_before_topics(self, user):
+        topic = enqueue(user, GenerationJob.KIND_TOPIC, TOPIC_PAYLOAD)
+        backcard = enqueue(user, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+
+        assert claim_next_job().id == backcard.id
+        assert claim_next_job().id == topic.id
+        assert claim_next_job() is None
+
+    def test_claimed_job_is_not_claimed_again(self, user):
+        job = enqueue(user, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+
+        claimed = claim_next_job()
+
+        assert claimed.id == job.id
+        assert claimed.status == GenerationJob.STATUS_RUNNING
+        assert claimed.started_at is not None
+        assert claim_next_job() is None
+
+    def test_failed_job_stores_error(self, user):
+        job = enqueue(user, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+        with patch(
+            "ai.usecases.generate_back_card_usecase.generate",
+            side_effect=RuntimeError("rate limited"),
+        ):
+            run_pending()
+
+        job.refresh_from_db()
+        assert job.status == GenerationJob.STATUS_FAILED
+        assert job.error == "rate limited"
+        assert job.finished_at is not None
+
+    def test_succeeded_backcard_job(self, user):
+        job = enqueue(user, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+        with patch(
+            "ai.usecases.generate_back_card_usecase.generate",
+            return_value=BackcardResponse(translation="Hallo"),
+        ):
+            run_pending()
+
+        job.refresh_from_db()
+        assert job.status == GenerationJob.STATUS_SUCCEEDED
+        assert job.result == {"translation": "Hallo"}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_running_worker_requeues_stale_jobs(user):
+    """A job left running by a crashed worker is picked up without a restart."""
+    worker = JobWorker(threads=1, poll_interval=0.01, requeue_every=1)
+    with patch(
+        "ai.usecases.generate_back_card_usecase.generate",
+        return_value=BackcardResponse(translation="Hallo"),
+    ):
+        worker.start()
+        try:
+            job = enqueue(user, GenerationJob.KIND_BACKCARD, BACKCARD_PAYLOAD)
+            GenerationJob.objects.filter(pk=job.pk).update(
+                status=GenerationJob.STATUS_RUNNING,
+                started_at=timezone.now() - datetime.timedelta(hours=1),
+            )
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                job.refresh_from_db()
+                if job.status == GenerationJob.STATUS_SUCCEEDED:
+                    break
+                time.sleep(0.01)
+        finally:
+            worker.stop(timeout=5)
+
+    assert job.status == GenerationJob.STATUS_SUCCEEDED
+    assert job.result == {"translation": "Hallo"}
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from ai.parsing import JSONArrayItemParser, salvage_items, salvage_object
+
+DOCUMENT = json.dumps(
+    {
+        "cards": [
+            {"front": 'a {brace} "quote" [bracket]', "back": None},
+            {"front": "back\\slash", "nested": {"list": [1, 2]}},
+            {"front": "ünïcödé\nnewline", "back": "z"},
+        ]
+    },
+    ensure_ascii=False,
+)
+
+
+def feed_in_pieces(parser, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start : start + size]))
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(DOCUMENT)])
+def test_items_survive_any_split(size):
+    items = feed_in_pieces(JSONArrayItemParser("cards"), DOCUMENT, size)
+
+    assert items == json.loads(DOCUMENT)["cards"]
+
+
+def test_items_are_returned_as_soon_as_complete():
+    parser = JSONArrayItemParser("cards")
+
+    assert parser.feed('{"cards": [{"front": "apple"}, {"front": "pe') == [
+        {"front": "apple"}
+    ]
+    assert parser.feed('ar"}') == [{"front": "pear"}]
+    assert not parser.complete
+    assert parser.feed("]}") == []
+    assert parser.complete
+
+
+def test_other_keys_are_ignored():
+    parser = JSONArrayItemParser("cards")
+
+    items = parser.feed('{"meta": [{"front": "no"}], "cards": [{"front": "yes"}]}')
+
+    assert items == [{"front": "yes"}]
+
+
+def test_only_the_closed_array_completes_the_document():
+    parser = JSONArrayItemParser("cards")
+
+    parser.feed('{"meta": [], "cards": [{"front": "yes"}')
+
+    assert not parser.complete
+
+
+def test_buffer_does_not_grow_with_finished_items():
+    parser = JSONArrayItemParser("cards")
+    parser.feed('{"cards": [')
+    for _ in range(100):
+        parser.feed('{"front": "apple"},')
+
+    assert len(parser._buffer) < 20
+
+
+def test_complete_items_of_a_truncated_document_are_salvaged():
+    truncated = DOCUMENT[: DOCUMENT.index("ünïcödé") + 3]
+
+    assert salvage_items(truncated, "cards") == json.loads(DOCUMENT)["cards"][:2]
+
+
+@pytest.mark.parametrize(
+    "text, fields",
+    [
+        ('{"translation": "Apfel", "definition": "A fru', {"translation": "Apfel"}),
+        (
+            '```json\n{"translation": "Apfel", "pronunciation": "/a/",}\n```',
+            {
+                "translation": "Apfel",
+                "pronunciation": "/a/",
+            },
+        ),
+        ('{"translation": "Apfel", "definition": fruit}', {"translation": "Apfel"}),
+        ('{"translation": "Apf', {}),
+        ("no json", {}),
+    ],
+)
+def test_complete_fields_are_salvaged(text, fields):
+    assert salvage_object(text) == fields
@@ -0,0 +1,150 @@
+import datetime
+import decimal
+from unittest.mock import Mock
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from ai.cache import BackcardCache
+from ai.models import LLMUsageDaily
+from ai.pregenerate import ENDPOINT, frequent_words, pregenerate
+from ai.routing import Backend, Router
+from ai.schemas import BackcardResponse, BatchBackcard, BatchBackcardResponse
+from ai.usecases import GenerateBackCardsUsecase, GenerateBackCardUsecase
+from leitner.models import Box, Card, CustomUser, Language
+
+
+def batch_answer(messages):
+    lines = messages[1].content.split("\n")[1:-1]
+    words = [line.split("```")[1] for line in lines]
+    return BatchBackcardResponse(
+        backcards=[
+            BatchBackcard(word_or_phrase=word, translation=word.upper())
+            for word in words
+        ]
+    )
+
+
+@pytest.fixture
+def shared_words(db):
+    """Cards of three users: "apple" and "bread" are shared, "cheese" is not."""
+    english, _ = Language.objects.update_or_create(
+        name="English", defaults={"code": "en"}
+    )
+    spanish, _ = Language.objects.update_or_create(
+        name="Spanish", defaults={"code": "es"}
+    )
+    boxes = [
+        Box.objects.create(
+            name="Food",
+            user=CustomUser.objects.create_user(
+                email=f"user{i}@example.com", name=f"User {i}", password="pass"
+            ),
+            source_language=english,
+            target_language=spanish,
+        )
+        for i in range(3)
+    ]
+    for front, users in (("Apple", 3), (" apple", 1), ("bread", 2), ("cheese", 1)):
+        for owned in boxes[:users]:
+            Card.objects.create(box=owned, source_text=front, target_text="-")
+
+
+@pytest.fixture
+def usecase():
+    llm = Mock()
+    llm.with_structured_output.return_value.invoke.side_effect = batch_answer
+    backcard_usecase = GenerateBackCardUsecase(
+        llm=Mock(),
+        prompt="Single prompt",
+        cache=BackcardCache(model_name="test-model", prompt="Single prompt"),
+    )
+    return GenerateBackCardsUsecase(
+        llm=llm,
+        prompt="Batch prompt",
+        backcard_usecase=backcard_usecase,
+        batch_size=1,
+        concurrency=1,
+    )
+
+
+@pytest.mark.django_db
+class TestPregenerate:
+    """Tests for generating the backcards of common words ahead of time."""
+
+    def test_frequent_words_per_language_pair(self, shared_words):
+        assert frequent_words(min_users=2) == {("EN", "ES"): ["apple", "bread"]}
+        assert frequent_words(top=1, min_users=1) == {("EN", "ES"): ["apple"]}
+
+    def test_uncached_words_are_generated_into_the_cache(self, usecase):
+        cache = usecase.backcard_usecase.cache
+        cache.set("apple", "EN", "ES", BackcardResponse(translation="manzana"))
+
+        stats = pregenerate(usecase, {("EN", "ES"): ["apple", "bread"]})
+
+        assert stats["already_cached"] == 1
+        assert stats["generated"] == 1
+        assert stats["stopped"] == "done"
+        assert usecase.llm.invoke.call_count == 1
+        cache.clear_memory()
+        assert cache.get("bread", "EN", "ES").translation == "BREAD"
+
+    def test_words_routed_to_another_model_are_skipped(self, usecase):
+        router = Router(
+            [Backend("primary", {"small": "mini", "large": "big"})],
+            {
+                "back_card_word": "small",
+                "back_card_phrase": "large",
+                "batch_back_card": "small",
+            },
+        )
+        usecase.router = usecase.backcard_usecase.router = router
+
+        stats = pregenerate(usecase, {("EN", "ES"): ["apple", "break a leg"]})
+
+        assert (stats["generated"], stats["skipped"]) == (1, 1)
+        cache = usecase.backcard_usecase.cache
+        assert cache.get("apple", "EN", "ES", model_name="primary:mini")
+
+    def test_run_is_capped_and_resumable(self, usecase):
+        words = {("EN", "ES"): ["apple", "bread", "cheese"]}
+
+        first = pregenerate(usecase, words, max_words=2)
+        second = pregenerate(usecase, words, max_words=2)
+
+        assert (first["generated"], first["stopped"]) == (2, "max_words")
+        assert (second["already_cached"], second["generated"]) == (2, 1)
+        assert second["stopped"] == "done"
+        assert usecase.llm.invoke.call_count == 3
+
+    def test_daily_budget(self, usecase):
+        LLMUsageDaily.objects.create(
+            date=timezone.localdate(),
+            endpoint=ENDPOINT,
+            model_name="test-model",
+            cost=decimal.Decimal("1.5"),
+        )
+        LLMUsageDaily.objects.create(
+            date=timezone.localdate() - datetime.timedelta(days=1),
+            endpoint=ENDPOINT,
+            model_name="test-model",
+            cost=decimal.Decimal(5),
+        )
+        words = {("EN", "ES"): ["apple"]}
+
+        assert pregenerate(usecase, words, budget=decimal.Decimal(1))["stopped"] == (
+            "budget"
+        )
+        usecase.llm.invoke.assert_not_called()
+        assert pregenerate(usecase, words, budget=decimal.Decimal(2))["generated"] == 1
+
+    def test_command(self, shared_words, usecase, monkeypatch, capsys):
+        monkeypatch.setattr(
+            "ai.management.commands.pregenerate_backcards.generate_back_cards_usecase",
+            usecase,
+        )
+
+        call_command("pregenerate_backcards", "--budget", "0")
+
+        assert "Generated 2 backcards" in capsys.readouterr().out
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ai.models import LLMConfiguration
+from ai.ratelimit import BATCH, INTERACTIVE, ProviderBusy, ProviderLimiter
+from ai.usecases import GenerateBackCardUsecase, chat_messages
+
+MESSAGES = chat_messages("System prompt", "User message")
+
+
+def limiter(requests_per_minute=60, tokens_per_minute=None, **kwargs):
+    setting = LLMConfiguration(
+        model_name="test-model",
+        temperature=1,
+        max_tokens=100,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+    )
+    return ProviderLimiter(setting, **kwargs)
+
+
+class TestProviderLimiter:
+    """Tests for the provider-wide rate limiter."""
+
+    def test_sheds_calls_over_the_budget(self):
+        # 60 requests per minute allow a burst of 10
+        calls = limiter(max_wait=0)
+        for _ in range(10):
+            calls.acquire(MESSAGES)
+
+        with pytest.raises(ProviderBusy) as exc_info:
+            calls.acquire(MESSAGES)
+        assert exc_info.value.wait == 1
+
+    def test_waits_for_the_budget(self):
+        calls = limiter(requests_per_minute=600, max_wait=1)
+        for _ in range(100):
+            calls.acquire(MESSAGES)
+
+        start = time.monotonic()
+        calls.acquire(MESSAGES)
+
+        assert time.monotonic() - start >= 0.09
+
+    def test_counts_prompt_and_max_tokens(self):
+        # 6000 tokens per minute allow a burst of 1000, or 9 calls of 110
+        calls = limiter(requests_per_minute=None, tokens_per_minute=6000, max_wait=0)
+        for _ in range(9):
+            calls.acquire(chat_messages("x" * 20, "y" * 20))
+
+        with pytest.raises(ProviderBusy):
+            calls.acquire(chat_messages("x" * 20, "y" * 20))
+
+    def test_refused_call_takes_no_requests(self):
+        calls = limiter(requests_per_minute=60, tokens_per_minute=6000, max_wait=0)
+        big = chat_messages("x" * 3600, "")
+        calls.acquire(big)
+
+        for _ in range(5):
+            with pytest.raises(ProviderBusy):
+                calls.acquire(big)
+
+        assert calls.requests.consume("test-model", 9).allowed
+
+    def test_interactive_calls_keep_a_reserve(self):
+        batch = limiter(priority=BATCH, reserve=0.2, max_wait=0)
+        interactive = limiter(priority=INTERACTIVE, reserve=0.2, max_wait=0)
+        for _ in range(8):
+            batch.acquire(MESSAGES)
+
+        with pytest.raises(ProviderBusy):
+            batch.acquire(MESSAGES)
+        interactive.acquire(MESSAGES)
+        interactive.acquire(MESSAGES)
+        with pytest.raises(ProviderBusy):
+            interactive.acquire(MESSAGES)
+
+    def test_async_acquire(self):
+        calls = limiter(requests_per_minute=600, max_wait=0)
+
+        async def acquire():
+            for _ in range(100):
+                await calls.aacquire(MESSAGES)
+            await calls.aacquire(MESSAGES)
+
+        with pytest.raises(ProviderBusy):
+            asyncio.run(acquire())
+
+    def test_usecase_does_not_call_the_model_when_shed(self):
+        llm = MagicMock()
+        usecase = GenerateBackCardUsecase(
+            llm=llm, prompt="Prompt", limiter=limiter(requests_per_minute=6, max_wait=0)
+        )
+        usecase.generate("apple", "EN", "DE")
+
+        with pytest.raises(ProviderBusy):
+            usecase.generate("pear", "EN", "DE")
+        assert usecase.llm.invoke.call_count == 1
+
+
+@pytest.mark.django_db
+class TestProviderBusyResponses:
+    """Tests for the responses of shed calls."""
+
+    @patch("ai.views.generate_back_card_usecase.generate")
+    def test_view_returns_503(self, mock_generate, authenticated_client):
+        mock_generate.side_effect = ProviderBusy(2.5)
+
+        response = authenticated_client.post(
+            reverse("ai:generate-backcard"),
+            {
+                "word_or_phrase": "apple",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "3"
+
+    @patch("ai.views.generate_back_card_usecase.agenerate")
+    def test_async_view_returns_503(self, mock_generate, user):
+        mock_generate.side_effect = ProviderBusy(1)
+
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-backcard"),
+            {
+                "word_or_phrase": "apple",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            content_type="application/json",
+            headers={
+                "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+            },
+        )
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "1"
+        assert "X-RateLimit-Remaining-Tokens" in response
@@ -0,0 +1,177 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from django.urls import reverse
+from rest_framework import status
+
+from ai.cache import BackcardCache
+from ai.fake_llm import FakeChatModel, FakeLLMError, FakeLLMTimeout
+from ai.models import BackcardCacheEntry
+from ai.resilience import CircuitBreaker, ProviderUnavailable, RetryPolicy
+from ai.schemas import BackcardResponse
+from ai.usecases import GenerateBackCardUsecase
+
+ANSWER = BackcardResponse(translation="Apfel")
+
+
+def usecase(side_effect, retry=None, breaker=None, **kwargs):
+    llm = MagicMock()
+    usecase = GenerateBackCardUsecase(
+        llm=llm, prompt="Prompt", retry=retry, breaker=breaker, **kwargs
+    )
+    usecase.llm.invoke.side_effect = side_effect
+    usecase.llm.ainvoke = AsyncMock(side_effect=side_effect)
+    return usecase
+
+
+class TestRetries:
+    """Tests for retrying failed model calls."""
+
+    def test_transient_errors_are_retried(self):
+        generator = usecase(
+            [FakeLLMError("down"), TimeoutError(), ANSWER],
+            retry=RetryPolicy(max_retries=2, base_delay=0.001),
+        )
+
+        assert generator.generate("apple", "EN", "DE") == ANSWER
+        assert generator.llm.invoke.call_count == 3
+
+    def test_retries_are_bounded(self):
+        generator = usecase(
+            FakeLLMError("down"), retry=RetryPolicy(max_retries=2, base_delay=0.001)
+        )
+
+        with pytest.raises(FakeLLMError):
+            generator.generate("apple", "EN", "DE")
+        assert generator.llm.invoke.call_count == 3
+
+    def test_other_errors_are_not_retried(self):
+        generator = usecase(
+            ValueError("bad answer"), retry=RetryPolicy(max_retries=2, base_delay=0)
+        )
+
+        with pytest.raises(ValueError):
+            generator.generate("apple", "EN", "DE")
+        assert generator.llm.invoke.call_count == 1
+
+    def test_no_retry_past_the_deadline(self):
+        generator = usecase(
+            [FakeLLMError("down"), ANSWER],
+            retry=RetryPolicy(max_retries=2, deadline=0, base_delay=0.5),
+        )
+
+        with pytest.raises(FakeLLMError):
+            generator.generate("apple", "EN", "DE")
+
+    def test_async_calls_are_retried(self):
+        generator = usecase(
+            [FakeLLMError("down"), ANSWER],
+            retry=RetryPolicy(max_retries=1, base_delay=0.001),
+        )
+
+        assert asyncio.run(generator.agenerate("apple", "EN", "DE")) == ANSWER
+
+    def test_fake_model_times_out(self):
+        llm = FakeChatModel(latency=1, timeout=0.01)
+
+        with pytest.raises(FakeLLMTimeout):
+            GenerateBackCardUsecase(llm=llm, prompt="Prompt").generate(
+                "apple", "EN", "DE"
+            )
+
+
+class TestCircuitBreaker:
+    """Tests for failing fast while the provider is down."""
+
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+        generator = usecase(FakeLLMError("down"), breaker=breaker)
+        for _ in range(2):
+            with pytest.raises(FakeLLMError):
+                generator.generate("apple", "EN", "DE")
+
+        with pytest.raises(ProviderUnavailable) as exc_info:
+            generator.generate("apple", "EN", "DE")
+
+        assert generator.llm.invoke.call_count == 2
+        assert exc_info.value.wait == 30
+        assert breaker.stats() == {
+            "state": "open",
+            "failures": 2,
+            "trips": 1,
+            "rejected": 1,
+        }
+
+    def test_success_resets_the_count(self):
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        generator = usecase(
+            [FakeLLMError("down"), ANSWER, FakeLLMError("down")], breaker=breaker
+        )
+        for _ in range(3):
+            try:
+                generator.generate("apple", "EN", "DE")
+            except FakeLLMError:
+                pass
+
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_probe_closes_or_reopens(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.failure()
+
+        breaker.check()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        breaker.failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        breaker.check()
+        breaker.success()
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.trips == 2
+
+    def test_only_one_probe_at_a_time(self):
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.5)
+        breaker.failure()
+        breaker._opened_at -= 1
+
+        breaker.check()
+        with pytest.raises(ProviderUnavailable):
+            breaker.check()
+
+
+@pytest.mark.django_db
+class TestStaleAnswers:
+    """Tests for answering from expired cache entries while the provider fails."""
+
+    def test_expired_backcard_is_served(self):
+        cache = BackcardCache(model_name="test", prompt="Prompt")
+        cache.set("apple", "EN", "DE", ANSWER)
+        BackcardCacheEntry.objects.update(expires_at="2000-01-01T00:00Z")
+        cache.clear_memory()
+        breaker = CircuitBreaker("test", failure_threshold=1)
+        breaker.failure()
+
+        generator = usecase(ANSWER, breaker=breaker, cache=cache)
+
+        assert generator.generate("apple", "EN", "DE") == ANSWER
+        assert generator.llm.invoke.call_count == 0
+
+    def test_error_without_cache_entry(self):
+        cache = BackcardCache(model_name="test", prompt="Prompt")
+        generator = usecase(FakeLLMError("down"), cache=cache)
+
+        with pytest.raises(FakeLLMError):
+            generator.generate("apple", "EN", "DE")
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_view_returns_503(self, mock_generate, authenticated_client):
+        mock_generate.side_effect = ProviderUnavailable(12.5)
+
+        response = authenticated_client.post(
+            reverse("ai:generate-topic-cards"),
+            {"topic": "Food", "source_language": "EN", "target_language": "DE"},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response["Retry-After"] == "13"
@@ -0,0 +1,226 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from ai import resilience
+from ai.cache import BackcardCache, TopicCache
+from ai.fake_llm import FakeLLMError
+from ai.models import LLMUsageDaily
+from ai.resilience import RetryPolicy
+from ai.routing import Backend, LatencyTracker, Router
+from ai.schemas import BackcardResponse, TopicCard, TopicGenerationResponse
+from ai.usage import UsageRecorder
+from ai.usecases import GenerateBackCardUsecase, GenerateTopicUsecase
+
+ANSWER = BackcardResponse(translation="Apfel")
+TIERS = {"back_card_word": "small", "back_card_phrase": "large"}
+PRIMARY = Backend("primary", {"small": "mini", "large": "big"})
+LOCAL = Backend("local", {"small": "llama", "large": "llama"}, rate_limited=False)
+
+
+@pytest.fixture(autouse=True)
+def breakers(monkeypatch):
+    monkeypatch.setattr(resilience, "_breakers", {})
+
+
+def routed_usecase(router, answers, cache=None):
+    """A backcard usecase whose model for each route answers ``answers[route]``."""
+    llms = {}
+
+    def factory(route=None):
+        llm = MagicMock()
+        llm.with_structured_output.return_value.invoke.side_effect = answers[route.name]
+        llms[route.name] = llm
+        return llm
+
+    usecase = GenerateBackCardUsecase(
+        llm_factory=factory,
+        prompt="Prompt",
+        router=router,
+        retry=RetryPolicy(max_retries=2, base_delay=0.001),
+        cache=cache,
+    )
+    return usecase, llms
+
+
+class TestLatencyTracker:
+    """Tests for the rolling latency and error rate of the routes."""
+
+    def test_percentiles_of_successful_calls(self):
+        tracker = LatencyTracker(window=100)
+        for i in range(1, 101):
+            tracker.record("primary:mini", i / 1000, ok=True)
+        tracker.record("primary:mini", 5, ok=False)
+
+        summary = tracker.summary("primary:mini")
+
+        assert summary["calls"] == 100
+        assert summary["p50_ms"] == 51
+        assert summary["p95_ms"] == 96
+        assert summary["error_rate"] == 0.01
+
+    def test_degraded_by_errors(self):
+        tracker = LatencyTracker(min_calls=4, max_error_rate=0.5)
+        for ok in (True, False, False):
+            tracker.record("primary:mini", 0.1, ok)
+        assert not tracker.degraded("primary:mini")
+
+        tracker.record("primary:mini", 0.1, ok=True)
+
+        assert tracker.degraded("primary:mini")
+
+    def test_degraded_by_latency(self):
+        tracker = LatencyTracker(min_calls=2, max_p95=1)
+        tracker.record("primary:mini", 0.5, ok=True)
+        tracker.record("primary:mini", 3, ok=True)
+
+        assert tracker.degraded("primary:mini")
+
+
+class TestRouter:
+    """Tests for choosing the model and backend of each call."""
+
+    def test_routes_by_tier_in_order_of_preference(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+
+        routes = router.routes("back_card_phrase")
+
+        assert [route.name for route in routes] == ["primary:big", "local:llama"]
+        assert router.stats()["decisions"] == {"back_card_phrase -> primary:big": 1}
+
+    def test_degraded_backend_goes_last(self):
+        router = Router([PRIMARY, LOCAL], TIERS, LatencyTracker(min_calls=1))
+        router.record(router.routes("back_card_word")[0], 20, ok=False)
+
+        routes = router.routes("back_card_word")
+
+        assert [route.name for route in routes] == ["local:llama", "primary:mini"]
+        assert router.stats()["routes"]["primary:mini"]["healthy"] is False
+
+    def test_unknown_task(self):
+        with pytest.raises(KeyError):
+            Router([PRIMARY], TIERS).routes("topic_generation")
+
+
+class TestRoutedUsecase:
+    """Tests for the usecases calling the routed models."""
+
+    def test_words_and_phrases_use_their_tier(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+        usecase, llms = routed_usecase(
+            router, {"primary:mini": [ANSWER], "primary:big": [ANSWER]}
+        )
+
+        usecase.generate("apple", "EN", "DE")
+        usecase.generate("break a leg", "EN", "DE")
+
+        assert set(llms) == {"primary:mini", "primary:big"}
+        assert router.tracker.summary("primary:big")["calls"] == 1
+
+    def test_fails_over_to_the_secondary_backend(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+        usecase, _ = routed_usecase(
+            router, {"primary:mini": FakeLLMError("down"), "local:llama": [ANSWER]}
+        )
+
+        assert usecase.generate("apple", "EN", "DE") == ANSWER
+        assert router.stats()["failovers"] == 1
+        assert router.tracker.summary("primary:mini")["error_rate"] == 1
+
+    def test_skips_a_backend_whose_breaker_is_open(self):
+        router = Router([PRIMARY, LOCAL], TIERS, breaker_failures=1)
+        usecase, llms = routed_usecase(
+            router,
+            {"primary:mini": FakeLLMError("down"), "local:llama": [ANSWER, ANSWER]},
+        )
+        usecase.generate("apple", "EN", "DE")
+
+        assert usecase.generate("pear", "EN", "DE") == ANSWER
+        invoke = llms["primary:mini"].with_structured_output.return_value.invoke
+        assert invoke.call_count == 1
+
+    @pytest.mark.django_db
+    def test_answers_are_cached_under_the_model_that_gave_them(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+        cache = BackcardCache("mini", "Prompt")
+        usecase, _ = routed_usecase(
+            router, {"primary:mini": [ANSWER], "primary:big": [ANSWER]}, cache
+        )
+
+        usecase.generate("break a leg", "EN", "DE")
+
+        assert cache.get("break a leg", "EN", "DE") is None
+        assert cache.get("break a leg", "EN", "DE", model_name="primary:big") == ANSWER
+
+    @pytest.mark.django_db
+    def test_failed_over_answers_are_not_served_for_the_primary_model(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+        cache = BackcardCache("mini", "Prompt")
+        primary = BackcardResponse(translation="Apfel (primary)")
+        usecase, _ = routed_usecase(
+            router,
+            {
+                "primary:mini": [FakeLLMError("down"), primary],
+                "local:llama": [ANSWER],
+            },
+            cache,
+        )
+
+        assert usecase.generate("apple", "EN", "DE") == ANSWER
+        assert cache.get("apple", "EN", "DE", model_name="local:llama") == ANSWER
+        assert usecase.generate("apple", "EN", "DE") == primary
+        assert usecase.generate("apple", "EN", "DE") == primary
+
+    @pytest.mark.django_db
+    def test_failed_over_topic_cards_are_pooled_under_their_model(self):
+        router = Router([PRIMARY, LOCAL], {"topic_generation": "large"})
+        cache = TopicCache("big", "Prompt")
+        primary = TopicGenerationResponse(cards=[TopicCard(front="apple")])
+        local = TopicGenerationResponse(cards=[TopicCard(front="pear")])
+        answers = {
+            "primary:big": [FakeLLMError("down"), primary],
+            "local:llama": [local],
+        }
+
+        def factory(route=None):
+            llm = MagicMock()
+            llm.with_structured_output.return_value.invoke.side_effect = answers[
+                route.name
+            ]
+            return llm
+
+        usecase = GenerateTopicUsecase(
+            llm_factory=factory,
+            prompt="Prompt",
+            router=router,
+            retry=RetryPolicy(max_retries=2, base_delay=0.001),
+            cache=cache,
+        )
+
+        assert usecase.generate_many("Food", "EN", "DE", 1) == local
+        assert cache.get("Food", "EN", "DE", 1, model_name="local:llama") == local
+        assert usecase.generate_many("Food", "EN", "DE", 1) == primary
+        assert usecase.generate_many("Food", "EN", "DE", 1) == primary
+
+    def test_other_errors_do_not_fail_over(self):
+        router = Router([PRIMARY, LOCAL], TIERS)
+        usecase, llms = routed_usecase(router, {"primary:mini": ValueError("bad")})
+
+        with pytest.raises(ValueError):
+            usecase.generate("apple", "EN", "DE")
+        assert "local:llama" not in llms
+
+
+@pytest.mark.django_db
+def test_usage_rollups_are_kept_per_backend():
+    recorder = UsageRecorder()
+    recorder.autostart = False
+    recorder.record("llama", duration_ms=100, backend="local")
+    recorder.record("mini", duration_ms=50, backend="primary")
+
+    recorder.flush()
+
+    assert sorted(LLMUsageDaily.objects.values_list("backend", flat=True)) == [
+        "local",
+        "primary",
+    ]
@@ -0,0 +1,102 @@
+import os
+import subprocess
+import sys
+from unittest.mock import Mock
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+
+from ai import settings as ai_settings
+from ai.schemas import BackcardResponse, TopicGenerationResponse
+from ai.usecases import GenerateBackCardUsecase, GenerateTopicUsecase
+
+
+@pytest.fixture
+def no_clients(monkeypatch):
+    monkeypatch.setattr(ai_settings, "_llms", {})
+
+
+def test_get_llm_requires_api_key(monkeypatch, no_clients):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    with pytest.raises(ImproperlyConfigured, match="OPENAI_API_KEY"):
+        ai_settings.get_llm("back_card")
+
+
+def test_get_llm_builds_each_client_once(monkeypatch, no_clients):
+    build_llm = Mock(side_effect=lambda setting, route=None: Mock(setting=setting))
+    monkeypatch.setattr(ai_settings, "build_llm", build_llm)
+
+    first = ai_settings.get_llm("topic_generation")
+
+    assert ai_settings.topic_generation_llm is first
+    assert first.setting is ai_settings.topic_generation_setting
+    build_llm.assert_called_once()
+
+
+def test_model_name_falls_back_to_openai_model():
+    code = "import django; django.setup(); import ai.settings as s; print(s.OPENAI_MODEL_NAME)"
+    env = dict(os.environ, OPENAI_MODEL="gpt-fallback")
+    env.pop("OPENAI_MODEL_NAME", None)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    assert result.stdout.strip() == "gpt-fallback", result.stderr
+
+
+def test_usecase_factory_is_called_on_first_use():
+    llm = Mock()
+    factory = Mock(return_value=llm)
+    usecase = GenerateBackCardUsecase(prompt="Test prompt", llm_factory=factory)
+
+    factory.assert_not_called()
+    assert usecase.llm is llm.with_structured_output.return_value
+    assert usecase.llm is llm.with_structured_output.return_value
+    factory.assert_called_once()
+    llm.with_structured_output.assert_called_once_with(
+        BackcardResponse, include_raw=True
+    )
+
+
+def test_topic_usecase_shares_one_model_between_runnables():
+    llm = Mock()
+    factory = Mock(return_value=llm)
+    usecase = GenerateTopicUsecase(prompt="Test prompt", llm_factory=factory)
+
+    assert usecase.streaming_llm is not None
+    assert usecase.llm is not None
+
+    factory.assert_called_once()
+    llm.with_structured_output.assert_called_once_with(
+        TopicGenerationResponse, include_raw=True
+    )
+
+
+def test_usecase_needs_exactly_one_llm_source():
+    with pytest.raises(ValueError):
+        GenerateBackCardUsecase(prompt="Test prompt")
+    with pytest.raises(ValueError):
+        GenerateBackCardUsecase(llm=Mock(), prompt="Test prompt", llm_factory=Mock())
+
+
+def test_django_boot_does_not_import_langchain():
+    code = (
+        "import sys, django; django.setup(); "
+        "import memobox.urls, ai.usecases, ai.jobs; "
+        "print(sorted(m for m in sys.modules if m.startswith(('langchain', 'openai'))))"
+    )
+    env = dict(os.environ)
+    env.pop("OPENAI_API_KEY", None)
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+from django.core.cache import cache
+
+from ai.schemas import BackcardResponse
+from ai.singleflight import SingleFlight, SingleFlightError
+from ai.usecases import GenerateBackCardUsecase
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def run_concurrently(fn, n):
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        futures = [pool.submit(fn) for _ in range(n)]
+        return [future.exception() or future.result() for future in futures]
+
+
+class TestSingleFlight:
+    """Tests for coalescing within and across workers."""
+
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight("test")
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        results = run_concurrently(lambda: flight.do("apple", slow), 5)
+
+        assert results == ["result"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {"leaders": 1, "coalesced": 4}
+
+    def test_failure_propagates_to_waiters(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        def failing():
+            calls.append(1)
+            time.sleep(0.2)
+            raise RuntimeError("rate limited")
+
+        results = run_concurrently(lambda: flight.do("apple", failing), 4)
+
+        assert len(calls) == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_sequential_calls_are_not_coalesced(self):
+        flight = SingleFlight("test")
+        fn = Mock(return_value="result")
+
+        flight.do("apple", fn)
+        flight.do("apple", fn)
+
+        assert fn.call_count == 2
+
+    def test_other_worker_waits_for_shared_outcome(self):
+        """Two instances share only the Django cache, like two processes."""
+        leader, follower = (
+            SingleFlight("test"),
+            SingleFlight("test", poll_interval=0.01),
+        )
+        started = threading.Event()
+        follower_fn = Mock(return_value="follower")
+
+        def slow():
+            started.set()
+            time.sleep(0.2)
+            return "leader"
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(leader.do, "apple", slow)
+            started.wait(5)
+            assert follower.do("apple", follower_fn) == "leader"
+            assert first.result() == "leader"
+
+        follower_fn.assert_not_called()
+
+    def test_other_worker_never_sees_an_earlier_outcome(self, monkeypatch):
+        """A waiter that arrives right after a new leader took the lock."""
+        leader, follower = (
+            SingleFlight("test"),
+            SingleFlight("test", poll_interval=0.01),
+        )
+        assert leader.do("apple", lambda: "earlier") == "earlier"
+        started = threading.Event()
+
+        class SlowDeletes:
+            """Widens the window between taking the lock and calling ``fn``."""
+
+            def __getattr__(self, name):
+                return getattr(cache, name)
+
+            def delete(self, key, *args, **kwargs):
+                started.set()
+                time.sleep(0.2)
+                return cache.delete(key, *args, **kwargs)
+
+        monkeypatch.setattr("ai.singleflight.cache", SlowDeletes())
+
+        def slow():
+            started.set()
+            time.sleep(0.2)
+            return "later"
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(leader.do, "apple", slow)
+            started.wait(5)
+            assert follower.do("apple", Mock(return_value="follower")) == "later"
+            assert first.result() == "later"
+
+    def test_other_worker_sees_failure(self):
+        leader, follower = (
+            SingleFlight("test"),
+            SingleFlight("test", poll_interval=0.01),
+        )
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.2)
+            raise RuntimeError("rate limited")
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            first = pool.submit(leader.do, "apple", failing)
+            started.wait(5)
+            with pytest.raises(SingleFlightError, match="rate limited"):
+                follower.do("apple", Mock())
+            with pytest.raises(RuntimeError):
+                first.result()
+
+    def test_async_calls_share_one_result(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def main():
+            return await asyncio.gather(*(flight.ado("apple", slow) for _ in range(5)))
+
+        assert asyncio.run(main()) == ["result"] * 5
+        assert len(calls) == 1
+
+
+class TestCoalescedUsecase:
+    """Tests for single flight in front of GenerateBackCardUsecase."""
+
+    def test_identical_requests_make_one_llm_call(self):
+        llm = Mock()
+        structured = llm.with_structured_output.return_value
+
+        def invoke(messages):
+            time.sleep(0.2)
+            return BackcardResponse(translation="Apfel")
+
+        structured.invoke.side_effect = invoke
+        usecase = GenerateBackCardUsecase(
+            llm=llm, prompt="Test prompt", single_flight=SingleFlight("test")
+        )
+
+        results = run_concurrently(lambda: usecase.generate("apple", "EN", "DE"), 5)
+
+        assert all(result.translation == "Apfel" for result in results)
+        structured.invoke.assert_called_once()
@@ -0,0 +1,232 @@
+from unittest.mock import patch
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ai.schemas import BackcardResponse, TopicGenerationResponse
+from ai.throttling import TokenBucket, estimate_tokens
+
+TOPIC_REQUEST = {
+    "topic": "Food",
+    "source_language": "EN",
+    "target_language": "DE",
+    "count": 200,
+}
+
+
+class TestTokenBucket:
+    """Tests for the token bucket kept in the cache."""
+
+    def test_takes_tokens_until_empty(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+
+        first = bucket.consume("user", 600, now=100)
+        second = bucket.consume("user", 600, now=100)
+
+        assert first.allowed and first.remaining == 400
+        assert not second.allowed
+        assert second.remaining == 400
+        assert second.retry_after == pytest.approx(200)
+
+    def test_refused_request_is_not_charged(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+        bucket.consume("user", 900, now=100)
+
+        bucket.consume("user", 500, now=100)
+
+        assert bucket.consume("user", 100, now=100).allowed
+
+    def test_refills_over_time(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+        bucket.consume("user", 1000, now=100)
+
+        assert not bucket.consume("user", 10, now=105).allowed
+        assert bucket.consume("user", 10, now=110).allowed
+
+    def test_idle_bucket_does_not_grow_past_capacity(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+        bucket.consume("user", 100, now=100)
+
+        assert bucket.consume("user", 1000, now=100_000).remaining == 0
+        assert not bucket.consume("user", 1, now=100_000).allowed
+
+    def test_request_larger_than_bucket_needs_a_full_bucket(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+
+        assert bucket.consume("user", 5000, now=100).allowed
+        assert not bucket.consume("user", 5000, now=100).allowed
+
+    def test_refund_gives_back_the_charge(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+        status = bucket.consume("user", 600, now=100)
+
+        bucket.refund("user", status.charged)
+
+        assert bucket.consume("user", 1000, now=100).allowed
+
+    def test_buckets_are_per_key(self):
+        bucket = TokenBucket(capacity=1000, per_hour=3600)
+        bucket.consume("alice", 1000, now=100)
+
+        assert bucket.consume("bob", 1000, now=100).allowed
+
+
+def test_topic_estimate_scales_with_count():
+    assert estimate_tokens("topic", {"count": 200}) > 3 * estimate_tokens(
+        "topic", {"count": 50}
+    )
+    # Invalid counts fall back to the serializer's default
+    assert estimate_tokens("topic", {"count": "x"}) == estimate_tokens(
+        "topic", {"count": 50}
+    )
+
+
+@pytest.mark.django_db
+class TestQuotaViews:
+    """Tests for the quotas of the generation endpoints."""
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_topic_requests_run_out_of_quota(self, mock_generate, authenticated_client):
+        mock_generate.return_value = TopicGenerationResponse(cards=[])
+        url = reverse("ai:generate-topic-cards")
+
+        first = authenticated_client.post(url, TOPIC_REQUEST, format="json")
+        second = authenticated_client.post(url, TOPIC_REQUEST, format="json")
+
+        assert first.status_code == status.HTTP_200_OK
+        assert first["X-RateLimit-Limit-Tokens"] == "20000"
+        assert int(first["X-RateLimit-Remaining-Tokens"]) == 20000 - estimate_tokens(
+            "topic", TOPIC_REQUEST
+        )
+        assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(second["Retry-After"]) > 0
+        assert mock_generate.call_count == 1
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_rejected_request_is_not_charged(self, mock_generate, authenticated_client):
+        mock_generate.return_value = TopicGenerationResponse(cards=[])
+        url = reverse("ai:generate-topic-cards")
+
+        rejected = authenticated_client.post(
+            url, {**TOPIC_REQUEST, "source_language": "XX"}, format="json"
+        )
+        accepted = authenticated_client.post(url, TOPIC_REQUEST, format="json")
+
+        assert rejected.status_code == status.HTTP_400_BAD_REQUEST
+        assert rejected["X-RateLimit-Remaining-Tokens"] == "20000"
+        assert int(accepted["X-RateLimit-Remaining-Tokens"]) == 20000 - (
+            estimate_tokens("topic", TOPIC_REQUEST)
+        )
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_cached_answer_is_not_charged(
+        self, mock_generate, authenticated_client, usage_recorder
+    ):
+        def cached(**kwargs):
+            usage_recorder.record_cache_hit("gpt-test")
+            return TopicGenerationResponse(cards=[])
+
+        mock_generate.side_effect = cached
+        url = reverse("ai:generate-topic-cards")
+
+        responses = [
+            authenticated_client.post(url, TOPIC_REQUEST, format="json")
+            for _ in range(2)
+        ]
+
+        assert [response.status_code for response in responses] == [200, 200]
+        assert responses[1]["X-RateLimit-Remaining-Tokens"] == "20000"
+
+    @patch("ai.views.generate_topic_usecase.agenerate_many")
+    def test_async_cached_answer_is_not_charged(
+        self, mock_generate, user, usage_recorder
+    ):
+        async def cached(**kwargs):
+            usage_recorder.record_cache_hit("gpt-test")
+            return TopicGenerationResponse(cards=[])
+
+        mock_generate.side_effect = cached
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-topic-cards"),
+            TOPIC_REQUEST,
+            content_type="application/json",
+            headers={
+                "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+            },
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["X-RateLimit-Remaining-Tokens"] == "20000"
+
+    @patch("ai.views.generate_back_card_usecase.generate")
+    def test_quota_is_shared_between_endpoints(
+        self, mock_generate, authenticated_client
+    ):
+        mock_generate.return_value = BackcardResponse(translation="Apfel")
+        with patch("ai.views.generate_topic_usecase.generate_many") as generate_many:
+            generate_many.return_value = TopicGenerationResponse(cards=[])
+            authenticated_client.post(
+                reverse("ai:generate-topic-cards"), TOPIC_REQUEST, format="json"
+            )
+
+        response = authenticated_client.post(
+            reverse("ai:generate-backcard"),
+            {
+                "word_or_phrase": "apple",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            format="json",
+        )
+
+        assert int(response["X-RateLimit-Remaining-Tokens"]) < 20000 - estimate_tokens(
+            "topic", TOPIC_REQUEST
+        )
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_unlimited_plan_is_not_throttled(
+        self, mock_generate, authenticated_client, user
+    ):
+        user.plan = user.PLAN_UNLIMITED
+        user.save()
+        mock_generate.return_value = TopicGenerationResponse(cards=[])
+
+        for _ in range(3):
+            response = authenticated_client.post(
+                reverse("ai:generate-topic-cards"), TOPIC_REQUEST, format="json"
+            )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-RateLimit-Remaining-Tokens" not in response
+
+    def test_other_box_actions_are_not_throttled(self, authenticated_client):
+        response = authenticated_client.get(reverse("box-list"))
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-RateLimit-Remaining-Tokens" not in response
+
+    @patch("ai.views.generate_topic_usecase.agenerate_many")
+    def test_async_view_is_throttled(self, mock_generate, user):
+        mock_generate.return_value = TopicGenerationResponse(cards=[])
+        headers = {
+            "Authorization": f"Bearer {RefreshToken.for_user(user).access_token}"
+        }
+
+        def post():
+            return async_to_sync(AsyncClient().post)(
+                reverse("ai:async-generate-topic-cards"),
+                TOPIC_REQUEST,
+                content_type="application/json",
+                headers=headers,
+            )
+
+        first, second = post(), post()
+
+        assert first.status_code == status.HTTP_200_OK
+        assert "X-RateLimit-Remaining-Tokens" in first
+        assert second.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert int(second["Retry-After"]) > 0
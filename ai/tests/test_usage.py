@@ -0,0 +1,245 @@
+import asyncio
+import datetime
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from ai import usage
+from ai.cache import BackcardCache
+from ai.callbacks import UsageCallbackHandler
+from ai.fake_llm import FakeChatModel, FakeLLMError
+from ai.models import LLMUsage, LLMUsageDaily
+from ai.schemas import BackcardResponse
+from ai.usecases import GenerateBackCardUsecase, GenerateTopicUsecase
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeChatModel(latency=0, callbacks=[UsageCallbackHandler()])
+
+
+@pytest.mark.django_db
+class TestUsageRecording:
+    """Tests for recording model calls and cache hits."""
+
+    def test_call_is_recorded_for_scope(self, fake_llm, user, usage_recorder):
+        usecase = GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt")
+
+        with usage.scope(user.id, "generate-backcard"):
+            usecase.generate("apple", "EN", "DE")
+        assert usage_recorder.flush() == 1
+
+        record = LLMUsage.objects.get()
+        assert record.user == user
+        assert record.endpoint == "generate-backcard"
+        assert record.model_name == "fake"
+        assert record.outcome == LLMUsage.OUTCOME_SUCCESS
+        assert not record.cache_hit
+        assert record.prompt_tokens > 0 and record.completion_tokens > 0
+        assert record.ttft_ms is None
+        daily = LLMUsageDaily.objects.get()
+        assert (daily.user, daily.date, daily.calls) == (user, timezone.localdate(), 1)
+
+    def test_stream_records_time_to_first_token(self, user, usage_recorder):
+        llm = FakeChatModel(
+            latency=0.05, tokens_per_second=5000, callbacks=[UsageCallbackHandler()]
+        )
+        usecase = GenerateTopicUsecase(llm=llm, prompt="Prompt")
+
+        with usage.scope(user.id, "generate-topic-cards-stream"):
+            list(usecase.stream("Food", "EN", "DE", count=3))
+        usage_recorder.flush()
+
+        record = LLMUsage.objects.get()
+        assert 50 <= record.ttft_ms <= record.duration_ms
+        assert record.completion_tokens > 0
+
+    def test_closed_stream_is_cancelled(self, fake_llm, usage_recorder):
+        cards = GenerateTopicUsecase(llm=fake_llm, prompt="Prompt").stream(
+            "Food", "EN", "DE", count=10
+        )
+        next(cards)
+        cards.close()
+        usage_recorder.flush()
+
+        assert LLMUsage.objects.get().outcome == LLMUsage.OUTCOME_CANCELLED
+
+    def test_failed_call_is_recorded(self, usage_recorder):
+        llm = FakeChatModel(latency=0, error_rate=1, callbacks=[UsageCallbackHandler()])
+        usecase = GenerateBackCardUsecase(llm=llm, prompt="Prompt")
+
+        with pytest.raises(FakeLLMError):
+            usecase.generate("apple", "EN", "DE")
+        usage_recorder.flush()
+
+        assert LLMUsage.objects.get().outcome == LLMUsage.OUTCOME_ERROR
+        assert LLMUsageDaily.objects.get().errors == 1
+
+    def test_cache_hit_is_recorded(self, fake_llm, user, usage_recorder):
+        cache = BackcardCache(model_name="fake", prompt="Prompt")
+        cache.set("apple", "EN", "DE", BackcardResponse(translation="Apfel"))
+        usecase = GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt", cache=cache)
+
+        with usage.scope(user.id, "generate-backcard"):
+            usecase.generate("apple", "EN", "DE")
+        usage_recorder.flush()
+
+        record = LLMUsage.objects.get()
+        assert record.cache_hit
+        assert record.prompt_tokens == 0
+        assert LLMUsageDaily.objects.get().cache_hits == 1
+
+    def test_scope_follows_fan_out_threads(self, fake_llm, user, usage_recorder):
+        usecase = GenerateTopicUsecase(llm=fake_llm, prompt="Prompt")
+
+        with usage.scope(user.id, "generate-topic-cards"):
+            usecase.generate_many("Food", "EN", "DE", count=120)
+        usage_recorder.flush()
+
+        assert LLMUsage.objects.count() == 3
+        assert set(LLMUsage.objects.values_list("user", "endpoint")) == {
+            (user.id, "generate-topic-cards")
+        }
+
+    def test_scope_follows_async_calls(self, fake_llm, user, usage_recorder):
+        usecase = GenerateBackCardUsecase(llm=fake_llm, prompt="Prompt")
+
+        async def generate():
+            with usage.scope(user.id, "async-generate-backcard"):
+                await usecase.agenerate("apple", "EN", "DE")
+
+        asyncio.run(generate())
+        usage_recorder.flush()
+
+        assert LLMUsage.objects.get().endpoint == "async-generate-backcard"
+
+    def test_rollups_add_up_and_price_tokens(self, user, usage_recorder):
+        with usage.scope(user.id, "generate-backcard"):
+            usage_recorder.record(
+                "gpt-4.1-nano", prompt_tokens=1_000_000, completion_tokens=0
+            )
+            usage_recorder.flush()
+            usage_recorder.record(
+                "gpt-4.1-nano", prompt_tokens=0, completion_tokens=1_000_000
+            )
+            usage_recorder.flush()
+
+        daily = LLMUsageDaily.objects.get()
+        assert daily.calls == 2
+        assert daily.cost == Decimal("0.50")
+        assert daily.prompt_tokens == daily.completion_tokens == 1_000_000
+
+    def test_record_does_not_touch_the_database(
+        self, django_assert_num_queries, usage_recorder
+    ):
+        with django_assert_num_queries(0):
+            for _ in range(100):
+                usage_recorder.record("fake", duration_ms=1)
+
+        assert usage_recorder.stats()["queued"] == 100
+
+    def test_full_queue_drops_records(self):
+        recorder = usage.UsageRecorder(max_queue=1)
+        recorder.autostart = False
+
+        recorder.record("fake")
+        recorder.record("fake")
+
+        assert recorder.stats() == {"queued": 1, "written": 0, "dropped": 1}
+
+    def test_purge_keeps_rollups(self, usage_recorder):
+        usage_recorder.record("fake")
+        usage_recorder.flush()
+        LLMUsage.objects.update(created_at=timezone.now() - datetime.timedelta(days=40))
+
+        assert usage.purge(timezone.now() - datetime.timedelta(days=30)) == 1
+        assert LLMUsageDaily.objects.exists()
+
+
+@pytest.mark.django_db
+def test_view_scopes_calls_to_user(authenticated_client, user):
+    scopes = []
+
+    def generate(**kwargs):
+        scopes.append(usage.current_scope())
+        return BackcardResponse(translation="Apfel")
+
+    with patch("ai.views.generate_back_card_usecase.generate", side_effect=generate):
+        authenticated_client.post(
+            reverse("ai:generate-backcard"),
+            {
+                "word_or_phrase": "apple",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            format="json",
+        )
+
+    assert scopes == [(user.id, "generate-backcard")]
+    assert usage.current_scope() == (None, "")
+
+
+@pytest.mark.django_db(transaction=True)
+def test_background_thread_writes_records():
+    recorder = usage.UsageRecorder(flush_interval=0.01)
+
+    recorder.record("fake", duration_ms=5)
+    deadline = time.monotonic() + 5
+    while recorder.stats()["written"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert LLMUsage.objects.get().duration_ms == 5
+
+
+@pytest.mark.django_db
+class TestLLMMetricsView:
+    """Tests for the usage metrics endpoint."""
+
+    def test_staff_sees_totals(self, api_client, user, usage_recorder):
+        user.is_staff = True
+        user.save()
+        api_client.force_authenticate(user=user)
+        with usage.scope(user.id, "generate-backcard"):
+            usage_recorder.record(
+                "gpt-4.1-nano", duration_ms=200, prompt_tokens=10, completion_tokens=5
+            )
+            usage_recorder.record("gpt-4.1-nano", cache_hit=True)
+        usage_recorder.flush()
+
+        response = api_client.get(reverse("ai:llm-metrics"), {"days": 1})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["totals"]["calls"] == 2
+        assert response.data["totals"]["cache_hits"] == 1
+        assert response.data["totals"]["avg_duration_ms"] == 100
+        assert response.data["by_endpoint"][0]["endpoint"] == "generate-backcard"
+        assert response.data["top_users"][0]["email"] == user.email
+        assert set(response.data["process"]) == {
+            "backcard_cache",
+            "topic_cache",
+            "single_flight",
+            "usage_recorder",
+            "provider_limiter",
+            "resilience",
+            "routing",
+            "structured_output",
+        }
+
+    def test_requires_staff(self, authenticated_client):
+        response = authenticated_client.get(reverse("ai:llm-metrics"))
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_days_are_validated(self, api_client, user):
+        user.is_staff = True
+        user.save()
+        api_client.force_authenticate(user=user)
+
+        response = api_client.get(reverse("ai:llm-metrics"), {"days": "many"})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
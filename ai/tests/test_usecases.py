@@ -1,6 +1,15 @@
+import asyncio
+import re
+import time
 import pytest
-from unittest.mock import Mock
-from langchain_core.messages import SystemMessage, HumanMessage
+from unittest.mock import AsyncMock, Mock
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    SystemMessage,
+    HumanMessage,
+)
+from ai import parsing
 from ai.usecases import GenerateBackCardUsecase, GenerateTopicUsecase
 from ai.schemas import BackcardResponse, TopicGenerationResponse, TopicCard
 
@@ -48,7 +57,9 @@ def test_backcard_init(mock_llm_structured, test_backcard_prompt):
     """Test initialization attaches structured output LLM."""
     mock_llm, structured_llm_mock = mock_llm_structured
     usecase = GenerateBackCardUsecase(llm=mock_llm, prompt=test_backcard_prompt)
-    mock_llm.with_structured_output.assert_called_once_with(BackcardResponse)
+    mock_llm.with_structured_output.assert_called_once_with(
+        BackcardResponse, include_raw=True
+    )
     assert usecase.llm == structured_llm_mock  # Check it uses the structured mock
     assert usecase.prompt == test_backcard_prompt
 
@@ -100,7 +111,9 @@ def test_topic_init(mock_llm_structured, test_topic_prompt):
     """Test initialization attaches structured output LLM."""
     mock_llm, structured_llm_mock = mock_llm_structured
     usecase = GenerateTopicUsecase(llm=mock_llm, prompt=test_topic_prompt)
-    mock_llm.with_structured_output.assert_called_once_with(TopicGenerationResponse)
+    mock_llm.with_structured_output.assert_called_once_with(
+        TopicGenerationResponse, include_raw=True
+    )
     assert usecase.llm == structured_llm_mock
     assert usecase.prompt == test_topic_prompt
 
@@ -156,6 +169,351 @@ def test_topic_generate_invalid_count(topic_usecase):
         )
 
 
+def test_backcard_agenerate(backcard_usecase, mock_llm_structured):
+    """Test agenerate awaits ainvoke with the same messages as generate."""
+    _, structured_llm_mock = mock_llm_structured
+    expected_response_model = BackcardResponse(translation="Bonjour")
+    structured_llm_mock.ainvoke = AsyncMock(return_value=expected_response_model)
+
+    result = asyncio.run(
+        backcard_usecase.agenerate(
+            front_card="Hello", source_language="en", target_language="fr"
+        )
+    )
+
+    assert result == expected_response_model
+    structured_llm_mock.ainvoke.assert_awaited_once()
+    structured_llm_mock.invoke.assert_not_called()
+    called_args = structured_llm_mock.ainvoke.call_args[0][0]
+    assert called_args == backcard_usecase.messages("Hello", "en", "fr")
+
+
+def test_topic_agenerate_invalid_count(topic_usecase, mock_llm_structured):
+    """Test agenerate validates count before calling the LLM."""
+    _, structured_llm_mock = mock_llm_structured
+    structured_llm_mock.ainvoke = AsyncMock()
+    with pytest.raises(ValueError, match="Count must be less than 50"):
+        asyncio.run(
+            topic_usecase.agenerate(
+                topic="T", source_language="en", target_language="de", count=51
+            )
+        )
+    structured_llm_mock.ainvoke.assert_not_called()
+
+
+def test_topic_init_binds_streaming_tool(mock_llm_structured, test_topic_prompt):
+    """Test initialization forces the topic schema as tool for streaming."""
+    mock_llm, _ = mock_llm_structured
+    usecase = GenerateTopicUsecase(llm=mock_llm, prompt=test_topic_prompt)
+    mock_llm.bind_tools.assert_called_once_with(
+        [TopicGenerationResponse], tool_choice="TopicGenerationResponse"
+    )
+    assert usecase.streaming_llm == mock_llm.bind_tools.return_value
+
+
+def test_topic_stream_yields_cards_as_they_complete(topic_usecase):
+    """Test stream parses tool call argument chunks into TopicCards."""
+    fragments = [
+        '{"cards": [{"front": "ap',
+        'ple"}, {"fr',
+        'ont": "pear", "back": "Birne"}]}',
+    ]
+    received = []
+
+    def chunks(messages):
+        for fragment in fragments:
+            received.append(fragment)
+            yield AIMessageChunk(
+                content="",
+                tool_call_chunks=[
+                    {"name": None, "args": fragment, "id": None, "index": 0}
+                ],
+            )
+
+    topic_usecase.streaming_llm.stream.side_effect = chunks
+    cards = topic_usecase.stream(
+        topic="Food", source_language="en", target_language="de", count=2
+    )
+
+    first = next(cards)
+    assert first == TopicCard(front="apple")
+    assert len(received) == 2  # yielded before the rest of the output arrived
+    assert list(cards) == [TopicCard(front="pear", back="Birne")]
+
+
+def test_topic_stream_validates_count_eagerly(topic_usecase):
+    """Test stream raises before any model call for invalid counts."""
+    with pytest.raises(ValueError, match="Count must be less than 50"):
+        topic_usecase.stream(
+            topic="T", source_language="en", target_language="de", count=51
+        )
+    topic_usecase.streaming_llm.stream.assert_not_called()
+
+
+def shard_answer(messages):
+    """Answer a topic call with cards named after its focus, plus one shared card."""
+    content = messages[1].content
+    count = int(re.search(r"count:(\d+)", content).group(1))
+    focus = re.search(r"focus:```(.*?)```", content).group(1)
+    cards = [TopicCard(front="shared")]
+    cards += [TopicCard(front=f"{focus} {i}") for i in range(count - 1)]
+    return TopicGenerationResponse(cards=cards)
+
+
+def test_topic_generate_many_small_count_is_one_call(topic_usecase):
+    """Test generate_many does not fan out up to 50 cards."""
+    topic_usecase.llm.invoke.return_value = TopicGenerationResponse(cards=[])
+
+    topic_usecase.generate_many(
+        topic="Food", source_language="en", target_language="de", count=50
+    )
+
+    topic_usecase.llm.invoke.assert_called_once()
+    assert "focus" not in topic_usecase.llm.invoke.call_args[0][0][1].content
+
+
+def test_topic_generate_many_fans_out(topic_usecase):
+    """Test 200 cards are requested as concurrent, distinctly seeded shards."""
+
+    def slow_answer(messages):
+        time.sleep(0.2)
+        return shard_answer(messages)
+
+    topic_usecase.llm.invoke.side_effect = slow_answer
+
+    start = time.monotonic()
+    response = topic_usecase.generate_many(
+        topic="Food", source_language="en", target_language="de", count=200
+    )
+    elapsed = time.monotonic() - start
+
+    assert len(response.cards) == 200
+    fronts = [card.front.lower() for card in response.cards]
+    assert len(set(fronts)) == 200
+    calls = [call[0][0][1].content for call in topic_usecase.llm.invoke.call_args_list]
+    assert len(calls) == 5
+    assert all("count:44" in content for content in calls)
+    assert len({re.search(r"focus:```(.*?)```", c).group(1) for c in calls}) == 5
+    assert elapsed < 0.6  # shards ran concurrently
+
+
+def test_topic_generate_many_retries_only_failed_shards(topic_usecase):
+    """Test a failed shard is retried once with the collected cards excluded."""
+    failed_once = []
+
+    def flaky(messages):
+        content = messages[1].content
+        if "verbs" in content and not failed_once:
+            failed_once.append(True)
+            raise RuntimeError("timeout")
+        return shard_answer(messages)
+
+    topic_usecase.llm.invoke.side_effect = flaky
+
+    response = topic_usecase.generate_many(
+        topic="Food", source_language="en", target_language="de", count=100
+    )
+
+    calls = [call[0][0][1].content for call in topic_usecase.llm.invoke.call_args_list]
+    assert len(calls) == 4  # 3 shards and one retry
+    retry = calls[-1]
+    assert "verbs" in retry
+    assert "exclude" in retry and "shared" in retry
+    assert len(response.cards) == 100
+
+
+def test_topic_generate_many_raises_when_everything_fails(topic_usecase):
+    topic_usecase.llm.invoke.side_effect = RuntimeError("down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        topic_usecase.generate_many(
+            topic="Food", source_language="en", target_language="de", count=120
+        )
+
+
+def topic_answer(*fronts):
+    return TopicGenerationResponse(
+        cards=[TopicCard(front=front, back=front.upper()) for front in fronts]
+    )
+
+
+def test_topic_generate_excluding_filters_and_tops_up(topic_usecase):
+    """Test words of the box are hinted, filtered and replaced by one top-up."""
+    topic_usecase.exclude_hint_size = 1
+    topic_usecase.llm.invoke.side_effect = [
+        topic_answer("Apple", "cheese", "milk"),
+        topic_answer("egg"),
+    ]
+
+    response, report = topic_usecase.generate_excluding(
+        topic="Food",
+        source_language="en",
+        target_language="de",
+        count=3,
+        existing=["apple", "bread"],
+    )
+
+    assert [card.front for card in response.cards] == ["cheese", "milk", "egg"]
+    first, top_up = [
+        call[0][0][1].content for call in topic_usecase.llm.invoke.call_args_list
+    ]
+    assert "exclude (do not generate these):```apple```" in first
+    assert "count:1" in top_up and "```apple; cheese; milk```" in top_up
+    assert report == {
+        "generated": 4,
+        "duplicates": 1,
+        "top_up_calls": 1,
+        "duplicate_rate": {"before": 0.25, "after": 0.0},
+    }
+
+
+def test_topic_generate_excluding_without_duplicates_is_one_call(topic_usecase):
+    topic_usecase.llm.invoke.return_value = topic_answer("cheese", "milk")
+
+    response, report = topic_usecase.generate_excluding(
+        topic="Food",
+        source_language="en",
+        target_language="de",
+        count=2,
+        existing=["apple"],
+    )
+
+    assert len(response.cards) == 2
+    topic_usecase.llm.invoke.assert_called_once()
+    assert report["top_up_calls"] == 0
+    assert report["duplicate_rate"]["before"] == 0.0
+
+
+def broken_answer(arguments, tokens=100):
+    """What a structured runnable returns when the answer fails to parse."""
+    raw = AIMessage(
+        content="",
+        invalid_tool_calls=[{"name": "Answer", "args": arguments, "id": "1"}],
+        usage_metadata={
+            "input_tokens": tokens // 2,
+            "output_tokens": tokens - tokens // 2,
+            "total_tokens": tokens,
+        },
+    )
+    return {"raw": raw, "parsed": None, "parsing_error": ValueError("bad json")}
+
+
+def parsed_answer(parsed, tokens=100):
+    raw = AIMessage(
+        content="",
+        usage_metadata={
+            "input_tokens": tokens // 2,
+            "output_tokens": tokens - tokens // 2,
+            "total_tokens": tokens,
+        },
+    )
+    return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+
+@pytest.fixture
+def repair_stats(monkeypatch):
+    monkeypatch.setattr(parsing, "_stats", parsing.collections.Counter())
+
+
+TRUNCATED_CARDS = (
+    '{"cards": [{"front": "apple", "back": "Apfel"}, '
+    '{"front": "bread", "back": "Brot"}, {"front": "chee'
+)
+
+
+def test_topic_truncated_answer_asks_only_for_the_remainder(
+    topic_usecase, repair_stats
+):
+    topic_usecase.llm.invoke.side_effect = [
+        broken_answer(TRUNCATED_CARDS, tokens=1000),
+        parsed_answer(topic_answer("cheese"), tokens=300),
+    ]
+
+    response = topic_usecase.generate(
+        topic="Food", source_language="en", target_language="de", count=3
+    )
+
+    assert [card.front for card in response.cards] == ["apple", "bread", "cheese"]
+    retry = topic_usecase.llm.invoke.call_args[0][0][1].content
+    assert "count:1" in retry and "```apple; bread```" in retry
+    stats = parsing.stats()
+    assert stats["calls"] == 2
+    assert stats["parse_failures"] == 1
+    assert stats["remainder_retries"] == 1
+    assert stats["retry_rate"] == 0.5
+    assert stats["tokens_saved"] == 700
+
+
+def test_topic_malformed_answer_with_enough_cards_is_not_retried(
+    topic_usecase, repair_stats
+):
+    topic_usecase.llm.invoke.return_value = broken_answer(TRUNCATED_CARDS)
+
+    response = topic_usecase.generate(
+        topic="Food", source_language="en", target_language="de", count=2
+    )
+
+    assert len(response.cards) == 2
+    topic_usecase.llm.invoke.assert_called_once()
+    assert parsing.stats()["repaired"] == 1
+    assert parsing.stats()["tokens_saved"] == 100
+
+
+def test_topic_answer_without_cards_raises_after_one_retry(topic_usecase, repair_stats):
+    topic_usecase.llm.invoke.return_value = broken_answer('{"cards": [{"fro')
+
+    with pytest.raises(ValueError, match="bad json"):
+        topic_usecase.generate(
+            topic="Food", source_language="en", target_language="de", count=2
+        )
+
+    assert topic_usecase.llm.invoke.call_count == 2
+    assert parsing.stats()["full_retries"] == 1
+
+
+def test_backcard_complete_fields_are_kept(backcard_usecase, repair_stats):
+    backcard_usecase.llm.invoke.return_value = broken_answer(
+        '{"translation": "Apfel", "definition": "A fru'
+    )
+
+    response = backcard_usecase.generate("apple", "en", "de")
+
+    assert response == BackcardResponse(translation="Apfel")
+    backcard_usecase.llm.invoke.assert_called_once()
+    assert parsing.stats()["repaired"] == 1
+
+
+def test_backcard_without_translation_is_retried(backcard_usecase, repair_stats):
+    backcard_usecase.llm.invoke.side_effect = [
+        broken_answer('{"transl'),
+        parsed_answer(BackcardResponse(translation="Apfel")),
+    ]
+
+    response = backcard_usecase.generate("apple", "en", "de")
+
+    assert response.translation == "Apfel"
+    assert parsing.stats()["full_retries"] == 1
+
+
+def test_topic_agenerate_many_fans_out(topic_usecase):
+    """Test the async fan-out merges and deduplicates shards."""
+
+    async def answer(messages):
+        return shard_answer(messages)
+
+    topic_usecase.llm.ainvoke = AsyncMock(side_effect=answer)
+
+    response = asyncio.run(
+        topic_usecase.agenerate_many(
+            topic="Food", source_language="en", target_language="de", count=80
+        )
+    )
+
+    assert len(response.cards) == 80
+    assert len({card.front for card in response.cards}) == 80
+    assert topic_usecase.llm.ainvoke.await_count == 2
+
+
 # Note: test_generate_back_card_usecase_instance is removed as testing
 # pre-initialized instances with mocks injected like that becomes complex
 # and less reliable with the structured_output wrapper.
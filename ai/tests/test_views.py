@@ -1,11 +1,17 @@
+import asyncio
 import pytest
+from types import SimpleNamespace
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from leitner.models import CustomUser
 from django.contrib.auth import get_user_model
-from unittest.mock import patch
+from unittest.mock import AsyncMock, Mock, patch
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import RefreshToken
 from ai.schemas import BackcardResponse, TopicGenerationResponse, TopicCard
+from ai.usecases import GenerateTopicUsecase
 
 User = get_user_model()
 
@@ -91,7 +97,7 @@ class TestGenerateBackcardView:
 class TestGenerateTopicCardsView:
     """Tests for the GenerateTopicCardsView."""
 
-    @patch("ai.views.generate_topic_usecase.generate")
+    @patch("ai.views.generate_topic_usecase.answer")
     def test_generate_topic_cards_success(self, mock_generate, authenticated_client):
         """Test successful topic card generation with valid count."""
         # Configure mock response
@@ -100,7 +106,7 @@ class TestGenerateTopicCardsView:
             TopicCard(front="Banana", back="Banane"),
         ]
         mock_response = TopicGenerationResponse(cards=mock_cards)
-        mock_generate.return_value = mock_response
+        mock_generate.return_value = (mock_response, {None})
 
         url = reverse("ai:generate-topic-cards")
         data = {
@@ -119,10 +125,14 @@ class TestGenerateTopicCardsView:
         assert response.data["cards"][1]["front"] == "Banana"
 
         mock_generate.assert_called_once_with(
-            topic="Food", source_language="EN", target_language="DE", count=2
+            topic="Food",
+            source_language="EN",
+            target_language="DE",
+            count=2,
+            exclude=None,
         )
 
-    @patch("ai.views.generate_topic_usecase.generate")
+    @patch("ai.views.generate_topic_usecase.answer")
     def test_generate_topic_cards_invalid_language(
         self, mock_generate, authenticated_client
     ):
@@ -134,7 +144,7 @@ class TestGenerateTopicCardsView:
         assert "error" in response.data
         mock_generate.assert_not_called()
 
-    @patch("ai.views.generate_topic_usecase.generate")
+    @patch("ai.views.generate_topic_usecase.answer")
     def test_generate_topic_cards_invalid_type_count(
         self, mock_generate, authenticated_client
     ):
@@ -154,14 +164,14 @@ class TestGenerateTopicCardsView:
         assert "count" in response.data["details"]
         mock_generate.assert_not_called()
 
-    @patch("ai.views.generate_topic_usecase.generate")
+    @patch("ai.views.generate_topic_usecase.answer")
     def test_generate_topic_cards_missing_count(
         self, mock_generate, authenticated_client
     ):
         """Test topic card generation with missing count (should default)."""
         mock_cards_default = [TopicCard(front=f"Card {i}") for i in range(50)]
         mock_response_default = TopicGenerationResponse(cards=mock_cards_default)
-        mock_generate.return_value = mock_response_default
+        mock_generate.return_value = (mock_response_default, {None})
 
         url = reverse("ai:generate-topic-cards")
         data = {
@@ -175,17 +185,45 @@ class TestGenerateTopicCardsView:
         assert "cards" in response.data
         assert len(response.data["cards"]) == 50
         mock_generate.assert_called_once_with(
-            topic="Food", source_language="EN", target_language="DE", count=50
+            topic="Food",
+            source_language="EN",
+            target_language="DE",
+            count=50,
+            exclude=None,
+        )
+
+    @patch("ai.views.generate_topic_usecase.generate_many")
+    def test_generate_topic_cards_large_count(
+        self, mock_generate_many, authenticated_client
+    ):
+        """Test counts above 50 go through the fan-out path."""
+        mock_generate_many.return_value = TopicGenerationResponse(
+            cards=[TopicCard(front=f"Card {i}") for i in range(120)]
         )
 
-    @patch("ai.views.generate_topic_usecase.generate")
+        url = reverse("ai:generate-topic-cards")
+        data = {
+            "topic": "Food",
+            "source_language": "EN",
+            "target_language": "DE",
+            "count": 120,
+        }
+        response = authenticated_client.post(url, data)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["cards"]) == 120
+        mock_generate_many.assert_called_once_with(
+            topic="Food", source_language="EN", target_language="DE", count=120
+        )
+
+    @patch("ai.views.generate_topic_usecase.answer")
     def test_generate_topic_cards_out_of_range_count(
         self, mock_generate, authenticated_client
     ):
         """Test topic card generation with out-of-range integer count (should default)."""
         mock_cards_default = [TopicCard(front=f"Card {i}") for i in range(50)]
         mock_response_default = TopicGenerationResponse(cards=mock_cards_default)
-        mock_generate.return_value = mock_response_default
+        mock_generate.return_value = (mock_response_default, {None})
 
         url = reverse("ai:generate-topic-cards")
         data = {
@@ -196,3 +234,234 @@ class TestGenerateTopicCardsView:
         }
         response = authenticated_client.post(url, data)
         assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.fixture
+def auth_headers(user):
+    """Returns headers authenticating the user with a JWT."""
+    token = RefreshToken.for_user(user).access_token
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.django_db
+class TestAsyncGenerationViews:
+    """Tests for the async generation endpoints."""
+
+    @patch("ai.views.generate_back_card_usecase.agenerate", new_callable=AsyncMock)
+    def test_generate_backcard_success(self, mock_agenerate, auth_headers):
+        """Test the async endpoint awaits agenerate and returns its result."""
+        mock_agenerate.return_value = BackcardResponse(translation="Hallo")
+
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-backcard"),
+            {
+                "word_or_phrase": "Hello",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            content_type="application/json",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"translation": "Hallo"}
+        mock_agenerate.assert_awaited_once_with(
+            front_card="Hello", source_language="EN", target_language="DE"
+        )
+
+    @patch("ai.views.generate_topic_usecase.aanswer", new_callable=AsyncMock)
+    def test_generate_topic_cards_default_count(self, mock_agenerate, auth_headers):
+        """Test the async topic endpoint applies the serializer defaults."""
+        mock_agenerate.return_value = (
+            TopicGenerationResponse(cards=[TopicCard(front="apple")]),
+            {None},
+        )
+
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-topic-cards"),
+            {"topic": "Food", "source_language": "EN", "target_language": "DE"},
+            content_type="application/json",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"cards": [{"front": "apple"}]}
+        mock_agenerate.assert_awaited_once_with(
+            topic="Food", source_language="EN", target_language="DE", count=50
+        )
+
+    @patch("ai.views.generate_back_card_usecase.agenerate", new_callable=AsyncMock)
+    def test_invalid_language(self, mock_agenerate, auth_headers):
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-backcard"),
+            {
+                "word_or_phrase": "Hello",
+                "source_language": "XX",
+                "target_language": "DE",
+            },
+            content_type="application/json",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "source_language" in response.json()["details"]
+        mock_agenerate.assert_not_called()
+
+    @patch("ai.views.generate_back_card_usecase.agenerate", new_callable=AsyncMock)
+    def test_requires_authentication(self, mock_agenerate, db):
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-backcard"),
+            {
+                "word_or_phrase": "Hello",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            content_type="application/json",
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        mock_agenerate.assert_not_called()
+
+    def test_invalid_token(self, db):
+        response = async_to_sync(AsyncClient().post)(
+            reverse("ai:async-generate-backcard"),
+            {
+                "word_or_phrase": "Hello",
+                "source_language": "EN",
+                "target_language": "DE",
+            },
+            content_type="application/json",
+            headers={"Authorization": "Bearer not-a-token"},
+        )
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.django_db
+class TestGenerateTopicCardsStreamView:
+    """Tests for the SSE topic card endpoint."""
+
+    url = "ai:generate-topic-cards-stream"
+    data = {
+        "topic": "Food",
+        "source_language": "EN",
+        "target_language": "DE",
+        "count": 2,
+    }
+
+    @patch("ai.views.generate_topic_usecase.stream")
+    def test_cards_are_streamed_as_events(self, mock_stream, authenticated_client):
+        mock_stream.return_value = (
+            card
+            for card in [
+                TopicCard(front="apple", back="Apfel"),
+                TopicCard(front="pear"),
+            ]
+        )
+
+        response = authenticated_client.post(
+            reverse(self.url), self.data, HTTP_ACCEPT="text/event-stream"
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "text/event-stream"
+        body = b"".join(response.streaming_content).decode()
+        assert body.split("\n\n")[1:4] == [
+            'event: card\ndata: {"front": "apple", "back": "Apfel"}',
+            'event: card\ndata: {"front": "pear"}',
+            'event: done\ndata: {"count": 2}',
+        ]
+        mock_stream.assert_called_once_with(
+            topic="Food", source_language="EN", target_language="DE", count=2
+        )
+
+    @patch("ai.views.generate_topic_usecase.stream")
+    def test_failure_mid_stream_sends_error_event(
+        self, mock_stream, authenticated_client
+    ):
+        def cards():
+            yield TopicCard(front="apple")
+            raise RuntimeError("connection reset")
+
+        mock_stream.return_value = cards()
+
+        response = authenticated_client.post(reverse(self.url), self.data)
+        body = b"".join(response.streaming_content).decode()
+
+        assert 'event: error\ndata: {"error": "Generation failed.", "count": 1}' in body
+
+    @patch("ai.views.generate_topic_usecase.stream")
+    def test_disconnect_closes_generation(self, mock_stream, authenticated_client):
+        closed = []
+
+        def cards():
+            try:
+                while True:
+                    yield TopicCard(front="apple")
+            finally:
+                closed.append(True)
+
+        mock_stream.return_value = cards()
+
+        response = authenticated_client.post(reverse(self.url), self.data)
+        stream = iter(response.streaming_content)
+        next(stream)
+        next(stream)
+        response.close()
+
+        assert closed == [True]
+
+    def test_asgi_sends_the_first_card_before_the_model_finishes(self, auth_headers):
+        finished = []
+
+        async def model_stream(messages):
+            release = asyncio.Event()
+            model_stream.release = release
+            yield SimpleNamespace(
+                tool_call_chunks=[{"args": '{"cards": [{"front": "apple"},'}]
+            )
+            try:
+                await asyncio.wait_for(release.wait(), 5)
+            except TimeoutError:
+                pass
+            finished.append(True)
+            yield SimpleNamespace(tool_call_chunks=[{"args": '{"front": "pear"}]}'}])
+
+        llm = Mock()
+        llm.bind_tools.return_value.astream = model_stream
+        usecase = GenerateTopicUsecase(llm=llm, prompt="Prompt")
+
+        async def stream():
+            response = await AsyncClient().post(
+                reverse(self.url),
+                self.data,
+                content_type="application/json",
+                headers=auth_headers,
+            )
+            events = aiter(response)
+            await asyncio.wait_for(anext(events), 2)
+            first = await asyncio.wait_for(anext(events), 2)
+            before_finish = not finished
+            model_stream.release.set()
+            rest = [event async for event in events]
+            return response, first, before_finish, rest
+
+        with patch("ai.views.generate_topic_usecase", usecase):
+            response, first, before_finish, rest = async_to_sync(stream)()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert first == b'event: card\ndata: {"front": "apple"}\n\n'
+        assert before_finish
+        assert rest[-1] == b'event: done\ndata: {"count": 2}\n\n'
+
+    @patch("ai.views.generate_topic_usecase.stream")
+    def test_invalid_request_is_rejected(self, mock_stream, authenticated_client):
+        response = authenticated_client.post(
+            reverse(self.url),
+            {"topic": "Food", "source_language": "XX", "target_language": "DE"},
+            HTTP_ACCEPT="text/event-stream",
+        )
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.content.startswith(b"event: error")
+        mock_stream.assert_not_called()
@@ -0,0 +1,280 @@
+"""
+Per-user quotas of the generation endpoints.
+
+Requests are cheap to send but not to answer: one ``generate_topic_cards``
+call with ``count=200`` costs as much as a dozen backcards. So each user has
+a token bucket measured in estimated LLM tokens rather than requests, sized
+by the user's plan (``ai.settings.QUOTA_PLANS``). A request is charged its
+estimate up front and refused with 429 and ``Retry-After`` when the bucket
+cannot cover it; every response reports what is left in the
+``X-RateLimit-*-Tokens`` headers. The charge is given back when the request
+turns out not to need the model: it is rejected with a 4xx status, or
+answered from the cache alone.
+
+The bucket is stored as one integer per user in the Django cache, its
+"theoretical arrival time" in milliseconds (GCRA): the time at which the
+bucket would be full again. Charging a request is a single atomic ``incr``;
+a second round trip is only needed the first time, after the bucket has
+filled up again, or to give back the charge of a refused request. Sharing
+the quota between workers needs a shared cache with an atomic ``incr``
+(Redis or Memcached); the default local memory cache keeps one bucket per
+process.
+"""
+
+import dataclasses
+import math
+import time
+
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .settings import BACKCARD_BATCH_SIZE, QUOTA_PLANS, QUOTAS_ENABLED
+
+# Rough costs used to charge a request before it is made: the prompt plus a
+# typical answer
+BACKCARD_TOKENS = 1000
+BATCH_BACKCARD_CALL_TOKENS = 400
+BATCH_BACKCARD_WORD_TOKENS = 250
+TOPIC_CALL_TOKENS = 700
+TOPIC_CARD_TOKENS = 60
+TOPIC_CARDS_PER_CALL = 50
+DEFAULT_TOPIC_COUNT = 50
+
+
+def _count(value, default, maximum):
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        return default
+    return count if 1 <= count <= maximum else default
+
+
+def estimate_tokens(kind, data):
+    """
+    Estimate the LLM tokens a generation request will use.
+
+    Args:
+        kind (str): "backcard", "backcards" or "topic".
+        data: The request body, before validation.
+    """
+    if kind == "backcard":
+        return BACKCARD_TOKENS
+    if kind == "backcards":
+        words = data.get("words") if hasattr(data, "get") else None
+        count = len(words) if isinstance(words, list) and words else 1
+        calls = math.ceil(count / BACKCARD_BATCH_SIZE)
+        return calls * BATCH_BACKCARD_CALL_TOKENS + count * BATCH_BACKCARD_WORD_TOKENS
+    if kind == "topic":
+        value = data.get("count") if hasattr(data, "get") else None
+        count = _count(value, DEFAULT_TOPIC_COUNT, 200)
+        calls = math.ceil(count / TOPIC_CARDS_PER_CALL)
+        return calls * TOPIC_CALL_TOKENS + count * TOPIC_CARD_TOKENS
+    raise ValueError(f"Unknown kind of generation request: {kind}")
+
+
+@dataclasses.dataclass
+class QuotaStatus:
+    """Outcome of charging a bucket; all amounts are estimated tokens."""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the bucket is full again
+    reset: float
+    # Seconds until the refused request would be allowed
+    retry_after: float = 0
+    # Tokens taken from the bucket
+    charged: int = 0
+
+    def headers(self):
+        headers = {
+            "X-RateLimit-Limit-Tokens": str(self.limit),
+            "X-RateLimit-Remaining-Tokens": str(self.remaining),
+            "X-RateLimit-Reset-Tokens": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(math.ceil(self.retry_after))
+        return headers
+
+
+class TokenBucket:
+    """
+    A token bucket per key in the Django cache.
+
+    Args:
+        capacity (int): Tokens the bucket holds when full.
+        per_hour (int): Tokens added back per hour.
+    """
+
+    def __init__(self, capacity, per_hour, prefix="ai:quota"):
+        self.capacity = capacity
+        self.per_hour = per_hour
+        self.prefix = prefix
+        # Milliseconds it takes to refill one token
+        self.ms_per_token = 3_600_000 / per_hour
+        # How far ahead of now a full bucket's arrival time may be
+        self.tolerance = round(capacity * self.ms_per_token)
+
+    def consume(self, key, tokens, now=None, reserve=0):
+        """
+        Take ``tokens`` from the bucket of ``key`` if it holds that many.
+
+        A request larger than the whole bucket is charged the whole bucket,
+        so it still goes through once the bucket is full.
+
+        Args:
+            reserve (int): Tokens that must be left in the bucket afterwards,
+                           kept for other callers.
+
+        Returns:
+            QuotaStatus: Whether the tokens were taken and what is left.
+        """
+        now = round((time.time() if now is None else now) * 1000)
+        reserve = min(reserve, self.capacity - 1)
+        delta = round(min(tokens, self.capacity - reserve) * self.ms_per_token)
+        tolerance = self.tolerance - round(reserve * self.ms_per_token)
+        key = f"{self.prefix}:{key}"
+        try:
+            arrival = cache.incr(key, delta)
+        except ValueError:
+            # No bucket yet, or it expired from the cache
+            if cache.add(key, now + delta, None):
+                arrival = now + delta
+            else:
+                arrival = cache.incr(key, delta)
+        else:
+            previous = arrival - delta
+            if previous < now:
+                # The bucket has been full since ``previous``; concurrent
+                # requests doing this too only leave it emptier than it is
+                arrival = cache.incr(key, now - previous)
+
+        ahead = arrival - now
+        if ahead > tolerance:
+            cache.decr(key, delta)
+            ahead -= delta
+            return QuotaStatus(
+                allowed=False,
+                limit=self.capacity,
+                remaining=self._remaining(ahead),
+                reset=ahead / 1000,
+                retry_after=(ahead + delta - tolerance) / 1000,
+            )
+        return QuotaStatus(
+            allowed=True,
+            limit=self.capacity,
+            remaining=self._remaining(ahead),
+            reset=ahead / 1000,
+            charged=min(tokens, self.capacity - reserve),
+        )
+
+    def refund(self, key, tokens):
+        """Give back ``tokens`` taken by ``consume`` for work that never ran."""
+        delta = round(min(tokens, self.capacity) * self.ms_per_token)
+        try:
+            cache.decr(f"{self.prefix}:{key}", delta)
+        except ValueError:
+            pass
+
+    def _remaining(self, ahead):
+        return max(0, math.floor((self.tolerance - ahead) / self.ms_per_token))
+
+
+def _bucket(user):
+    """The token bucket of ``user``'s plan, or None when it has no quota."""
+    if not QUOTAS_ENABLED:
+        return None
+    plan = QUOTA_PLANS.get(user.plan, QUOTA_PLANS[user.PLAN_FREE])
+    if plan is None:
+        return None
+    return TokenBucket(*plan)
+
+
+def charge(user, kind, data):
+    """
+    Charge ``user`` the estimated tokens of a generation request.
+
+    Returns:
+        QuotaStatus: Or None when the user's plan has no quota.
+    """
+    bucket = _bucket(user)
+    if bucket is None:
+        return None
+    return bucket.consume(user.pk, estimate_tokens(kind, data))
+
+
+def refund(user, status):
+    """
+    Give back what ``charge`` took for a request that did not use the model.
+
+    Returns:
+        QuotaStatus: ``status`` with the tokens given back.
+    """
+    bucket = _bucket(user)
+    if bucket is None or status is None or not status.charged:
+        return status
+    bucket.refund(user.pk, status.charged)
+    return dataclasses.replace(
+        status,
+        remaining=min(status.limit, status.remaining + status.charged),
+        reset=max(0.0, status.reset - status.charged * bucket.ms_per_token / 1000),
+        charged=0,
+    )
+
+
+def unused(response, calls=None):
+    """
+    Whether the request behind ``response`` did not need the model: it was
+    rejected with a 4xx status other than 429, or its usage ``calls`` were
+    all answered from the cache.
+    """
+    if 400 <= response.status_code < 500 and response.status_code != 429:
+        return True
+    return calls is not None and calls.cached_only
+
+
+class AIQuotaThrottle(BaseThrottle):
+    """
+    Throttle generation requests by the user's token bucket.
+
+    The view sets ``quota_kind`` to the kind of request it serves (see
+    ``estimate_tokens``); views or viewset actions without one are not
+    throttled. The outcome is kept on the request as ``request.quota`` for
+    ``QuotaHeadersMixin``, which gives the charge back if it was not needed.
+    """
+
+    def allow_request(self, request, view):
+        kind = getattr(view, "quota_kind", None)
+        if kind is None or not request.user.is_authenticated:
+            return True
+        self.status = charge(request.user, kind, request.data)
+        request.quota = self.status
+        return self.status is None or self.status.allowed
+
+    def wait(self):
+        return self.status.retry_after
+
+
+class QuotaHeadersMixin:
+    """
+    Throttle a view by AI quota and report the quota in its responses.
+
+    The charge is given back for 4xx responses, and for requests whose view
+    kept the ``usage.scope`` they ran in as ``request.usage_calls`` and that
+    were answered from the cache alone.
+    """
+
+    throttle_classes = [AIQuotaThrottle]
+    quota_kind = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        quota = getattr(request, "quota", None)
+        if quota is not None and unused(
+            response, getattr(request, "usage_calls", None)
+        ):
+            quota = request.quota = refund(request.user, quota)
+        if quota is not None:
+            for name, value in quota.headers().items():
+                response[name] = value
+        return response
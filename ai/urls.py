@@ -1,5 +1,16 @@
 from django.urls import path
-from .views import GenerateBackcardView, GenerateTopicCardsView
+from .views import (
+    AsyncGenerateBackcardView,
+    AsyncGenerateTopicCardsView,
+    GenerateBackcardJobView,
+    GenerateBackcardView,
+    GenerateBackcardsView,
+    GenerateTopicCardsJobView,
+    GenerateTopicCardsStreamView,
+    GenerateTopicCardsView,
+    GenerationJobView,
+    LLMMetricsView,
+)
 
 app_name = "ai"
 
@@ -9,9 +20,49 @@ urlpatterns = [
         GenerateBackcardView.as_view(),
         name="generate-backcard",
     ),
+    path(
+        "ai-generation/generate_backcards/",
+        GenerateBackcardsView.as_view(),
+        name="generate-backcards",
+    ),
     path(
         "ai-generation/generate_topic_cards/",
         GenerateTopicCardsView.as_view(),
         name="generate-topic-cards",
     ),
+    path(
+        "ai-generation/generate_topic_cards/stream/",
+        GenerateTopicCardsStreamView.as_view(),
+        name="generate-topic-cards-stream",
+    ),
+    path(
+        "ai-generation/async/generate_backcard/",
+        AsyncGenerateBackcardView.as_view(),
+        name="async-generate-backcard",
+    ),
+    path(
+        "ai-generation/async/generate_topic_cards/",
+        AsyncGenerateTopicCardsView.as_view(),
+        name="async-generate-topic-cards",
+    ),
+    path(
+        "ai-generation/jobs/generate_backcard/",
+        GenerateBackcardJobView.as_view(),
+        name="generate-backcard-job",
+    ),
+    path(
+        "ai-generation/jobs/generate_topic_cards/",
+        GenerateTopicCardsJobView.as_view(),
+        name="generate-topic-cards-job",
+    ),
+    path(
+        "ai-generation/jobs/<int:pk>/",
+        GenerationJobView.as_view(),
+        name="generation-job",
+    ),
+    path(
+        "ai-generation/metrics/",
+        LLMMetricsView.as_view(),
+        name="llm-metrics",
+    ),
 ]
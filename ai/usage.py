@@ -0,0 +1,360 @@
+"""
+Recording of what the AI endpoints cost and how long they take.
+
+Every chat model call, and every backcard answered from the cache, becomes
+one ``LLMUsage`` row with its wall time, time to first token, token counts,
+cost, backend, model, cache hit and outcome. The calls themselves are observed by
+``ai.callbacks.UsageCallbackHandler``, which the clients built by
+``ai.settings.get_llm`` carry.
+
+The request path only appends to an in-memory queue. A daemon thread per
+process writes the queue every ``USAGE_FLUSH_INTERVAL`` seconds with one bulk
+insert and adds the batch to the ``LLMUsageDaily`` rollups. If the queue
+fills up because the database is unreachable, new records are dropped and
+counted rather than slowing down requests.
+
+Views and the job worker tell the recorder who a call is for with ``scope``:
+
+    with usage.scope(request.user.id, "generate-backcard"):
+        generate_back_card_usecase.generate(...)
+
+The scope is a context variable, so it follows async tasks; code that hands
+work to a thread pool must submit it through ``contextvars.copy_context()``.
+It yields the ``Calls`` made inside it, so a view can tell a request answered
+from the cache alone, e.g. to give back its quota.
+"""
+
+import atexit
+import collections
+import contextlib
+import contextvars
+import dataclasses
+import decimal
+import logging
+import os
+import queue
+import threading
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import LLMUsage, LLMUsageDaily
+from .settings import MODEL_PRICES, USAGE_FLUSH_INTERVAL, USAGE_RECORDING
+
+logger = logging.getLogger(__name__)
+
+_scope = contextvars.ContextVar("ai_usage_scope", default=(None, ""))
+_calls = contextvars.ContextVar("ai_usage_calls", default=None)
+
+ROLLUP_FIELDS = (
+    "calls",
+    "errors",
+    "cache_hits",
+    "prompt_tokens",
+    "completion_tokens",
+    "cost",
+    "duration_ms",
+    "ttft_ms",
+    "streamed_calls",
+)
+
+
+@dataclasses.dataclass
+class Calls:
+    """Model calls and cache answers recorded inside a ``scope``."""
+
+    model_calls: int = 0
+    cache_hits: int = 0
+
+    @property
+    def cached_only(self):
+        """Whether everything was answered from the cache."""
+        return self.cache_hits > 0 and self.model_calls == 0
+
+
+@contextlib.contextmanager
+def scope(user_id, endpoint):
+    """Attribute the model calls made inside the block to a user and endpoint."""
+    calls = Calls()
+    token = _scope.set((user_id, endpoint))
+    calls_token = _calls.set(calls)
+    try:
+        yield calls
+    finally:
+        _calls.reset(calls_token)
+        _scope.reset(token)
+
+
+def current_scope():
+    """Return the ``(user_id, endpoint)`` of the calls made now."""
+    return _scope.get()
+
+
+def cost(model_name, prompt_tokens, completion_tokens):
+    """Return the cost in USD of a call, or 0 for a model without a price."""
+    prompt_price, completion_price = MODEL_PRICES.get(model_name, (0, 0))
+    total = prompt_tokens * prompt_price + completion_tokens * completion_price
+    return (decimal.Decimal(str(total)) / 1_000_000).quantize(
+        decimal.Decimal("0.000001")
+    )
+
+
+class UsageRecorder:
+    """
+    Collects usage records and writes them from a background thread.
+
+    Args:
+        flush_interval (float): Seconds between writes.
+        batch_size (int): Records written per bulk insert at most.
+        max_queue (int): Records held in memory before new ones are dropped.
+    """
+
+    def __init__(self, flush_interval=2.0, batch_size=500, max_queue=10000):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.enabled = True
+        # Tests turn this off and call flush() themselves
+        self.autostart = True
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def record(
+        self,
+        model_name,
+        outcome=LLMUsage.OUTCOME_SUCCESS,
+        duration_ms=0,
+        ttft_ms=None,
+        prompt_tokens=0,
+        completion_tokens=0,
+        cache_hit=False,
+        backend="",
+    ):
+        """Queue one record for the current scope; never blocks."""
+        calls = _calls.get()
+        if calls is not None:
+            if cache_hit:
+                calls.cache_hits += 1
+            else:
+                calls.model_calls += 1
+        if not self.enabled:
+            return
+        user_id, endpoint = current_scope()
+        try:
+            self._queue.put_nowait(
+                {
+                    "user_id": user_id,
+                    "endpoint": endpoint,
+                    "backend": backend or "",
+                    "model_name": model_name or "",
+                    "cache_hit": cache_hit,
+                    "outcome": outcome,
+                    "duration_ms": max(0, int(duration_ms)),
+                    "ttft_ms": None if ttft_ms is None else max(0, int(ttft_ms)),
+                    "prompt_tokens": prompt_tokens or 0,
+                    "completion_tokens": completion_tokens or 0,
+                    "created_at": timezone.now(),
+                }
+            )
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+        if self.autostart:
+            self._ensure_started()
+
+    def record_cache_hit(self, model_name):
+        self.record(model_name, cache_hit=True)
+
+    def _ensure_started(self):
+        # A forked worker inherits the thread object but not the thread
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name="ai-usage-recorder", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write_safely([first] + self._drain(self.batch_size - 1))
+
+    def _drain(self, limit=None):
+        records = []
+        while limit is None or len(records) < limit:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return records
+
+    def _write_safely(self, records):
+        try:
+            self.write(records)
+        except Exception:
+            logger.exception("Could not write %s LLM usage records", len(records))
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        records = self._drain()
+        for start in range(0, len(records), self.batch_size):
+            self.write(records[start : start + self.batch_size])
+        return len(records)
+
+    def clear(self):
+        """Discard everything queued so far."""
+        return len(self._drain())
+
+    def write(self, records):
+        """Insert ``records`` and add them to the daily rollups."""
+        rows = []
+        totals = collections.defaultdict(collections.Counter)
+        for record in records:
+            row = LLMUsage(
+                **record,
+                cost=cost(
+                    record["model_name"],
+                    record["prompt_tokens"],
+                    record["completion_tokens"],
+                ),
+            )
+            rows.append(row)
+            key = (
+                row.user_id,
+                timezone.localdate(row.created_at),
+                row.endpoint,
+                row.backend,
+                row.model_name,
+            )
+            total = totals[key]
+            total["calls"] += 1
+            total["errors"] += row.outcome == LLMUsage.OUTCOME_ERROR
+            total["cache_hits"] += row.cache_hit
+            total["prompt_tokens"] += row.prompt_tokens
+            total["completion_tokens"] += row.completion_tokens
+            total["cost"] += row.cost
+            total["duration_ms"] += row.duration_ms
+            if row.ttft_ms is not None:
+                total["ttft_ms"] += row.ttft_ms
+                total["streamed_calls"] += 1
+
+        LLMUsage.objects.bulk_create(rows)
+        for (user_id, date, endpoint, backend, model_name), total in totals.items():
+            self._add_to_rollup(
+                {
+                    "user_id": user_id,
+                    "date": date,
+                    "endpoint": endpoint,
+                    "backend": backend,
+                    "model_name": model_name,
+                },
+                {field: total[field] for field in ROLLUP_FIELDS},
+            )
+        with self._lock:
+            self.written += len(rows)
+
+    @staticmethod
+    def _add_to_rollup(key, total):
+        increments = {field: F(field) + value for field, value in total.items()}
+        if LLMUsageDaily.objects.filter(**key).update(**increments):
+            return
+        try:
+            with transaction.atomic():
+                LLMUsageDaily.objects.create(**key, **total)
+        except IntegrityError:
+            # Another process created the row in the meantime
+            LLMUsageDaily.objects.filter(**key).update(**increments)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+            }
+
+
+def _totals(row):
+    calls = row["calls"] or 0
+    return {
+        "calls": calls,
+        "errors": row["errors"] or 0,
+        "cache_hits": row["cache_hits"] or 0,
+        "prompt_tokens": row["prompt_tokens"] or 0,
+        "completion_tokens": row["completion_tokens"] or 0,
+        "cost": float(row["cost"] or 0),
+        "avg_duration_ms": round((row["duration_ms"] or 0) / calls) if calls else None,
+        "avg_ttft_ms": (
+            round(row["ttft_ms"] / row["streamed_calls"])
+            if row["streamed_calls"]
+            else None
+        ),
+    }
+
+
+def summary(since, top_users=10):
+    """
+    Summarize the daily rollups from ``since`` (a date) until today.
+
+    Returns:
+        dict: Overall totals, totals per endpoint, backend and model, and the users
+        with the highest cost.
+    """
+    rows = LLMUsageDaily.objects.filter(date__gte=since)
+    sums = {field: Sum(field) for field in ROLLUP_FIELDS}
+    return {
+        "since": since.isoformat(),
+        "totals": _totals(rows.aggregate(**sums)),
+        "by_endpoint": [
+            {
+                "endpoint": row["endpoint"],
+                "backend": row["backend"],
+                "model_name": row["model_name"],
+                **_totals(row),
+            }
+            for row in rows.values("endpoint", "backend", "model_name")
+            .annotate(**sums)
+            .order_by("endpoint", "backend", "model_name")
+        ],
+        "top_users": [
+            {"user_id": row["user_id"], "email": row["user__email"], **_totals(row)}
+            for row in rows.exclude(user=None)
+            .values("user_id", "user__email")
+            .annotate(**sums)
+            .order_by("-cost", "user_id")[:top_users]
+        ],
+    }
+
+
+def purge(before):
+    """Delete the per-call rows older than ``before``; the rollups are kept."""
+    deleted, _ = LLMUsage.objects.filter(created_at__lt=before).delete()
+    return deleted
+
+
+usage_recorder = UsageRecorder(flush_interval=USAGE_FLUSH_INTERVAL)
+usage_recorder.enabled = USAGE_RECORDING
+
+
+@atexit.register
+def _flush_at_exit():
+    if not usage_recorder.autostart:
+        return
+    try:
+        usage_recorder.flush()
+    except Exception:
+        logger.warning("Could not write LLM usage records at exit", exc_info=True)
@@ -1,54 +1,1553 @@
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_openai import ChatOpenAI
-from ai.settings import back_card_llm, topic_generation_llm
-from ai.prompts import BACKCARD_GENERATION_PROMPT, TOPIC_GENERATION_PROMPT
-from ai.schemas import BackcardResponse, TopicGenerationResponse
+import asyncio
+import contextvars
+import inspect
+import logging
+import math
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+from typing import TYPE_CHECKING
+from asgiref.sync import sync_to_async
+from ai.cache import BackcardCache, TopicCache, normalize_text
+from ai.parsing import (
+    JSONArrayItemParser,
+    raw_arguments,
+    salvage_items,
+    salvage_object,
+    total_tokens,
+)
+from ai.settings import (
+    BACKCARD_BATCH_CONCURRENCY,
+    BACKCARD_BATCH_SIZE,
+    BACKENDS,
+    BACKCARD_CACHE_SIZE,
+    BACKCARD_CACHE_TTL,
+    LLM_BREAKER_FAILURES,
+    LLM_BREAKER_RESET,
+    LLM_INTERACTIVE_RESERVE,
+    LLM_MAX_RETRIES,
+    LLM_RATE_LIMIT_MAX_WAIT,
+    ROUTING_MAX_ERROR_RATE,
+    ROUTING_MAX_P95,
+    ROUTING_MIN_CALLS,
+    ROUTING_TIERS,
+    ROUTING_WINDOW,
+    TOPIC_CACHE_CANDIDATES,
+    TOPIC_CACHE_MIN_SIMILARITY,
+    TOPIC_CACHE_POOL_SIZE,
+    TOPIC_CACHE_TTL,
+    TOPIC_EXCLUDE_HINT_SIZE,
+    TOPIC_FANOUT_CONCURRENCY,
+    TOPIC_MODEL_NAME,
+    back_card_setting,
+    batch_back_card_setting,
+    llm_factory,
+    topic_generation_setting,
+)
+from ai.prompts import (
+    BACKCARD_GENERATION_PROMPT,
+    BATCH_BACKCARD_GENERATION_PROMPT,
+    TOPIC_FACETS,
+    TOPIC_GENERATION_PROMPT,
+)
+from ai.schemas import (
+    BackcardResponse,
+    BatchBackcard,
+    BatchBackcardResponse,
+    TopicCard,
+    TopicGenerationResponse,
+)
+from ai import parsing, resilience
+from ai.ratelimit import BATCH, INTERACTIVE, ProviderBusy, ProviderLimiter
+from ai.resilience import (
+    CircuitBreaker,
+    ProviderUnavailable,
+    RetryPolicy,
+    is_transient,
+)
+from ai.routing import LatencyTracker, Route, Router
+from ai.singleflight import SingleFlight, SingleFlightError
+from ai.usage import usage_recorder
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+
+logger = logging.getLogger(__name__)
+
+
+def structured_output(chat_model: "BaseChatModel", schema):
+    """
+    Bind ``schema`` as the structured output of ``chat_model``, returning
+    the raw message and any parsing error along with the parsed answer.
+
+    OpenAI models default to JSON schema mode, in which an answer cut off
+    by ``max_tokens`` raises in the client before it can be salvaged; they
+    are switched to function calling, which other chat models use anyway.
+    """
+    options = {"include_raw": True}
+    if "method" in inspect.signature(chat_model.with_structured_output).parameters:
+        options["method"] = "function_calling"
+    return chat_model.with_structured_output(schema, **options)
+
+
+def chat_messages(system_prompt: str, user_message: str):
+    """Build the system and user messages of a call."""
+    # Imported here so that importing the usecases does not load LangChain
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=user_message),
+    ]
+
+
+class LLMUsecase:
+    """
+    Base of the usecases that call a chat model.
+
+    Pass either the model as ``llm`` or an ``llm_factory`` that returns it.
+    With a factory, the model and the runnables derived from it (the cached
+    properties named in ``runnables``, built by the matching ``build_*``
+    methods) are only built when first used.
+
+    Calls made through ``invoke``, ``ainvoke`` and ``stream_chunks`` wait
+    for the provider rate limit of ``limiter`` (see ai.ratelimit), fail fast
+    while ``breaker`` is open, and are retried according to ``retry`` (see
+    ai.resilience). With a ``router`` (see ai.routing) each call names its
+    task, the model and backend are chosen per call, and every retry goes to
+    the next route; ``llm_factory`` is then called with the route.
+    """
+
+    runnables = ("llm",)
+
+    def __init__(
+        self,
+        llm: "BaseChatModel | None" = None,
+        llm_factory: Callable[..., "BaseChatModel"] | None = None,
+        limiter: ProviderLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        router: Router | None = None,
+    ):
+        if (llm is None) == (llm_factory is None):
+            raise ValueError("Pass either llm or llm_factory")
+        self._llm_factory = llm_factory or (lambda route=None: llm)
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker
+        self.router = router
+        self._routed = {}
+        self._routed_lock = threading.Lock()
+        if llm is not None:
+            for name in self.runnables:
+                getattr(self, name)
+
+    @cached_property
+    def chat_model(self) -> "BaseChatModel":
+        return self._llm_factory()
+
+    @cached_property
+    def llm(self):
+        return self.build_llm(self.chat_model)
+
+    def build_llm(self, chat_model):
+        return chat_model
+
+    @staticmethod
+    def _parsed(result):
+        """
+        Split the output of a runnable built with ``include_raw`` into the
+        parsed answer, the raw message and the parsing error. Any other
+        output is taken as parsed.
+        """
+        if not (isinstance(result, dict) and "raw" in result):
+            return result, None, None
+        parsing.count("calls")
+        if result.get("parsed") is not None:
+            return result["parsed"], result["raw"], None
+        parsing.count("parse_failures")
+        error = result.get("parsing_error") or ValueError("No structured output")
+        return None, result["raw"], error
+
+    def runnable(self, name: str, route: Route | None = None):
+        """Return the runnable ``name`` for ``route``, or the default model."""
+        if route is None:
+            return getattr(self, name)
+        key = (name, route.name)
+        with self._routed_lock:
+            if key not in self._routed:
+                self._routed[key] = getattr(self, f"build_{name}")(
+                    self._llm_factory(route)
+                )
+            return self._routed[key]
+
+    def routes(self, task: str | None):
+        """Routes to try in order; ``[None]`` stands for the default model."""
+        if self.router is None or task is None:
+            return [None]
+        return self.router.routes(task)
+
+    def route_name(self, task: str | None):
+        """Name of the route ``task`` is meant to take; None for the default model."""
+        if self.router is None or task is None:
+            return None
+        return self.router.primary(task).name
+
+    def _breaker(self, route):
+        return self.breaker if route is None else self.router.breaker(route)
+
+    def _available(self, routes, index):
+        """Return the index of the first route from ``index`` whose breaker is closed."""
+        while True:
+            breaker = self._breaker(routes[index])
+            try:
+                if breaker:
+                    breaker.check()
+                return index
+            except ProviderUnavailable:
+                if index + 1 == len(routes):
+                    raise
+                index += 1
+
+    def _acquire(self, route, messages):
+        if self.limiter and (route is None or route.backend.rate_limited):
+            self.limiter.acquire(messages, route and route.model_name)
+
+    async def _aacquire(self, route, messages):
+        if self.limiter and (route is None or route.backend.rate_limited):
+            await self.limiter.aacquire(messages, route and route.model_name)
+
+    def _succeeded(self, route, started):
+        if route is not None:
+            self.router.record(route, time.monotonic() - started, ok=True)
+        breaker = self._breaker(route)
+        if breaker:
+            breaker.success()
+
+    def _retry_delay(self, exc, attempt, expires_at, route=None, started=None):
+        """Record a failed attempt and return the backoff, or None to give up."""
+        transient = is_transient(exc)
+        if route is not None:
+            self.router.record(route, time.monotonic() - started, ok=not transient)
+        breaker = self._breaker(route)
+        if not transient:
+            # The provider answered, so it is up
+            if breaker:
+                breaker.success()
+            return None
+        if breaker:
+            breaker.failure()
+        delay = self.retry.delay(attempt, expires_at) if self.retry else None
+        resilience.count("retries" if delay is not None else "failures")
+        return delay
+
+    def _next_route(self, routes, index):
+        """Index of the route of the next attempt; failing over costs no backoff."""
+        if index + 1 < len(routes):
+            self.router.failed_over()
+            return index + 1, True
+        return index, False
+
+    def invoke(self, name: str, messages, task: str | None = None):
+        """Call the runnable ``name`` with ``messages``, within the limits above."""
+        return self._invoke(name, messages, task)[0]
+
+    async def ainvoke(self, name: str, messages, task: str | None = None):
+        """Async version of ``invoke``."""
+        return (await self._ainvoke(name, messages, task))[0]
+
+    def _invoke(self, name: str, messages, task: str | None = None):
+        """Like ``invoke``, returning the response and the route that answered."""
+        routes = self.routes(task)
+        expires_at = self.retry.expires_at() if self.retry else None
+        attempt = index = 0
+        while True:
+            index = self._available(routes, index)
+            route = routes[index]
+            self._acquire(route, messages)
+            started = time.monotonic()
+            try:
+                response = self.runnable(name, route).invoke(messages)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, expires_at, route, started)
+                if delay is None:
+                    raise
+                index, failed_over = self._next_route(routes, index)
+                if not failed_over:
+                    time.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(route, started)
+            return response, route
+
+    async def _ainvoke(self, name: str, messages, task: str | None = None):
+        """Async version of ``_invoke``."""
+        routes = self.routes(task)
+        expires_at = self.retry.expires_at() if self.retry else None
+        attempt = index = 0
+        while True:
+            index = self._available(routes, index)
+            route = routes[index]
+            await self._aacquire(route, messages)
+            started = time.monotonic()
+            try:
+                response = await self.runnable(name, route).ainvoke(messages)
+            except Exception as exc:
+                delay = self._retry_delay(exc, attempt, expires_at, route, started)
+                if delay is None:
+                    raise
+                index, failed_over = self._next_route(routes, index)
+                if not failed_over:
+                    await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(route, started)
+            return response, route
+
+    def stream_route(self, task: str | None):
+        """Route a stream of ``task`` takes: the first one whose breaker is closed."""
+        routes = self.routes(task)
+        return routes[self._available(routes, 0)]
+
+    def stream_chunks(
+        self, name: str, messages, task: str | None = None, route: Route | None = None
+    ):
+        """
+        Stream the runnable ``name`` with ``messages``, within the limits above.
 
+        Streams are not retried, as their first chunks may have been used.
+        Callers that need to know the route beforehand pass the one
+        ``stream_route`` returned for ``task``.
+        """
+        if route is None:
+            route = self.stream_route(task)
+        self._acquire(route, messages)
+        return self._observe(self.runnable(name, route).stream(messages), route)
 
-class GenerateBackCardUsecase:
-    def __init__(self, llm: ChatOpenAI, prompt: str):
-        self.llm = llm.with_structured_output(BackcardResponse)
+    async def astream_chunks(
+        self, name: str, messages, task: str | None = None, route: Route | None = None
+    ):
+        """Async version of ``stream_chunks``; waits for the limits when iterated."""
+        if route is None:
+            route = self.stream_route(task)
+        await self._aacquire(route, messages)
+        chunks = self.runnable(name, route).astream(messages)
+        started = time.monotonic()
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as exc:
+            self._stream_failed(exc, route, started)
+            raise
+        finally:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose:
+                await aclose()
+        self._succeeded(route, started)
+
+    def _observe(self, chunks, route=None):
+        started = time.monotonic()
+        try:
+            yield from chunks
+        except Exception as exc:
+            self._stream_failed(exc, route, started)
+            raise
+        self._succeeded(route, started)
+
+    def _stream_failed(self, exc, route, started):
+        transient = is_transient(exc)
+        if route is not None:
+            self.router.record(route, time.monotonic() - started, not transient)
+        breaker = self._breaker(route)
+        if breaker and transient:
+            breaker.failure()
+
+
+class GenerateBackCardUsecase(LLMUsecase):
+    def __init__(
+        self,
+        llm: "BaseChatModel | None" = None,
+        prompt: str = "",
+        cache: BackcardCache | None = None,
+        single_flight: SingleFlight | None = None,
+        llm_factory: Callable[..., "BaseChatModel"] | None = None,
+        limiter: ProviderLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        router: Router | None = None,
+    ):
+        super().__init__(
+            llm=llm,
+            llm_factory=llm_factory,
+            limiter=limiter,
+            retry=retry,
+            breaker=breaker,
+            router=router,
+        )
         self.prompt = prompt
+        self.cache = cache
+        self.single_flight = single_flight
 
-    def generate(
+    def messages(self, front_card: str, source_language: str, target_language: str):
+        user_message = f"front_card:```{front_card}```, source_language:{source_language}, target_language:{target_language}"
+        return chat_messages(self.prompt, user_message)
+
+    def build_llm(self, chat_model):
+        return structured_output(chat_model, BackcardResponse)
+
+    @staticmethod
+    def task(front_card: str) -> str:
+        """Route single words to ``back_card_word``, idioms to ``back_card_phrase``."""
+        return "back_card_word" if len(front_card.split()) <= 1 else "back_card_phrase"
+
+    def cache_model(self, front_card: str):
+        """
+        Model under which the backcard of ``front_card`` is looked up: that of
+        its route on the preferred backend. Answers of other models, such as
+        those of a fallback backend, are cached under their own model.
+        """
+        return self.route_name(self.task(front_card))
+
+    def flight_key(self, front_card: str, source_language: str, target_language: str):
+        """Key under which identical concurrent requests are coalesced."""
+        if self.cache:
+            return self.cache.key(
+                front_card,
+                source_language,
+                target_language,
+                self.cache_model(front_card),
+            )
+        return f"{normalize_text(front_card)}:{source_language}:{target_language}"
+
+    @staticmethod
+    def _salvage(raw):
+        """
+        Return a backcard of the complete fields of an answer that failed to
+        parse, or None if they do not include the translation.
+        """
+        fields = {
+            name: value
+            for name, value in salvage_object(raw_arguments(raw)).items()
+            if name in BackcardResponse.model_fields and isinstance(value, str)
+        }
+        if not fields.get("translation"):
+            return None
+        parsing.count("repaired")
+        parsing.count("failed_tokens", total_tokens(raw))
+        return BackcardResponse(**fields)
+
+    def answer(self, front_card: str, source_language: str, target_language: str):
+        """
+        Call the model for one backcard, bypassing the cache.
+
+        An answer that fails to parse is salvaged; the call is repeated once
+        only if no translation could be salvaged.
+
+        Returns:
+            tuple: The ``BackcardResponse`` and the name of the route that
+            answered, None for the default model.
+        """
+        messages = self.messages(front_card, source_language, target_language)
+        task = self.task(front_card)
+        result, route = self._invoke("llm", messages, task)
+        response, raw, error = self._parsed(result)
+        response = response or self._salvage(raw)
+        if response is None:
+            # Without a translation the whole card is the remainder
+            parsing.count("full_retries")
+            result, route = self._invoke("llm", messages, task)
+            response, raw, _ = self._parsed(result)
+            response = response or self._salvage(raw)
+            if response is None:
+                raise error
+        return response, route and route.name
+
+    async def aanswer(
+        self, front_card: str, source_language: str, target_language: str
+    ):
+        """Async version of ``answer``."""
+        messages = self.messages(front_card, source_language, target_language)
+        task = self.task(front_card)
+        result, route = await self._ainvoke("llm", messages, task)
+        response, raw, error = self._parsed(result)
+        response = response or self._salvage(raw)
+        if response is None:
+            parsing.count("full_retries")
+            result, route = await self._ainvoke("llm", messages, task)
+            response, raw, _ = self._parsed(result)
+            response = response or self._salvage(raw)
+            if response is None:
+                raise error
+        return response, route and route.name
+
+    def _generate(
         self, front_card: str, source_language: str, target_language: str
     ) -> BackcardResponse:
-        user_message = f"front_card:```{front_card}```, source_language:{source_language}, target_language:{target_language}"
-        messages = [
-            SystemMessage(content=self.prompt),
-            HumanMessage(content=user_message),
-        ]
-        response = self.llm.invoke(messages)
+        response, model = self.answer(front_card, source_language, target_language)
+        if self.cache:
+            self.cache.set(
+                front_card, source_language, target_language, response, model
+            )
         return response
 
+    async def _agenerate(
+        self, front_card: str, source_language: str, target_language: str
+    ) -> BackcardResponse:
+        response, model = await self.aanswer(
+            front_card, source_language, target_language
+        )
+        if self.cache:
+            await sync_to_async(self.cache.set)(
+                front_card, source_language, target_language, response, model
+            )
+        return response
+
+    def _stale(self, exc, front_card: str, source_language: str, target_language: str):
+        """Return an expired cached answer if ``exc`` means the provider is failing."""
+        if not self.cache or not (
+            is_transient(exc)
+            or isinstance(exc, (ProviderUnavailable, ProviderBusy, SingleFlightError))
+        ):
+            return None
+        stale = self.cache.get(
+            front_card,
+            source_language,
+            target_language,
+            stale=True,
+            model_name=self.cache_model(front_card),
+        )
+        if stale is not None:
+            resilience.count("stale_served")
+        return stale
+
+    def generate(
+        self, front_card: str, source_language: str, target_language: str
+    ) -> BackcardResponse:
+        if self.cache:
+            cached = self.cache.get(
+                front_card,
+                source_language,
+                target_language,
+                model_name=self.cache_model(front_card),
+            )
+            if cached is not None:
+                usage_recorder.record_cache_hit(self.cache.model_name)
+                return cached
+        try:
+            if self.single_flight:
+                return self.single_flight.do(
+                    self.flight_key(front_card, source_language, target_language),
+                    lambda: self._generate(
+                        front_card, source_language, target_language
+                    ),
+                )
+            return self._generate(front_card, source_language, target_language)
+        except Exception as exc:
+            stale = self._stale(exc, front_card, source_language, target_language)
+            if stale is None:
+                raise
+            return stale
+
+    async def agenerate(
+        self, front_card: str, source_language: str, target_language: str
+    ) -> BackcardResponse:
+        if self.cache:
+            cached = await sync_to_async(self.cache.get)(
+                front_card,
+                source_language,
+                target_language,
+                model_name=self.cache_model(front_card),
+            )
+            if cached is not None:
+                usage_recorder.record_cache_hit(self.cache.model_name)
+                return cached
+        try:
+            if self.single_flight:
+                return await self.single_flight.ado(
+                    self.flight_key(front_card, source_language, target_language),
+                    lambda: self._agenerate(
+                        front_card, source_language, target_language
+                    ),
+                )
+            return await self._agenerate(front_card, source_language, target_language)
+        except Exception as exc:
+            stale = await sync_to_async(self._stale)(
+                exc, front_card, source_language, target_language
+            )
+            if stale is None:
+                raise
+            return stale
+
+
+router = Router(
+    BACKENDS,
+    ROUTING_TIERS,
+    LatencyTracker(
+        window=ROUTING_WINDOW,
+        min_calls=ROUTING_MIN_CALLS,
+        max_error_rate=ROUTING_MAX_ERROR_RATE,
+        max_p95=ROUTING_MAX_P95,
+    ),
+    breaker_failures=LLM_BREAKER_FAILURES,
+    breaker_reset=LLM_BREAKER_RESET,
+)
+
 
 generate_back_card_usecase = GenerateBackCardUsecase(
-    llm=back_card_llm, prompt=BACKCARD_GENERATION_PROMPT
+    llm_factory=llm_factory("back_card"),
+    router=router,
+    limiter=ProviderLimiter(
+        back_card_setting,
+        INTERACTIVE,
+        max_wait=LLM_RATE_LIMIT_MAX_WAIT,
+        reserve=LLM_INTERACTIVE_RESERVE,
+    ),
+    retry=RetryPolicy(LLM_MAX_RETRIES, deadline=back_card_setting.deadline),
+    prompt=BACKCARD_GENERATION_PROMPT,
+    cache=BackcardCache(
+        model_name=back_card_setting.model_name,
+        prompt=BACKCARD_GENERATION_PROMPT,
+        max_entries=BACKCARD_CACHE_SIZE,
+        ttl=BACKCARD_CACHE_TTL,
+        model_names=router.route_names(),
+    ),
+    single_flight=SingleFlight("backcard"),
 )
 
 
-class GenerateTopicUsecase:
-    def __init__(self, llm: ChatOpenAI, prompt: str):
-        self.llm = llm.with_structured_output(TopicGenerationResponse)
+class GenerateBackCardsUsecase(LLMUsecase):
+    """
+    Generate the backcards of many words with a few batched LLM calls.
+
+    Words are answered from the backcard cache where possible; the rest are
+    sent ``batch_size`` at a time, so the long system prompt is paid once per
+    batch instead of once per word. Batches run concurrently, at most
+    ``concurrency`` at a time. Words a batch answer leaves out, or that were
+    lost with the unparsable end of a truncated answer, are generated one by
+    one with the single-word usecase. Answers are cached under the
+    model that gave them, so the batch model's answers are only served
+    where the single-word usecase would call the same model.
+    """
+
+    def __init__(
+        self,
+        llm: "BaseChatModel | None" = None,
+        prompt: str = "",
+        backcard_usecase: GenerateBackCardUsecase | None = None,
+        batch_size: int = 25,
+        concurrency: int = 4,
+        llm_factory: Callable[..., "BaseChatModel"] | None = None,
+        limiter: ProviderLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        router: Router | None = None,
+    ):
+        super().__init__(
+            llm=llm,
+            llm_factory=llm_factory,
+            limiter=limiter,
+            retry=retry,
+            breaker=breaker,
+            router=router,
+        )
         self.prompt = prompt
+        self.backcard_usecase = backcard_usecase
+        self.batch_size = batch_size
+        self.concurrency = concurrency
 
-    def generate(
-        self, topic: str, source_language: str, target_language: str, count: int = 10
-    ) -> TopicGenerationResponse:
+    def messages(self, words, source_language: str, target_language: str):
+        numbered = "\n".join(f"{i}. ```{word}```" for i, word in enumerate(words, 1))
+        user_message = f"words:\n{numbered}\nsource_language:{source_language}, target_language:{target_language}"
+        return chat_messages(self.prompt, user_message)
+
+    def build_llm(self, chat_model):
+        return structured_output(chat_model, BatchBackcardResponse)
+
+    def cache_model(self):
+        """Model under which the batch answers are cached."""
+        return self.route_name("batch_back_card")
+
+    @staticmethod
+    def _salvage(raw):
+        """Return the complete, valid backcards of an answer that failed to parse."""
+        backcards = []
+        for item in salvage_items(raw_arguments(raw), "backcards"):
+            try:
+                backcards.append(BatchBackcard.model_validate(item))
+            except ValueError:
+                continue
+        return backcards
+
+    def _generate_batch(self, words, source_language: str, target_language: str):
+        """
+        Return ``{normalized word: BackcardResponse}`` for one batch, and the
+        name of the route that answered.
+        """
+        result, route = self._invoke(
+            "llm",
+            self.messages(words, source_language, target_language),
+            "batch_back_card",
+        )
+        response, raw, _ = self._parsed(result)
+        backcards = response.backcards if response is not None else self._salvage(raw)
+        answers = {
+            normalize_text(backcard.word_or_phrase): BackcardResponse(
+                **backcard.model_dump(exclude={"word_or_phrase"})
+            )
+            for backcard in backcards
+        }
+        if response is None:
+            # The words left without an answer go to the single-word usecase
+            parsing.count("failed_tokens", total_tokens(raw))
+            if not answers:
+                parsing.count("full_retries")
+            elif all(normalize_text(word) in answers for word in words):
+                parsing.count("repaired")
+            else:
+                parsing.count("remainder_retries")
+        return answers, route and route.name
+
+    def _generate_one(self, word: str, source_language: str, target_language: str):
+        return self.backcard_usecase.answer(word, source_language, target_language)
+
+    def generate(self, words, source_language: str, target_language: str):
+        """
+        Generate backcards for a list of words or phrases.
+
+        LLM calls run in worker threads; cache reads and writes stay in the
+        calling thread.
+
+        Args:
+            words (list[str]): The words or phrases, duplicates allowed.
+            source_language (str): Language of the words.
+            target_language (str): Language of the translations.
+
+        Returns:
+            tuple: ``{word: BackcardResponse}`` and ``{word: error message}``,
+            both keyed by the words exactly as given.
+        """
+        cache = self.backcard_usecase.cache
+        backcards, errors = {}, {}
+        pending = {}
+        for word in words:
+            cached = (
+                cache.get(
+                    word,
+                    source_language,
+                    target_language,
+                    model_name=self.backcard_usecase.cache_model(word),
+                )
+                if cache
+                else None
+            )
+            if cached is not None:
+                usage_recorder.record_cache_hit(cache.model_name)
+                backcards[word] = cached
+            else:
+                pending.setdefault(normalize_text(word), []).append(word)
+        if not pending:
+            return backcards, errors
+
+        unique = [inputs[0] for inputs in pending.values()]
+        batches = [
+            unique[i : i + self.batch_size]
+            for i in range(0, len(unique), self.batch_size)
+        ]
+        generated, missing = {}, []
+        with ThreadPoolExecutor(
+            max_workers=min(self.concurrency, len(batches))
+        ) as pool:
+            futures = [
+                (
+                    batch,
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        self._generate_batch,
+                        batch,
+                        source_language,
+                        target_language,
+                    ),
+                )
+                for batch in batches
+            ]
+            for batch, future in futures:
+                try:
+                    answers, model = future.result()
+                except Exception as exc:
+                    logger.warning(
+                        "Backcard batch of %s words failed", len(batch), exc_info=True
+                    )
+                    for word in batch:
+                        errors[word] = str(exc) or exc.__class__.__name__
+                    continue
+                for word in batch:
+                    answer = answers.get(normalize_text(word))
+                    if answer is None:
+                        missing.append(word)
+                    else:
+                        generated[word] = answer, model
+
+            futures = [
+                (
+                    word,
+                    pool.submit(
+                        contextvars.copy_context().run,
+                        self._generate_one,
+                        word,
+                        source_language,
+                        target_language,
+                    ),
+                )
+                for word in missing
+            ]
+            for word, future in futures:
+                try:
+                    generated[word] = future.result()
+                except Exception as exc:
+                    logger.warning("Backcard of %r failed", word, exc_info=True)
+                    errors[word] = str(exc) or exc.__class__.__name__
+
+        for word, (backcard, model) in generated.items():
+            if cache:
+                cache.set(word, source_language, target_language, backcard, model)
+            for duplicate in pending[normalize_text(word)]:
+                backcards[duplicate] = backcard
+        for word, error in list(errors.items()):
+            for duplicate in pending[normalize_text(word)]:
+                errors[duplicate] = error
+        return backcards, errors
+
+
+generate_back_cards_usecase = GenerateBackCardsUsecase(
+    llm_factory=llm_factory("batch_back_card"),
+    router=router,
+    limiter=ProviderLimiter(
+        batch_back_card_setting,
+        BATCH,
+        max_wait=LLM_RATE_LIMIT_MAX_WAIT,
+        reserve=LLM_INTERACTIVE_RESERVE,
+    ),
+    retry=RetryPolicy(LLM_MAX_RETRIES, deadline=batch_back_card_setting.deadline),
+    prompt=BATCH_BACKCARD_GENERATION_PROMPT,
+    backcard_usecase=generate_back_card_usecase,
+    batch_size=BACKCARD_BATCH_SIZE,
+    concurrency=BACKCARD_BATCH_CONCURRENCY,
+)
+
+
+class GenerateTopicUsecase(LLMUsecase):
+    """
+    Generate vocabulary cards for a topic.
+
+    One call returns at most ``MAX_CARDS_PER_CALL`` cards. ``generate_many``
+    splits larger requests into concurrent calls, each seeded with a
+    different facet of the topic, and merges their cards.
+
+    With a ``cache``, ``generate_many`` and ``stream`` answer from the pool of
+    cached cards of the topic, or of a similar one, when it is large enough.
+    A miss generates at least ``pool_size`` cards for the pool. Pools are
+    kept per model, so cards of a fallback backend are only served for it.
+
+    ``generate_excluding`` generates cards for a box: the words the box
+    already has are hinted at in the prompt and filtered from the result.
+    """
+
+    MAX_CARDS_PER_CALL = 50
+    # Shards ask for this many percent more cards to make up for duplicates
+    OVERSHOOT_PERCENT = 10
+
+    runnables = ("llm", "streaming_llm")
+
+    def __init__(
+        self,
+        llm: "BaseChatModel | None" = None,
+        prompt: str = "",
+        concurrency: int = 5,
+        llm_factory: Callable[..., "BaseChatModel"] | None = None,
+        limiter: ProviderLimiter | None = None,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        router: Router | None = None,
+        cache: TopicCache | None = None,
+        pool_size: int = 0,
+        exclude_hint_size: int = 100,
+    ):
+        super().__init__(
+            llm=llm,
+            llm_factory=llm_factory,
+            limiter=limiter,
+            retry=retry,
+            breaker=breaker,
+            router=router,
+        )
+        self.prompt = prompt
+        self.concurrency = concurrency
+        self.cache = cache
+        self.pool_size = pool_size
+        self.exclude_hint_size = exclude_hint_size
+
+    def build_llm(self, chat_model):
+        return structured_output(chat_model, TopicGenerationResponse)
+
+    @cached_property
+    def streaming_llm(self):
+        return self.build_streaming_llm(self.chat_model)
+
+    def build_streaming_llm(self, chat_model):
+        # Streams the arguments of a forced tool call, so cards can be parsed
+        # as they arrive
+        return chat_model.bind_tools(
+            [TopicGenerationResponse], tool_choice=TopicGenerationResponse.__name__
+        )
+
+    def messages(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int,
+        focus: str | None = None,
+        exclude: list[str] | None = None,
+    ):
         if count < 1:
             raise ValueError("Count must be greater than 0")
-        if count > 50:
+        if count > self.MAX_CARDS_PER_CALL:
             raise ValueError("Count must be less than 50")
         user_message = f"topic:```{topic}```, source_language:{source_language}, target_language:{target_language}, count:{count}"
+        if focus:
+            user_message += f", focus:```{focus}```"
+        if exclude:
+            user_message += (
+                f", exclude (do not generate these):```{'; '.join(exclude)}```"
+            )
 
-        messages = [
-            SystemMessage(content=self.prompt),
-            HumanMessage(content=user_message),
-        ]
-        response = self.llm.invoke(messages)
+        return chat_messages(self.prompt, user_message)
+
+    def cache_model(self):
+        """
+        Model under which topic pools are looked up: that of the topic route
+        on the preferred backend. Cards of other models are pooled under
+        their own model.
+        """
+        return self.route_name("topic_generation")
+
+    def generate(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int = 10,
+        focus: str | None = None,
+        exclude: list[str] | None = None,
+    ) -> TopicGenerationResponse:
+        return self.answer(
+            topic, source_language, target_language, count, focus, exclude
+        )[0]
+
+    def answer(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int = 10,
+        focus: str | None = None,
+        exclude: list[str] | None = None,
+    ):
+        """
+        Call the model once for up to ``count`` cards, as ``generate`` does.
+
+        Returns:
+            tuple: The ``TopicGenerationResponse`` and the set of the names of
+            the routes that answered, None for the default model.
+        """
+        messages = self.messages(
+            topic, source_language, target_language, count, focus, exclude
+        )
+        result, route = self._invoke("llm", messages, "topic_generation")
+        response, raw, error = self._parsed(result)
+        models = {route and route.name}
+        if response is not None:
+            return response, models
+        cards = self._salvage(raw)
+        retry = None
+        if len(cards) < count:
+            retry, route = self._invoke(
+                "llm",
+                self._remainder(
+                    cards,
+                    topic,
+                    source_language,
+                    target_language,
+                    count,
+                    focus,
+                    exclude,
+                ),
+                "topic_generation",
+            )
+            models.add(route and route.name)
+        return self._repaired(cards, raw, error, retry, count), models
+
+    async def agenerate(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int = 10,
+        focus: str | None = None,
+        exclude: list[str] | None = None,
+    ) -> TopicGenerationResponse:
+        response, _ = await self.aanswer(
+            topic, source_language, target_language, count, focus, exclude
+        )
         return response
 
+    async def aanswer(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int = 10,
+        focus: str | None = None,
+        exclude: list[str] | None = None,
+    ):
+        """Async version of ``answer``."""
+        messages = self.messages(
+            topic, source_language, target_language, count, focus, exclude
+        )
+        result, route = await self._ainvoke("llm", messages, "topic_generation")
+        response, raw, error = self._parsed(result)
+        models = {route and route.name}
+        if response is not None:
+            return response, models
+        cards = self._salvage(raw)
+        retry = None
+        if len(cards) < count:
+            retry, route = await self._ainvoke(
+                "llm",
+                self._remainder(
+                    cards,
+                    topic,
+                    source_language,
+                    target_language,
+                    count,
+                    focus,
+                    exclude,
+                ),
+                "topic_generation",
+            )
+            models.add(route and route.name)
+        return self._repaired(cards, raw, error, retry, count), models
+
+    @staticmethod
+    def _salvage(raw):
+        """Return the complete, valid cards of an answer that failed to parse."""
+        cards = []
+        for item in salvage_items(raw_arguments(raw), "cards"):
+            try:
+                cards.append(TopicCard.model_validate(item))
+            except ValueError:
+                continue
+        return cards
+
+    def _remainder(
+        self, cards, topic, source_language, target_language, count, focus, exclude
+    ):
+        """Messages asking for the cards still missing after ``cards``."""
+        return self.messages(
+            topic,
+            source_language,
+            target_language,
+            count - len(cards),
+            focus,
+            (exclude or []) + [card.front for card in cards],
+        )
+
+    def _repaired(self, cards, raw, error, retry, count):
+        """
+        Return the salvaged ``cards`` and those of the ``retry`` that asked
+        for the remainder, counting the repair; raise ``error`` if there are
+        no cards at all.
+        """
+        if retry is None:
+            parsing.count("repaired")
+            parsing.count("failed_tokens", total_tokens(raw))
+        else:
+            response, retry_raw, _ = self._parsed(retry)
+            if cards:
+                parsing.count("remainder_retries")
+                parsing.count("failed_tokens", total_tokens(raw))
+                parsing.count("retry_tokens", total_tokens(retry_raw))
+            else:
+                parsing.count("full_retries")
+            cards = cards + (
+                response.cards if response is not None else self._salvage(retry_raw)
+            )
+        if not cards:
+            raise error
+        return TopicGenerationResponse(cards=cards[:count])
+
+    def plan_shards(self, count: int):
+        """Split ``count`` into ``(count, focus)`` sub-requests of similar size."""
+        total = count + math.ceil(count * self.OVERSHOOT_PERCENT / 100)
+        shards = math.ceil(total / self.MAX_CARDS_PER_CALL)
+        size = math.ceil(total / shards)
+        return [(size, TOPIC_FACETS[i % len(TOPIC_FACETS)]) for i in range(shards)]
+
+    @staticmethod
+    def _merge(new_cards, cards, seen):
+        """Append the cards whose normalized front is not in ``seen`` yet."""
+        for card in new_cards:
+            key = normalize_text(card.front)
+            if key and key not in seen:
+                seen.add(key)
+                cards.append(card)
+
+    def _follow_ups(self, count, cards, failed, hint=None):
+        """
+        Plan the second round: failed shards again, then a top-up for any
+        shortfall, each told to avoid ``hint`` and the cards collected so far.
+        """
+        missing = count - len(cards) - sum(size for size, _ in failed)
+        requests = list(failed)
+        if missing > 0:
+            requests.append(
+                (
+                    min(missing, self.MAX_CARDS_PER_CALL),
+                    TOPIC_FACETS[len(requests) % len(TOPIC_FACETS)],
+                )
+            )
+        exclude = (hint or []) + [card.front for card in cards]
+        return [(size, focus, exclude) for size, focus in requests]
+
+    def exclusion_hint(self, exclude):
+        """The first ``exclude_hint_size`` words of ``exclude``, for the prompt."""
+        return list(exclude[: self.exclude_hint_size]) or None
+
+    def generate_many(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int,
+        exclude: list[str] | None = None,
+    ) -> TopicGenerationResponse:
+        """
+        Generate any number of cards, fanning out above ``MAX_CARDS_PER_CALL``.
+
+        Shards run concurrently, at most ``concurrency`` at a time. Cards are
+        deduplicated on their normalized front. Only shards that failed are
+        retried, once, together with a top-up call if duplicates left the
+        result short.
+
+        ``exclude`` lists normalized fronts not to generate, most relevant
+        first. Cached cards among them are not returned, and the first
+        ``exclude_hint_size`` are named in the prompts; the model may still
+        return some of them. Cards generated with an exclusion are not added
+        to the cache, whose pools are shared by all users.
+        """
+        exclude = exclude or []
+        if not self.cache:
+            return self._generate_many(
+                topic, source_language, target_language, count, exclude
+            )[0]
+        cached = self.cache.get(
+            topic,
+            source_language,
+            target_language,
+            count,
+            set(exclude),
+            model_name=self.cache_model(),
+        )
+        if cached is not None:
+            usage_recorder.record_cache_hit(self.cache.model_name)
+            return cached
+        if exclude:
+            return self._generate_many(
+                topic, source_language, target_language, count, exclude
+            )[0]
+        response, models = self._generate_many(
+            topic, source_language, target_language, max(count, self.pool_size), []
+        )
+        self._pool(topic, source_language, target_language, response, models)
+        return TopicGenerationResponse(cards=response.cards[:count])
+
+    def _pool(self, topic, source_language, target_language, response, models):
+        """
+        Add ``response`` to the pool of the model that generated it; cards
+        that several models generated together are not pooled.
+        """
+        if len(models) == 1:
+            self.cache.set(
+                topic, source_language, target_language, response, models.pop()
+            )
+
+    def _generate_many(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int,
+        exclude: list[str],
+    ):
+        """
+        Generate the cards of ``generate_many``, bypassing the cache, and
+        return them with the names of the routes that answered.
+        """
+        hint = self.exclusion_hint(exclude)
+        if count <= self.MAX_CARDS_PER_CALL:
+            return self.answer(
+                topic=topic,
+                source_language=source_language,
+                target_language=target_language,
+                count=count,
+                exclude=hint,
+            )
+
+        cards, seen, models, error = [], set(), set(), None
+        rounds = [[(size, focus, hint) for size, focus in self.plan_shards(count)]]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for round_number in range(2):
+                futures = [
+                    (
+                        (size, focus),
+                        pool.submit(
+                            contextvars.copy_context().run,
+                            self.answer,
+                            topic=topic,
+                            source_language=source_language,
+                            target_language=target_language,
+                            count=size,
+                            focus=focus,
+                            exclude=exclude,
+                        ),
+                    )
+                    for size, focus, exclude in rounds[-1]
+                ]
+                failed = []
+                for shard, future in futures:
+                    try:
+                        response, answered = future.result()
+                    except Exception as exc:
+                        logger.warning(
+                            "Topic shard of %s cards on %r failed",
+                            *shard,
+                            exc_info=True,
+                        )
+                        error = exc
+                        failed.append(shard)
+                    else:
+                        self._merge(response.cards, cards, seen)
+                        models |= answered
+                if len(cards) >= count or round_number == 1:
+                    break
+                rounds.append(self._follow_ups(count, cards, failed, hint))
+
+        if not cards and error:
+            raise error
+        return TopicGenerationResponse(cards=cards[:count]), models
+
+    def generate_excluding(
+        self,
+        topic: str,
+        source_language: str,
+        target_language: str,
+        count: int,
+        existing: list[str],
+    ) -> tuple[TopicGenerationResponse, dict]:
+        """
+        Generate up to ``count`` cards whose normalized front is not in
+        ``existing``, e.g. the words of the box they are for.
+
+        ``existing`` is passed to ``generate_many`` as its ``exclude`` list.
+        Cards the model returned anyway are dropped, and only if that leaves
+        the result short a single follow-up call asks for the missing cards.
+
+        Returns the response and a report: the cards ``generated``, how many
+        of them duplicated an existing word, and the ``duplicate_rate`` of
+        the generated cards ``before`` filtering and of the returned ones
+        ``after`` it.
+        """
+        existing_set = set(existing)
+        seen, cards, generated = set(), [], []
+
+        def add(response):
+            for card in response.cards:
+                key = normalize_text(card.front)
+                generated.append(key)
+                if key and key not in existing_set and key not in seen:
+                    seen.add(key)
+                    cards.append(card)
+
+        add(
+            self.generate_many(topic, source_language, target_language, count, existing)
+        )
+        top_up_calls = 0
+        if len(cards) < count:
+            top_up_calls = 1
+            add(
+                self.generate(
+                    topic=topic,
+                    source_language=source_language,
+                    target_language=target_language,
+                    count=min(count - len(cards), self.MAX_CARDS_PER_CALL),
+                    exclude=(self.exclusion_hint(existing) or [])
+                    + [card.front for card in cards],
+                )
+            )
+
+        cards = cards[:count]
+        duplicates = sum(key in existing_set for key in generated)
+        remaining = sum(normalize_text(card.front) in existing_set for card in cards)
+        return TopicGenerationResponse(cards=cards), {
+            "generated": len(generated),
+            "duplicates": duplicates,
+            "top_up_calls": top_up_calls,
+            "duplicate_rate": {
+                "before": duplicates / len(generated) if generated else 0.0,
+                "after": remaining / len(cards) if cards else 0.0,
+            },
+        }
+
+    async def agenerate_many(
+        self, topic: str, source_language: str, target_language: str, count: int
+    ) -> TopicGenerationResponse:
+        """Async version of ``generate_many``."""
+        if not self.cache:
+            response, _ = await self._agenerate_many(
+                topic, source_language, target_language, count
+            )
+            return response
+        cached = await sync_to_async(self.cache.get)(
+            topic,
+            source_language,
+            target_language,
+            count,
+            model_name=self.cache_model(),
+        )
+        if cached is not None:
+            usage_recorder.record_cache_hit(self.cache.model_name)
+            return cached
+        response, models = await self._agenerate_many(
+            topic, source_language, target_language, max(count, self.pool_size)
+        )
+        await sync_to_async(self._pool)(
+            topic, source_language, target_language, response, models
+        )
+        return TopicGenerationResponse(cards=response.cards[:count])
+
+    async def _agenerate_many(
+        self, topic: str, source_language: str, target_language: str, count: int
+    ):
+        """Async version of ``_generate_many``."""
+        if count <= self.MAX_CARDS_PER_CALL:
+            return await self.aanswer(
+                topic=topic,
+                source_language=source_language,
+                target_language=target_language,
+                count=count,
+            )
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def shard(size, focus, exclude):
+            async with semaphore:
+                return await self.aanswer(
+                    topic=topic,
+                    source_language=source_language,
+                    target_language=target_language,
+                    count=size,
+                    focus=focus,
+                    exclude=exclude,
+                )
+
+        cards, seen, models, error = [], set(), set(), None
+        requests = [(size, focus, None) for size, focus in self.plan_shards(count)]
+        for round_number in range(2):
+            results = await asyncio.gather(
+                *(shard(*request) for request in requests), return_exceptions=True
+            )
+            failed = []
+            for (size, focus, _), result in zip(requests, results):
+                if isinstance(result, Exception):
+                    error = result
+                    failed.append((size, focus))
+                else:
+                    response, answered = result
+                    self._merge(response.cards, cards, seen)
+                    models |= answered
+            if len(cards) >= count or round_number == 1:
+                break
+            requests = self._follow_ups(count, cards, failed)
+
+        if not cards and error:
+            raise error
+        return TopicGenerationResponse(cards=cards[:count]), models
+
+    def stream(
+        self, topic: str, source_language: str, target_language: str, count: int = 10
+    ):
+        """
+        Generate cards for a topic and yield each ``TopicCard`` as soon as it
+        is complete.
+
+        The input is validated before anything is sent, so a ValueError is
+        raised here rather than while iterating. Cards that fail validation
+        are skipped. Closing the returned generator closes the model stream.
+        Cached cards are yielded at once; streamed ones are added to the pool
+        of the model that streamed them, but only once the stream finished:
+        the cards of a stream that was cut short or closed early are not.
+        """
+        messages = self.messages(topic, source_language, target_language, count)
+        if not self.cache:
+            return self._stream(messages)
+        cached = self.cache.get(
+            topic,
+            source_language,
+            target_language,
+            count,
+            model_name=self.cache_model(),
+        )
+        if cached is not None:
+            return self._replay(cached.cards)
+        return self._stream_into_cache(
+            messages, topic, source_language, target_language
+        )
+
+    def astream(
+        self, topic: str, source_language: str, target_language: str, count: int = 10
+    ):
+        """
+        Async version of ``stream``, returning an async generator.
+
+        The input is validated here, before anything is sent; the cache is
+        looked up once the generator is iterated.
+        """
+        messages = self.messages(topic, source_language, target_language, count)
+        if not self.cache:
+            return self._astream(messages)
+        return self._astream_cached(
+            messages, topic, source_language, target_language, count
+        )
+
+    def _replay(self, cards):
+        # Recorded while iterating, inside the caller's usage scope
+        usage_recorder.record_cache_hit(self.cache.model_name)
+        yield from cards
+
+    async def _astream_cached(
+        self, messages, topic, source_language, target_language, count
+    ):
+        cached = await sync_to_async(self.cache.get)(
+            topic,
+            source_language,
+            target_language,
+            count,
+            model_name=self.cache_model(),
+        )
+        if cached is not None:
+            usage_recorder.record_cache_hit(self.cache.model_name)
+            for card in cached.cards:
+                yield card
+            return
+        streamed = []
+        route = self.stream_route("topic_generation")
+        parser = JSONArrayItemParser("cards")
+        cards = self._astream(messages, route, parser)
+        try:
+            async for card in cards:
+                streamed.append(card)
+                yield card
+        finally:
+            await cards.aclose()
+        if parser.complete:
+            await sync_to_async(self.cache.set)(
+                topic,
+                source_language,
+                target_language,
+                TopicGenerationResponse(cards=streamed),
+                route and route.name,
+            )
+
+    def _stream_into_cache(self, messages, topic, source_language, target_language):
+        # The route is taken up front to pool the cards under its model, and
+        # the parser tells whether the model finished the array or the stream
+        # ended in the middle of it
+        route = self.stream_route("topic_generation")
+        parser = JSONArrayItemParser("cards")
+        cards = self._stream(messages, route, parser)
+        streamed = []
+        try:
+            for card in cards:
+                streamed.append(card)
+                yield card
+        finally:
+            cards.close()
+        if parser.complete:
+            self.cache.set(
+                topic,
+                source_language,
+                target_language,
+                TopicGenerationResponse(cards=streamed),
+                route and route.name,
+            )
+
+    def _stream(self, messages, route=None, parser=None):
+        parser = parser or JSONArrayItemParser("cards")
+        chunks = self.stream_chunks(
+            "streaming_llm", messages, "topic_generation", route
+        )
+        try:
+            for chunk in chunks:
+                for tool_call_chunk in chunk.tool_call_chunks:
+                    for item in parser.feed(tool_call_chunk.get("args") or ""):
+                        try:
+                            yield TopicCard.model_validate(item)
+                        except ValueError:
+                            continue
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+    async def _astream(self, messages, route=None, parser=None):
+        parser = parser or JSONArrayItemParser("cards")
+        chunks = self.astream_chunks(
+            "streaming_llm", messages, "topic_generation", route
+        )
+        try:
+            async for chunk in chunks:
+                for tool_call_chunk in chunk.tool_call_chunks:
+                    for item in parser.feed(tool_call_chunk.get("args") or ""):
+                        try:
+                            yield TopicCard.model_validate(item)
+                        except ValueError:
+                            continue
+        finally:
+            await chunks.aclose()
+
 
 generate_topic_usecase = GenerateTopicUsecase(
-    llm=topic_generation_llm, prompt=TOPIC_GENERATION_PROMPT
+    llm_factory=llm_factory("topic_generation"),
+    router=router,
+    limiter=ProviderLimiter(
+        topic_generation_setting,
+        BATCH,
+        max_wait=LLM_RATE_LIMIT_MAX_WAIT,
+        reserve=LLM_INTERACTIVE_RESERVE,
+    ),
+    retry=RetryPolicy(LLM_MAX_RETRIES, deadline=topic_generation_setting.deadline),
+    prompt=TOPIC_GENERATION_PROMPT,
+    concurrency=TOPIC_FANOUT_CONCURRENCY,
+    cache=TopicCache(
+        model_name=TOPIC_MODEL_NAME,
+        prompt=TOPIC_GENERATION_PROMPT,
+        ttl=TOPIC_CACHE_TTL,
+        min_similarity=TOPIC_CACHE_MIN_SIMILARITY,
+        candidates=TOPIC_CACHE_CANDIDATES,
+        model_names=router.route_names(),
+    ),
+    pool_size=TOPIC_CACHE_POOL_SIZE,
+    exclude_hint_size=TOPIC_EXCLUDE_HINT_SIZE,
 )
@@ -1,20 +1,54 @@
+import datetime
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import status
-from rest_framework.generics import GenericAPIView
+from rest_framework.exceptions import APIException
+from rest_framework.generics import GenericAPIView, RetrieveAPIView
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from . import parsing, ratelimit, resilience, usage
+from .jobs import enqueue
+from .models import GenerationJob
+from .ratelimit import ProviderBusy
+from .resilience import ProviderUnavailable
+from .renderers import EventStreamRenderer, sse_event
 from .schemas import BackcardResponse, TopicGenerationResponse
-from .serializers import BackcardGenerationSerializer, TopicCardsGenerationSerializer
-from .usecases import generate_back_card_usecase, generate_topic_usecase
+from .serializers import (
+    BackcardGenerationSerializer,
+    BatchBackcardGenerationSerializer,
+    GenerationJobSerializer,
+    TopicCardsGenerationSerializer,
+)
+from .throttling import QuotaHeadersMixin, charge, refund
+from .usecases import (
+    generate_back_card_usecase,
+    generate_back_cards_usecase,
+    generate_topic_usecase,
+    router,
+)
+
+logger = logging.getLogger(__name__)
 
 
-class GenerateBackcardView(GenericAPIView):
+class GenerateBackcardView(QuotaHeadersMixin, GenericAPIView):
     """
     API endpoint for generating backcard content.
     """
 
     permission_classes = [IsAuthenticated]
+    quota_kind = "backcard"
     serializer_class = BackcardGenerationSerializer
 
     @swagger_auto_schema(
@@ -45,21 +79,87 @@ class GenerateBackcardView(GenericAPIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        response_model = generate_back_card_usecase.generate(
-            front_card=serializer.validated_data["word_or_phrase"],
-            source_language=serializer.validated_data["source_language"],
-            target_language=serializer.validated_data["target_language"],
-        )
+        with usage.scope(request.user.id, "generate-backcard") as calls:
+            request.usage_calls = calls
+            response_model = generate_back_card_usecase.generate(
+                front_card=serializer.validated_data["word_or_phrase"],
+                source_language=serializer.validated_data["source_language"],
+                target_language=serializer.validated_data["target_language"],
+            )
 
         return Response(response_model.model_dump(exclude_none=True))
 
 
-class GenerateTopicCardsView(GenericAPIView):
+class GenerateBackcardsView(QuotaHeadersMixin, GenericAPIView):
+    """
+    API endpoint for generating the backcards of many words at once.
+    """
+
+    permission_classes = [IsAuthenticated]
+    quota_kind = "backcards"
+    serializer_class = BatchBackcardGenerationSerializer
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Generate backcard content for a list of words or phrases. Results "
+            "and errors are keyed by the words as given."
+        ),
+        request_body=BatchBackcardGenerationSerializer,
+        responses={
+            200: openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "backcards": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        additional_properties=BackcardResponse.schema(),
+                    ),
+                    "errors": openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        additional_properties=openapi.Schema(type=openapi.TYPE_STRING),
+                    ),
+                },
+            ),
+        },
+    )
+    def post(self, request):
+        """
+        Generate backcard content for a list of words or phrases.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "error": "Invalid request data. Please check your input.",
+                    "details": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with usage.scope(request.user.id, "generate-backcards") as calls:
+            request.usage_calls = calls
+            backcards, errors = generate_back_cards_usecase.generate(
+                words=serializer.validated_data["words"],
+                source_language=serializer.validated_data["source_language"],
+                target_language=serializer.validated_data["target_language"],
+            )
+        return Response(
+            {
+                "backcards": {
+                    word: backcard.model_dump(exclude_none=True)
+                    for word, backcard in backcards.items()
+                },
+                "errors": errors,
+            }
+        )
+
+
+class GenerateTopicCardsView(QuotaHeadersMixin, GenericAPIView):
     """
     API endpoint for generating topic cards.
     """
 
     permission_classes = [IsAuthenticated]
+    quota_kind = "topic"
     serializer_class = TopicCardsGenerationSerializer
 
     @swagger_auto_schema(
@@ -104,11 +204,414 @@ class GenerateTopicCardsView(GenericAPIView):
         )  # .get() handles case where count wasn't provided, already defaulted by serializer
 
         # Call use case with validated data
-        response_model = generate_topic_usecase.generate(
-            topic=validated_data["topic"],
-            source_language=validated_data["source_language"],
-            target_language=validated_data["target_language"],
-            count=count,
-        )
+        with usage.scope(request.user.id, "generate-topic-cards") as calls:
+            request.usage_calls = calls
+            response_model = generate_topic_usecase.generate_many(
+                topic=validated_data["topic"],
+                source_language=validated_data["source_language"],
+                target_language=validated_data["target_language"],
+                count=count,
+            )
 
         return Response(response_model.model_dump(exclude_none=True))
+
+
+class GenerateTopicCardsStreamView(QuotaHeadersMixin, GenericAPIView):
+    """
+    API endpoint streaming topic cards as server-sent events.
+
+    Under ASGI the events come from an async generator: Django would collect
+    a synchronous one in full before sending anything.
+    """
+
+    permission_classes = [IsAuthenticated]
+    quota_kind = "topic"
+    serializer_class = TopicCardsGenerationSerializer
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Generate cards for a topic and stream each card as a `card` event "
+            "as soon as it is generated, followed by a `done` event"
+        ),
+        request_body=TopicCardsGenerationSerializer,
+        responses={200: "text/event-stream of `card`, `done` and `error` events"},
+    )
+    def post(self, request):
+        """
+        Stream cards for a specific topic.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "error": "Invalid request data. Please check your input.",
+                    "details": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        validated_data = serializer.validated_data
+        asgi = isinstance(request._request, ASGIRequest)
+        stream = (
+            generate_topic_usecase.astream if asgi else generate_topic_usecase.stream
+        )
+        try:
+            cards = stream(
+                topic=validated_data["topic"],
+                source_language=validated_data["source_language"],
+                target_language=validated_data["target_language"],
+                count=validated_data.get("count"),
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = self.aevents if asgi else self.events
+        response = StreamingHttpResponse(
+            events(cards, request.user.id), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the stream
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    @staticmethod
+    def events(cards, user_id=None):
+        """
+        Turn generated cards into SSE events.
+
+        The model is only called once the response is iterated, after the
+        view has returned, so the usage scope is entered here. When the
+        client disconnects, the server closes this generator, which in turn
+        closes ``cards`` and the model stream behind it.
+        """
+        count = 0
+        try:
+            # Flushes the headers so the client knows the stream is open
+            yield ": stream opened\n\n"
+            with usage.scope(user_id, "generate-topic-cards-stream"):
+                for card in cards:
+                    count += 1
+                    yield sse_event("card", card.model_dump(exclude_none=True))
+            yield sse_event("done", {"count": count})
+        except Exception:
+            logger.exception("Topic card stream failed after %s cards", count)
+            yield sse_event("error", {"error": "Generation failed.", "count": count})
+        finally:
+            cards.close()
+
+    @staticmethod
+    async def aevents(cards, user_id=None):
+        """Async version of ``events``, for an async generator of cards."""
+        count = 0
+        try:
+            yield ": stream opened\n\n"
+            with usage.scope(user_id, "generate-topic-cards-stream"):
+                async for card in cards:
+                    count += 1
+                    yield sse_event("card", card.model_dump(exclude_none=True))
+            yield sse_event("done", {"count": count})
+        except Exception:
+            logger.exception("Topic card stream failed after %s cards", count)
+            yield sse_event("error", {"error": "Generation failed.", "count": count})
+        finally:
+            await cards.aclose()
+
+
+JOB_ACCEPTED_RESPONSE = openapi.Response(
+    description="Job queued",
+    schema=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            "id": openapi.Schema(type=openapi.TYPE_INTEGER),
+            "status": openapi.Schema(type=openapi.TYPE_STRING),
+        },
+        example={"id": 42, "status": "pending"},
+    ),
+)
+
+
+def job_accepted(job):
+    """Return the 202 response pointing the client at the job status endpoint."""
+    return Response(
+        {"id": job.id, "status": job.status},
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": reverse("ai:generation-job", args=[job.id])},
+    )
+
+
+class GenerateBackcardJobView(QuotaHeadersMixin, GenericAPIView):
+    """
+    API endpoint for queueing backcard generation.
+    """
+
+    permission_classes = [IsAuthenticated]
+    quota_kind = "backcard"
+    serializer_class = BackcardGenerationSerializer
+
+    @swagger_auto_schema(
+        operation_description="Queue backcard generation and return the job id",
+        request_body=BackcardGenerationSerializer,
+        responses={202: JOB_ACCEPTED_RESPONSE},
+    )
+    def post(self, request):
+        """
+        Queue backcard generation for a word or phrase.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Invalid request data. Please check your input."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        job = enqueue(
+            request.user,
+            GenerationJob.KIND_BACKCARD,
+            {
+                "front_card": serializer.validated_data["word_or_phrase"],
+                "source_language": serializer.validated_data["source_language"],
+                "target_language": serializer.validated_data["target_language"],
+            },
+        )
+        return job_accepted(job)
+
+
+class GenerateTopicCardsJobView(QuotaHeadersMixin, GenericAPIView):
+    """
+    API endpoint for queueing topic card generation.
+    """
+
+    permission_classes = [IsAuthenticated]
+    quota_kind = "topic"
+    serializer_class = TopicCardsGenerationSerializer
+
+    @swagger_auto_schema(
+        operation_description="Queue topic card generation and return the job id",
+        request_body=TopicCardsGenerationSerializer,
+        responses={202: JOB_ACCEPTED_RESPONSE},
+    )
+    def post(self, request):
+        """
+        Queue card generation for a specific topic.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {
+                    "error": "Invalid request data. Please check your input.",
+                    "details": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        validated_data = serializer.validated_data
+        job = enqueue(
+            request.user,
+            GenerationJob.KIND_TOPIC,
+            {
+                "topic": validated_data["topic"],
+                "source_language": validated_data["source_language"],
+                "target_language": validated_data["target_language"],
+                "count": validated_data.get("count"),
+            },
+        )
+        return job_accepted(job)
+
+
+class GenerationJobView(RetrieveAPIView):
+    """
+    API endpoint for polling the status and result of a generation job.
+    """
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = GenerationJobSerializer
+
+    def get_queryset(self):
+        return GenerationJob.objects.filter(user=self.request.user)
+
+
+class LLMMetricsView(GenericAPIView):
+    """
+    API endpoint reporting the usage and cost of the AI endpoints.
+    """
+
+    permission_classes = [IsAdminUser]
+    MAX_DAYS = 90
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Calls, errors, cache hits, tokens, cost and latency of the AI "
+            "endpoints per endpoint and model, the users with the highest "
+            "cost, and live counters of this process. Staff only."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "days",
+                openapi.IN_QUERY,
+                description="Number of days to cover, including today (1-90)",
+                type=openapi.TYPE_INTEGER,
+                default=7,
+            )
+        ],
+    )
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            days = 0
+        if not 1 <= days <= self.MAX_DAYS:
+            return Response(
+                {"error": f"days must be between 1 and {self.MAX_DAYS}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        since = timezone.localdate() - datetime.timedelta(days=days - 1)
+        metrics = usage.summary(since)
+        metrics["process"] = {
+            "backcard_cache": generate_back_card_usecase.cache.stats(),
+            "topic_cache": generate_topic_usecase.cache.stats(),
+            "single_flight": generate_back_card_usecase.single_flight.stats(),
+            "usage_recorder": usage.usage_recorder.stats(),
+            "provider_limiter": ratelimit.stats(),
+            "resilience": resilience.stats(),
+            "routing": router.stats(),
+            "structured_output": parsing.stats(),
+        }
+        return Response(metrics)
+
+
+class AsyncGenerationView(View):
+    """
+    Base class for the async generation endpoints.
+
+    DRF views are synchronous, so under ASGI every LLM call would hold a
+    thread for its whole duration. These views run the same DRF
+    authentication classes and serializers in a thread, then await the LLM
+    call on the event loop, so one worker can keep hundreds of calls in flight.
+    """
+
+    serializer_class = None
+    quota_kind = None
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except (ProviderBusy, ProviderUnavailable) as exc:
+            response = self.respond(
+                request, {"detail": exc.detail}, status_code=exc.status_code
+            )
+            response["Retry-After"] = str(exc.wait)
+            return response
+
+    def _authenticate_and_validate(self, request):
+        drf_request = Request(
+            request,
+            parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+            authenticators=[
+                auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ],
+        )
+        try:
+            if not drf_request.user.is_authenticated:
+                return None, JsonResponse(
+                    {"detail": "Authentication credentials were not provided."},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            serializer = self.serializer_class(data=drf_request.data)
+        except APIException as exc:
+            return None, JsonResponse({"detail": exc.detail}, status=exc.status_code)
+        if not serializer.is_valid():
+            return None, JsonResponse(
+                {
+                    "error": "Invalid request data. Please check your input.",
+                    "details": serializer.errors,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if self.quota_kind:
+            request.quota = charge(drf_request.user, self.quota_kind, drf_request.data)
+            if request.quota is not None and not request.quota.allowed:
+                return None, self.respond(
+                    request,
+                    {"detail": "Request was throttled."},
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+        return serializer.validated_data, None
+
+    @staticmethod
+    def refund_if_cached(request, calls):
+        """Give back the quota of a request answered from the cache alone."""
+        if calls.cached_only:
+            request.quota = refund(request.user, getattr(request, "quota", None))
+
+    @staticmethod
+    def respond(request, data, status_code=status.HTTP_200_OK):
+        """Return ``data`` as JSON with the quota headers of the request."""
+        response = JsonResponse(data, status=status_code)
+        quota = getattr(request, "quota", None)
+        if quota is not None:
+            for name, value in quota.headers().items():
+                response[name] = value
+        return response
+
+    async def validate(self, request):
+        """
+        Authenticate the request, validate its body and charge its quota.
+        On success, ``request.user`` is the authenticated user.
+
+        Returns:
+            tuple: The validated data, or None and the error response.
+        """
+        return await sync_to_async(self._authenticate_and_validate)(request)
+
+
+class AsyncGenerateBackcardView(AsyncGenerationView):
+    """
+    Async API endpoint for generating backcard content.
+    """
+
+    serializer_class = BackcardGenerationSerializer
+    quota_kind = "backcard"
+
+    async def post(self, request):
+        validated_data, error = await self.validate(request)
+        if error:
+            return error
+
+        with usage.scope(request.user.id, "async-generate-backcard") as calls:
+            response_model = await generate_back_card_usecase.agenerate(
+                front_card=validated_data["word_or_phrase"],
+                source_language=validated_data["source_language"],
+                target_language=validated_data["target_language"],
+            )
+        self.refund_if_cached(request, calls)
+        return self.respond(request, response_model.model_dump(exclude_none=True))
+
+
+class AsyncGenerateTopicCardsView(AsyncGenerationView):
+    """
+    Async API endpoint for generating topic cards.
+    """
+
+    serializer_class = TopicCardsGenerationSerializer
+    quota_kind = "topic"
+
+    async def post(self, request):
+        validated_data, error = await self.validate(request)
+        if error:
+            return error
+
+        with usage.scope(request.user.id, "async-generate-topic-cards") as calls:
+            response_model = await generate_topic_usecase.agenerate_many(
+                topic=validated_data["topic"],
+                source_language=validated_data["source_language"],
+                target_language=validated_data["target_language"],
+                count=validated_data.get("count"),
+            )
+        self.refund_if_cached(request, calls)
+        return self.respond(request, response_model.model_dump(exclude_none=True))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Compare how many backcard generations the sync and async paths keep in flight.
+
+A fake LLM answers every call after a fixed latency, like a remote model
+would. The sync path runs ``generate`` on a pool of threads, which is how a
+WSGI deployment (workers x threads) or a sync view under ASGI serves
+requests; the async path awaits ``agenerate`` for every request on a single
+event loop, as the async views do. No network or API key is needed.
+
+Usage:
+    python benchmarks/ai_concurrency.py [--requests 500] [--latency 1.0] [--threads 8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "memobox.settings")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_MODEL_NAME", "benchmark")
+
+import django
+
+django.setup()
+
+from ai.prompts import BACKCARD_GENERATION_PROMPT
+from ai.schemas import BackcardResponse
+from ai.usecases import GenerateBackCardUsecase
+
+
+class FakeLLM:
+    """Answers after ``latency`` seconds and records the peak number of calls in flight."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def with_structured_output(self, schema, **kwargs):
+        return self
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def invoke(self, messages):
+        self._enter()
+        time.sleep(self.latency)
+        self._exit()
+        return BackcardResponse(translation="Apfel")
+
+    async def ainvoke(self, messages):
+        self._enter()
+        await asyncio.sleep(self.latency)
+        self._exit()
+        return BackcardResponse(translation="Apfel")
+
+
+def run_sync(requests, latency, threads):
+    llm = FakeLLM(latency)
+    usecase = GenerateBackCardUsecase(llm=llm, prompt=BACKCARD_GENERATION_PROMPT)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(
+            pool.map(
+                lambda i: usecase.generate(f"word {i}", "EN", "DE"), range(requests)
+            )
+        )
+    return time.perf_counter() - start, llm.peak
+
+
+def run_async(requests, latency):
+    llm = FakeLLM(latency)
+    usecase = GenerateBackCardUsecase(llm=llm, prompt=BACKCARD_GENERATION_PROMPT)
+
+    async def main():
+        await asyncio.gather(
+            *(usecase.agenerate(f"word {i}", "EN", "DE") for i in range(requests))
+        )
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return time.perf_counter() - start, llm.peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    for name, (elapsed, peak) in (
+        (
+            f"sync ({args.threads} threads)",
+            run_sync(args.requests, args.latency, args.threads),
+        ),
+        ("async (1 event loop)", run_async(args.requests, args.latency)),
+    ):
+        print(
+            f"{name:22} {elapsed:7.2f}s  {args.requests / elapsed:8.1f} req/s  "
+            f"peak in flight {peak}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Measure the connection setup the shared HTTP client saves per model call.
+
+Serves the fake OpenAI endpoint of ``ai.fake_llm`` over HTTPS on localhost,
+with a throwaway self-signed certificate made by the ``openssl`` command,
+and calls it through ``ChatOpenAI`` in two ways: with a new client per call,
+as a worker does after every restart or client rebuild, so each call opens a
+TCP connection and does a TLS handshake; and with clients built by
+``ai.settings.build_llm``, which share the keep-alive pool of
+``ai.http_client``. The server counts the connections it accepted.
+
+Usage:
+    python benchmarks/ai_http_pool.py [--calls 200] [--threads 4]
+"""
+
+import argparse
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "memobox.settings")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ["AI_LLM_BACKEND"] = "openai"
+os.environ["AI_USAGE_RECORDING"] = "False"
+
+import django
+
+django.setup()
+
+from langchain_openai import ChatOpenAI
+
+from ai import http_client
+from ai import settings as ai_settings
+from ai.fake_llm import FakeChatModel, make_server
+from ai.schemas import BackcardResponse
+from ai.usecases import chat_messages
+
+MESSAGES = chat_messages("Prompt", "front_card:```apple```")
+
+
+def https_server(directory):
+    """Start the fake endpoint over TLS; return its URL and connection counter."""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1", "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )  # fmt: skip
+    # Trusted by the httpx clients created from now on
+    os.environ["SSL_CERT_FILE"] = cert
+
+    server = make_server("127.0.0.1", 0, FakeChatModel(latency=0))
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    accepted = [0]
+    get_request = server.get_request
+
+    def counting_get_request():
+        accepted[0] += 1
+        return get_request()
+
+    server.get_request = counting_get_request
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"https://127.0.0.1:{server.server_address[1]}/v1", accepted
+
+
+def run(make_llm, calls, threads, accepted):
+    before = accepted[0]
+    durations = []
+
+    def call(_):
+        llm = make_llm().with_structured_output(BackcardResponse)
+        start = time.perf_counter()
+        llm.invoke(MESSAGES)
+        durations.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(call, range(calls)))
+    durations.sort()
+    return {
+        "connections": accepted[0] - before,
+        "p50_ms": durations[len(durations) // 2] * 1000,
+        "mean_ms": sum(durations) / len(durations) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url, accepted = https_server(directory)
+        os.environ["OPENAI_BASE_URL"] = url
+
+        def fresh_client():
+            return ChatOpenAI(model="fake", max_retries=0)
+
+        def shared_client():
+            return ai_settings.build_llm(ai_settings.back_card_setting)
+
+        # Warm up imports and the pool
+        run(shared_client, args.threads, args.threads, accepted)
+        results = {
+            "client per call": run(fresh_client, args.calls, args.threads, accepted),
+            "shared pool": run(shared_client, args.calls, args.threads, accepted),
+        }
+
+    print(f"HTTP/2: {'on' if http_client.http2_available() else 'off (no h2)'}")
+    for name, result in results.items():
+        print(
+            f"{name:16} {result['connections']:5} connections  "
+            f"p50 {result['p50_ms']:6.1f} ms  mean {result['mean_ms']:6.1f} ms"
+        )
+    fresh, shared = results.values()
+    print(f"connection setup per call: {fresh['mean_ms'] - shared['mean_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+"""
+Measure what loading the AI app costs a process that never generates anything.
+
+Each scenario runs in a fresh interpreter and reports wall time and peak
+resident memory (ru_maxrss):
+
+- ``boot``: ``django.setup()`` and the URL configuration, which imports the
+  AI views and usecases. This is what a web or job worker, a migration or a
+  management command pays.
+- ``boot + clients``: the same, then every chat model client is built, which
+  is what importing ``ai.settings`` used to cost before the clients were
+  built lazily.
+
+Usage:
+    python benchmarks/ai_import_cost.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIO = """
+import resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import memobox.urls
+if {clients}:
+    from ai.settings import LLM_SETTINGS, get_llm
+    for name in LLM_SETTINGS:
+        get_llm(name)
+elapsed = time.perf_counter() - start
+langchain = sum(1 for m in sys.modules if m.startswith(("langchain", "openai")))
+print(elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, langchain)
+"""
+
+
+def run(clients):
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "memobox.settings")
+    env.setdefault("OPENAI_API_KEY", "benchmark")
+    output = subprocess.run(
+        [sys.executable, "-c", SCENARIO.format(clients=clients)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(output[0]), int(output[1]), int(output[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    for label, clients in (("boot", False), ("boot + clients", True)):
+        results = [run(clients) for _ in range(args.runs)]
+        seconds = statistics.median(result[0] for result in results)
+        rss = statistics.median(result[1] for result in results) / 1024
+        modules = results[0][2]
+        print(
+            f"{label:>15}: {seconds * 1000:7.0f} ms, {rss:6.1f} MB peak RSS, "
+            f"{modules} langchain/openai modules"
+        )
+
+
+if __name__ == "__main__":
+    main()
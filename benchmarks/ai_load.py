@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Measure end-to-end throughput and latency of the AI endpoints of a running server.
+
+Run the server against the fake model so no OpenAI quota is spent, either in
+process or through the OpenAI-compatible stand-in:
+
+    AI_LLM_BACKEND=fake AI_FAKE_LLM_LATENCY=0.8 uvicorn memobox.asgi:application
+
+    python manage.py run_fake_llm_server --latency 0.8 &
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 uvicorn memobox.asgi:application
+
+Every request asks for a different word or topic unless ``--distinct`` is
+lower than ``--requests``, so the backcard cache only helps when asked to.
+
+Usage:
+    python benchmarks/ai_load.py --email USER --password PASS \\
+        [--url http://127.0.0.1:8000] [--endpoint backcard] \\
+        [--requests 200] [--concurrency 20] [--distinct 200]
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = {
+    "backcard": "generate_backcard/",
+    "async-backcard": "async/generate_backcard/",
+    "backcards": "generate_backcards/",
+    "topic": "generate_topic_cards/",
+    "async-topic": "async/generate_topic_cards/",
+    "topic-stream": "generate_topic_cards/stream/",
+}
+
+
+def body(endpoint, i, topic_count):
+    languages = {"source_language": "EN", "target_language": "DE"}
+    if endpoint.endswith("backcard"):
+        return {"word_or_phrase": f"word {i}", **languages}
+    if endpoint == "backcards":
+        return {"words": [f"word {i}-{j}" for j in range(10)], **languages}
+    return {"topic": f"topic {i}", "count": topic_count, **languages}
+
+
+def post(url, data, token=None):
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    request = urllib.request.Request(
+        url, data=json.dumps(data).encode(), headers=headers, method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return response.status, response.read()
+
+
+def one_request(url, data, token):
+    start = time.perf_counter()
+    try:
+        status, _ = post(url, data, token)
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    except OSError:
+        status = None
+    return status, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="backcard")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--distinct", type=int, default=None)
+    parser.add_argument("--topic-count", type=int, default=10)
+    args = parser.parse_args()
+
+    _, tokens = post(
+        f"{args.url}/api/token/", {"email": args.email, "password": args.password}
+    )
+    token = json.loads(tokens)["access"]
+    url = f"{args.url}/api/ai/ai-generation/{ENDPOINTS[args.endpoint]}"
+    distinct = args.distinct or args.requests
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(
+            pool.map(
+                lambda i: one_request(
+                    url, body(args.endpoint, i % distinct, args.topic_count), token
+                ),
+                range(args.requests),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds for status, seconds in results if status == 200)
+    errors = {}
+    for status, _ in results:
+        if status != 200:
+            errors[status] = errors.get(status, 0) + 1
+    print(f"{args.endpoint}: {args.requests} requests, concurrency {args.concurrency}")
+    print(f"  throughput {args.requests / elapsed:8.1f} req/s over {elapsed:.2f}s")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"  latency    p50 {statistics.median(latencies) * 1000:7.0f} ms"
+            f"  p95 {p95 * 1000:7.0f} ms  max {latencies[-1] * 1000:7.0f} ms"
+        )
+    if errors:
+        print(f"  errors     {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Measure how much due-date fuzz flattens the daily review forecast.
+
+Simulates one user who adds a large deck at once and reviews everything that
+is due every day, once with exact intervals and once with load smoothing.
+Runs fully in memory; no database is needed.
+
+Usage:
+    python benchmarks/fuzz_forecast.py [--cards 2000] [--days 120]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leitner.fuzz import place_on_least_loaded_day
+from leitner.schedulers import schedule_cards
+
+
+def simulate(n_cards, n_days, fuzz, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime(2025, 1, 1, 12, tzinfo=datetime.UTC)
+    box = SimpleNamespace(scheduler="leitner", retention_factor=lambda: 1.0)
+    cards = [
+        SimpleNamespace(
+            pk=pk,
+            box=box,
+            recall_count=0,
+            ease=2.5,
+            stability=0.0,
+            difficulty=5.0,
+            last_recall=None,
+            next_recall=start,
+        )
+        for pk in range(n_cards)
+    ]
+    load = {start.toordinal(): n_cards}
+    reviews_per_day = []
+    for day in range(n_days):
+        now = start + datetime.timedelta(days=day)
+        due = [
+            card for card in cards if card.next_recall.toordinal() <= now.toordinal()
+        ]
+        reviews_per_day.append(len(due))
+        if not due:
+            continue
+        previous_due = [card.next_recall for card in due]
+        schedule_cards(due, rng.random(len(due)) < 0.9, now)
+        if fuzz:
+            place_on_least_loaded_day(due, previous_due, load, now)
+    return np.array(reviews_per_day)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=120)
+    args = parser.parse_args()
+
+    print(f"{args.cards} cards added on day 0, {args.days} simulated days")
+    print(f"{'':>8} {'peak':>6} {'mean':>8} {'stddev':>8} {'peak/mean':>10}")
+    for label, fuzz in (("exact", False), ("fuzz", True)):
+        # Skip the first weeks, where every card is still on the short
+        # intervals that are never fuzzed.
+        reviews = simulate(args.cards, args.days, fuzz)[30:]
+        print(
+            f"{label:>8} {reviews.max():>6} {reviews.mean():>8.1f} "
+            f"{reviews.std():>8.1f} {reviews.max() / reviews.mean():>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
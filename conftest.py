@@ -8,6 +8,27 @@ django.setup()
 
 
 # Common fixtures that can be used across all tests
+@pytest.fixture(autouse=True)
+def usage_recorder():
+    """Keep LLM usage records in memory; tests that check them call flush()."""
+    from ai.usage import usage_recorder
+
+    usage_recorder.autostart = False
+    usage_recorder.clear()
+    yield usage_recorder
+    usage_recorder.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Start every test with empty AI quotas and other cached state."""
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
 @pytest.fixture
 def api_client():
     from rest_framework.test import APIClient
@@ -1,16 +1,16 @@
 from django.contrib import admin
-from .models import CustomUser, Language, Box, Card
+from .models import CustomUser, Language, Box, Card, Review
 
 
 # Register CustomUser with admin site
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
-    list_display = ("email", "name", "is_staff", "is_superuser", "created_at")
+    list_display = ("email", "name", "plan", "is_staff", "is_superuser", "created_at")
     search_fields = ("email", "name")
     list_filter = ("is_staff", "is_superuser")
     readonly_fields = ("created_at", "updated_at")
     fieldsets = (
-        (None, {"fields": ("email", "name", "password")}),
+        (None, {"fields": ("email", "name", "password", "plan")}),
         (
             "Permissions",
             {
@@ -23,6 +23,16 @@ class CustomUserAdmin(admin.ModelAdmin):
                 )
             },
         ),
+        (
+            "Retention",
+            {
+                "fields": (
+                    "retention_factor",
+                    "retention_factors",
+                    "retention_fitted_at",
+                )
+            },
+        ),
         ("Important dates", {"fields": ("last_login", "created_at", "updated_at")}),
     )
 
@@ -38,9 +48,17 @@ class LanguageAdmin(admin.ModelAdmin):
 # Register Box with admin site
 @admin.register(Box)
 class BoxAdmin(admin.ModelAdmin):
-    list_display = ("name", "user", "source_language", "target_language", "created_at")
+    list_display = (
+        "name",
+        "user",
+        "source_language",
+        "target_language",
+        "scheduler",
+        "fuzz",
+        "created_at",
+    )
     search_fields = ("name", "description")
-    list_filter = ("source_language", "target_language")
+    list_filter = ("source_language", "target_language", "scheduler")
     readonly_fields = ("created_at", "updated_at")
 
 
@@ -55,7 +73,24 @@ class CardAdmin(admin.ModelAdmin):
         (None, {"fields": ("source_text", "target_text", "box")}),
         (
             "Recall Information",
-            {"fields": ("recall_count", "last_recall", "next_recall")},
+            {
+                "fields": (
+                    "recall_count",
+                    "last_recall",
+                    "next_recall",
+                    "ease",
+                    "stability",
+                    "difficulty",
+                )
+            },
         ),
         ("Timestamps", {"fields": ("created_at", "updated_at")}),
     )
+
+
+# Register Review with admin site
+@admin.register(Review)
+class ReviewAdmin(admin.ModelAdmin):
+    list_display = ("card", "user", "remembered", "elapsed_days", "created_at")
+    list_filter = ("remembered",)
+    readonly_fields = ("created_at", "updated_at")
@@ -52,3 +52,14 @@ RECALL_INTERVALS = [
     5394,
     8091,
 ]
+
+SCHEDULER_CHOICES = [
+    ("leitner", "Leitner"),
+    ("sm2", "SM-2"),
+    ("fsrs", "FSRS"),
+]
+
+DEFAULT_SCHEDULER = "leitner"
+
+# Days ahead of today that the materialized due queue covers
+DUE_QUEUE_HORIZON_DAYS = 1
@@ -0,0 +1,86 @@
+"""
+Nightly materialization of the due-card queue.
+
+At the start of the day most users load their due cards within a few hours.
+With ``DUE_QUEUE_ENABLED`` the ``due_only`` card list reads the ``DueQueue``
+table instead, an index range scan on (user, due_day, priority). This job
+rebuilds the queue of every user through tomorrow during off-peak hours;
+recalls and new cards keep it current during the day (``DueQueue.objects.sync``).
+A user whose queue was not built through today falls back to the live query.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .constants import DUE_QUEUE_HORIZON_DAYS
+from .models import Card, CustomUser, DueQueue, DueQueueState
+
+
+def rebuild_users(user_ids, through_day):
+    """
+    Rebuild the due queue of some users through ``through_day`` in one transaction.
+
+    Returns:
+        int: The number of queued cards.
+    """
+    end = datetime.datetime.combine(
+        through_day + datetime.timedelta(days=1),
+        datetime.time.min,
+        tzinfo=timezone.get_current_timezone(),
+    )
+    cards = (
+        Card.objects.filter(box__user_id__in=user_ids, next_recall__lt=end)
+        .values_list("id", "box__user_id", "next_recall", "recall_count")
+        .iterator(chunk_size=2000)
+    )
+    queued = 0
+    with transaction.atomic():
+        DueQueue.objects.filter(user_id__in=user_ids).delete()
+        batch = []
+        for card_id, user_id, next_recall, recall_count in cards:
+            batch.append(
+                DueQueue(
+                    user_id=user_id,
+                    card_id=card_id,
+                    due_day=timezone.localdate(next_recall),
+                    priority=recall_count,
+                )
+            )
+            if len(batch) >= 2000:
+                DueQueue.objects.bulk_create(batch)
+                queued += len(batch)
+                batch = []
+        DueQueue.objects.bulk_create(batch)
+        queued += len(batch)
+        DueQueueState.objects.bulk_create(
+            [
+                DueQueueState(user_id=user_id, built_through=through_day)
+                for user_id in user_ids
+            ],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["built_through", "built_at"],
+        )
+    return queued
+
+
+def build_due_queue(chunk_size=500):
+    """
+    Rebuild the due queue of all users through tomorrow, a chunk of users at a time.
+
+    Returns:
+        tuple: The number of users processed and of cards queued.
+    """
+    through_day = timezone.localdate() + datetime.timedelta(days=DUE_QUEUE_HORIZON_DAYS)
+    users = CustomUser.objects.order_by("id").values_list("id", flat=True)
+    processed = queued = 0
+    last_id = 0
+    while True:
+        user_ids = list(users.filter(id__gt=last_id)[:chunk_size])
+        if not user_ids:
+            return processed, queued
+        queued += rebuild_users(user_ids, through_day)
+        processed += len(user_ids)
+        last_id = user_ids[-1]
@@ -0,0 +1,139 @@
+"""
+Due-date load smoothing ("fuzz").
+
+Cards reviewed together would otherwise come due together. For boxes with
+fuzz enabled, every scheduled interval gets a window that grows with the
+interval (as in Anki), and the card is placed on the day in that window with
+the fewest cards already due for the same user. Ties are broken by a hash of
+the card, so the result is deterministic. Days are counted in the current
+time zone, as ``TruncDate`` counts them in the aggregate query.
+
+Per-day due counts live in the cache, one entry per user, so placing a card
+never queries the database; the counts are built with one aggregate query on
+a cache miss and kept up to date as cards are placed. The views drop them
+when cards are created, deleted or rescheduled in bulk.
+"""
+
+import datetime
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+DUE_LOAD_CACHE_TIMEOUT = 6 * 60 * 60
+
+
+def fuzz_days(interval_days):
+    """
+    Return how many days a card may be moved either way.
+
+    Intervals below 2.5 days are never fuzzed. Above that the window grows by
+    15% of the interval up to 7 days, 10% up to 20 days and 5% beyond.
+    """
+    if interval_days < 2.5:
+        return 0
+    window = 1 + 0.15 * (min(interval_days, 7) - 2.5)
+    if interval_days > 7:
+        window += 0.1 * (min(interval_days, 20) - 7)
+    if interval_days > 20:
+        window += 0.05 * (interval_days - 20)
+    return round(window)
+
+
+def day_ordinal(moment):
+    """Ordinal of the day ``moment`` falls on in the current time zone."""
+    return timezone.localtime(moment).toordinal()
+
+
+def place_on_least_loaded_day(cards, previous_due, load, now):
+    """
+    Move each card to the least loaded day of its fuzz window.
+
+    Args:
+        cards (list[Card]): Freshly scheduled cards; ``next_recall`` is updated
+                            in place.
+        previous_due (list[datetime]): ``next_recall`` of each card before it
+                                       was rescheduled.
+        load (dict): Number of due cards per day ordinal; updated in place.
+        now (datetime): Time of the recall.
+    """
+    for card, previous in zip(cards, previous_due):
+        interval_days = (card.next_recall - now).total_seconds() / 86400
+        window = fuzz_days(interval_days)
+        if window:
+            base = card.next_recall
+            offset = min(
+                range(-window, window + 1),
+                key=lambda offset: (
+                    load.get(day_ordinal(base + datetime.timedelta(days=offset)), 0),
+                    hash((card.pk, card.recall_count, offset)),
+                ),
+            )
+            card.next_recall = base + datetime.timedelta(days=offset)
+
+        old_day = day_ordinal(previous) if previous else None
+        if old_day in load:
+            load[old_day] -= 1
+        new_day = day_ordinal(card.next_recall)
+        load[new_day] = load.get(new_day, 0) + 1
+
+
+class DueLoad:
+    """Cached per-day due counts of a user's cards."""
+
+    @staticmethod
+    def cache_key(user_id):
+        return f"leitner:due-load:{user_id}"
+
+    @classmethod
+    def get(cls, user_id):
+        """Return ``{day ordinal: due cards}`` for the user, from cache if possible."""
+        load = cache.get(cls.cache_key(user_id))
+        if load is None:
+            from .models import Card
+
+            rows = (
+                Card.objects.filter(
+                    box__user_id=user_id, next_recall__gte=timezone.now()
+                )
+                .annotate(day=TruncDate("next_recall"))
+                .values("day")
+                .annotate(count=Count("id"))
+                .values_list("day", "count")
+            )
+            load = {day.toordinal(): count for day, count in rows}
+        return load
+
+    @classmethod
+    def set(cls, user_id, load):
+        today = timezone.localdate().toordinal()
+        load = {day: count for day, count in load.items() if day >= today}
+        cache.set(cls.cache_key(user_id), load, DUE_LOAD_CACHE_TIMEOUT)
+
+    @classmethod
+    def invalidate(cls, user_id):
+        cache.delete(cls.cache_key(user_id))
+
+
+def balance_due_dates(cards, previous_due, now):
+    """
+    Apply load smoothing to the cards of boxes that have fuzz enabled.
+
+    Args:
+        cards (list[Card]): Freshly scheduled cards with ``box`` loaded.
+        previous_due (list[datetime]): ``next_recall`` of each card before it
+                                       was rescheduled.
+        now (datetime): Time of the recall.
+    """
+    by_user = {}
+    for card, previous in zip(cards, previous_due):
+        if card.box.fuzz:
+            by_user.setdefault(card.box.user_id, ([], []))
+            by_user[card.box.user_id][0].append(card)
+            by_user[card.box.user_id][1].append(previous)
+
+    for user_id, (user_cards, user_previous_due) in by_user.items():
+        load = DueLoad.get(user_id)
+        place_on_least_loaded_day(user_cards, user_previous_due, load, now)
+        DueLoad.set(user_id, load)
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from leitner.due_queue import build_due_queue
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the materialized due-card queue of every user through "
+        "tomorrow. Meant to run nightly during off-peak hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of users rebuilt per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        users, cards = build_due_queue(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Queued {cards} cards for {users} users.")
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from leitner.retention import fit_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit per-user and per-language-pair retention factors from review "
+        "history. Meant to run periodically, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of users processed per chunk.",
+        )
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=365,
+            help="Only use reviews from this many recent days.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Refit every user, not only those with new reviews.",
+        )
+
+    def handle(self, *args, **options):
+        fitted = fit_retention(
+            chunk_size=options["chunk_size"],
+            window_days=options["window_days"],
+            refit_all=options["all"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Fitted {fitted} users."))
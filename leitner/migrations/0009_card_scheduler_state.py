@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:38
+
+from django.db import migrations, models
+
+# leitner.constants.RECALL_INTERVALS as of this migration
+RECALL_INTERVALS = [
+    1,
+    2,
+    3,
+    5,
+    8,
+    12,
+    18,
+    27,
+    41,
+    62,
+    93,
+    140,
+    210,
+    315,
+    473,
+    710,
+    1065,
+    1598,
+    2397,
+    3596,
+    5394,
+    8091,
+]
+
+
+def populate_stability(apps, schema_editor):
+    """Store the current Leitner interval of already reviewed cards as stability."""
+    Card = apps.get_model("leitner", "Card")
+    Card.objects.filter(last_recall__isnull=False).update(
+        stability=models.Case(
+            *[
+                models.When(recall_count=index, then=models.Value(float(days)))
+                for index, days in enumerate(RECALL_INTERVALS)
+            ],
+            default=models.Value(float(RECALL_INTERVALS[-1])),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leitner", "0008_alter_language_code"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="box",
+            name="scheduler",
+            field=models.CharField(
+                choices=[("leitner", "Leitner"), ("sm2", "SM-2"), ("fsrs", "FSRS")],
+                default="leitner",
+                max_length=16,
+            ),
+        ),
+        migrations.AddField(
+            model_name="card",
+            name="difficulty",
+            field=models.FloatField(default=5.0),
+        ),
+        migrations.AddField(
+            model_name="card",
+            name="ease",
+            field=models.FloatField(default=2.5),
+        ),
+        migrations.AddField(
+            model_name="card",
+            name="stability",
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(populate_stability, migrations.RunPython.noop),
+    ]
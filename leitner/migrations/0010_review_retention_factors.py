@@ -0,0 +1,69 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leitner", "0009_card_scheduler_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="retention_factor",
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="retention_factors",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="retention_fitted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name="Review",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("remembered", models.BooleanField()),
+                ("elapsed_days", models.FloatField(blank=True, null=True)),
+                ("interval_days", models.FloatField(blank=True, null=True)),
+                (
+                    "card",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="leitner.card"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "created_at"],
+                        name="leitner_rev_user_id_829126_idx",
+                    )
+                ],
+            },
+        ),
+    ]
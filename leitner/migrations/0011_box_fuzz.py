@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leitner", "0010_review_retention_factors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="box",
+            name="fuzz",
+            field=models.BooleanField(default=False),
+        ),
+    ]
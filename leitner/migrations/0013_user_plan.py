@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("leitner", "0012_due_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="plan",
+            field=models.CharField(
+                choices=[("free", "Free"), ("pro", "Pro"), ("unlimited", "Unlimited")],
+                default="free",
+                max_length=16,
+            ),
+        ),
+    ]
@@ -1,8 +1,12 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group, Permission, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Greatest
 from django.utils import timezone
 import datetime
-from .constants import RECALL_INTERVALS
+from .constants import DEFAULT_SCHEDULER, DUE_QUEUE_HORIZON_DAYS, SCHEDULER_CHOICES
+from .fuzz import balance_due_dates
+from .schedulers import STATE_FIELDS, schedule_cards
 
 
 class BaseModel(models.Model):
@@ -52,6 +56,20 @@ class CustomUser(AbstractUser, BaseModel):
     first_name = None  # Optional, if not needed
     email = models.EmailField(unique=True)  # Use email as a unique identifier
     name = models.CharField(max_length=255)
+    # Interval multipliers fitted from review history, see leitner.retention
+    retention_factor = models.FloatField(default=1.0)
+    retention_factors = models.JSONField(default=dict, blank=True)
+    retention_fitted_at = models.DateTimeField(null=True, blank=True)
+    # Decides the AI generation quota, see ai.throttling
+    PLAN_FREE = "free"
+    PLAN_PRO = "pro"
+    PLAN_UNLIMITED = "unlimited"
+    PLAN_CHOICES = [
+        (PLAN_FREE, "Free"),
+        (PLAN_PRO, "Pro"),
+        (PLAN_UNLIMITED, "Unlimited"),
+    ]
+    plan = models.CharField(max_length=16, choices=PLAN_CHOICES, default=PLAN_FREE)
 
     # Override the groups field to add related_name
     groups = models.ManyToManyField(
@@ -81,6 +99,12 @@ class CustomUser(AbstractUser, BaseModel):
     def __str__(self):
         return self.email
 
+    def retention_for(self, source_language_id, target_language_id):
+        """Return the fitted interval multiplier for a language pair."""
+        return self.retention_factors.get(
+            f"{source_language_id}-{target_language_id}", self.retention_factor
+        )
+
 
 class Language(BaseModel):
     name = models.CharField(max_length=100, unique=True)
@@ -103,18 +127,145 @@ class Box(BaseModel):
     target_language = models.ForeignKey(
         Language, on_delete=models.CASCADE, related_name="target_boxes"
     )
+    scheduler = models.CharField(
+        max_length=16, choices=SCHEDULER_CHOICES, default=DEFAULT_SCHEDULER
+    )
+    # Spread due dates to flatten daily review peaks, see leitner.fuzz
+    fuzz = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
 
+    def retention_factor(self):
+        """Return the owner's interval multiplier for this box's language pair."""
+        return self.user.retention_for(self.source_language_id, self.target_language_id)
+
+
+class CardQuerySet(models.QuerySet):
+    """QuerySet for Card with set-based rescheduling helpers."""
+
+    def overdue(self, now=None):
+        """Cards whose next recall date has passed."""
+        return self.filter(next_recall__lte=now or timezone.now())
+
+    def shift_due(self, days, now=None):
+        """
+        Move the next recall date of every card forward by ``days`` days,
+        counting from now for cards that are overdue, so none of them is
+        still due afterwards.
+
+        Runs as a single UPDATE statement; no rows are loaded.
+
+        Returns:
+            int: The number of rescheduled cards.
+        """
+        now = now or timezone.now()
+        start = Greatest(
+            models.F("next_recall"),
+            models.Value(now, output_field=models.DateTimeField()),
+        )
+        return self.update(
+            next_recall=start + datetime.timedelta(days=days),
+            updated_at=now,
+        )
+
+    def spread_due(self, days, now=None):
+        """
+        Spread the cards evenly over the next ``days`` days, starting today.
+
+        Each card lands on day ``id % days``, so the load per day differs by
+        at most one card for contiguous ids. Runs as a single UPDATE
+        statement; no rows are loaded.
+
+        Returns:
+            int: The number of rescheduled cards.
+        """
+        now = now or timezone.now()
+        offset = models.ExpressionWrapper(
+            (models.F("id") % days) * models.Value(datetime.timedelta(days=1)),
+            output_field=models.DurationField(),
+        )
+        return self.update(
+            next_recall=models.Value(now, output_field=models.DateTimeField()) + offset,
+            updated_at=now,
+        )
+
+    def reschedule_overdue(self, mode, days):
+        """
+        Shift or spread all overdue cards in one transaction.
+
+        Args:
+            mode (str): "shift" or "spread", see ``shift_due`` and ``spread_due``.
+            days (int): Number of days to shift by or to spread over.
+
+        Returns:
+            int: The number of rescheduled cards.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            overdue = self.overdue(now)
+            if mode == "shift":
+                return overdue.shift_due(days, now)
+            return overdue.spread_due(days, now)
+
+
+class CardManager(models.Manager.from_queryset(CardQuerySet)):
+    """Manager for Card with batch scheduling helpers."""
+
+    def record_recalls(self, cards, remembered):
+        """
+        Record recall events for many cards at once.
+
+        The next state of all cards is computed with one vectorized call per
+        scheduler and written back with a single bulk update.
+
+        Args:
+            cards (list[Card]): Cards to update, with ``box`` already loaded.
+            remembered (Sequence[bool]): Recall outcome for each card.
+        """
+        now = timezone.now()
+        previous_due = [card.next_recall for card in cards]
+        reviews = schedule_cards(cards, remembered, now)
+        balance_due_dates(cards, previous_due, now)
+        for card in cards:
+            card.updated_at = now
+        self.bulk_update(
+            cards,
+            [*STATE_FIELDS, "last_recall", "next_recall", "updated_at"],
+            batch_size=500,
+        )
+        DueQueue.objects.sync(cards)
+        Review.objects.bulk_create(
+            [
+                Review(
+                    card=card,
+                    user_id=card.box.user_id,
+                    remembered=outcome,
+                    elapsed_days=elapsed_days,
+                    interval_days=interval_days,
+                )
+                for card, outcome, (elapsed_days, interval_days) in zip(
+                    cards, remembered, reviews
+                )
+            ],
+            batch_size=500,
+        )
+        return cards
+
 
 class Card(BaseModel):
     source_text = models.TextField()
     target_text = models.TextField()
-    recall_count = models.IntegerField(default=0)  # Index into RECALL_INTERVALS
+    recall_count = models.IntegerField(default=0)  # Consecutive successful recalls
     last_recall = models.DateTimeField(null=True, blank=True)
     next_recall = models.DateTimeField(default=timezone.now)
     box = models.ForeignKey(Box, on_delete=models.CASCADE)
+    # Scheduler state, see leitner.schedulers
+    ease = models.FloatField(default=2.5)
+    stability = models.FloatField(default=0.0)
+    difficulty = models.FloatField(default=5.0)
+
+    objects = CardManager()
 
     def __str__(self):
         return self.source_text
@@ -123,25 +274,111 @@ class Card(BaseModel):
         """
         Record a recall event for this card and calculate the next recall date.
 
+        The interval is computed by the scheduler configured on the card's box
+        (the Leitner ladder by default).
+
         Args:
             remembered (bool): Whether the user remembered the card or not.
                                If True, moves to next interval.
                                If False, resets to first interval.
         """
         now = timezone.now()
-        self.last_recall = now
+        previous_due = self.next_recall
+        [(elapsed_days, interval_days)] = schedule_cards([self], [remembered], now)
+        balance_due_dates([self], [previous_due], now)
+        self.save()
+        DueQueue.objects.sync([self])
+        Review.objects.create(
+            card=self,
+            user_id=self.box.user_id,
+            remembered=remembered,
+            elapsed_days=elapsed_days,
+            interval_days=interval_days,
+        )
+        return self.next_recall
 
-        if remembered:
-            # Move to the next interval if the user remembered
-            if self.recall_count < len(RECALL_INTERVALS) - 1:
-                self.recall_count += 1
-        else:
-            # Reset to the first interval if the user didn't remember
-            self.recall_count = 0
 
-        # Calculate the next recall date
-        days_to_add = RECALL_INTERVALS[self.recall_count]
-        self.next_recall = now + datetime.timedelta(days=days_to_add)
+class Review(BaseModel):
+    """
+    A single recall of a card, kept as history for fitting forgetting curves.
+    """
 
-        self.save()
-        return self.next_recall
+    card = models.ForeignKey(Card, on_delete=models.CASCADE)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    remembered = models.BooleanField()
+    # Days since the previous recall and the nominal interval scheduled then;
+    # null for the first recall of a card.
+    elapsed_days = models.FloatField(null=True, blank=True)
+    interval_days = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "created_at"])]
+
+
+class DueQueueManager(models.Manager):
+    """Manager for DueQueue that keeps entries in step with card schedules."""
+
+    def is_fresh(self, user):
+        """Whether the user's queue has been built through today."""
+        if not settings.DUE_QUEUE_ENABLED:
+            return False
+        return DueQueueState.objects.filter(
+            user=user, built_through__gte=timezone.localdate()
+        ).exists()
+
+    def sync(self, cards):
+        """
+        Remove and reinsert the queue entries of rescheduled or new cards.
+
+        Only cards due within the materialized horizon get an entry; anything
+        later is picked up by the next rebuild.
+        """
+        if not settings.DUE_QUEUE_ENABLED:
+            return
+        horizon = timezone.localdate() + datetime.timedelta(days=DUE_QUEUE_HORIZON_DAYS)
+        entries = [
+            DueQueue(
+                user_id=card.box.user_id,
+                card=card,
+                due_day=timezone.localdate(card.next_recall),
+                priority=card.recall_count,
+            )
+            for card in cards
+            if timezone.localdate(card.next_recall) <= horizon
+        ]
+        with transaction.atomic():
+            self.filter(card__in=cards).delete()
+            self.bulk_create(entries, batch_size=500)
+
+    def invalidate(self, user):
+        """Mark the user's queue as stale so reads fall back to the live query."""
+        DueQueueState.objects.filter(user=user).delete()
+
+
+class DueQueue(models.Model):
+    """
+    Materialized list of cards due up to tomorrow, see leitner.due_queue.
+
+    Cards due on the same day are reviewed in ``priority`` order (lowest
+    first), which is the card's recall count.
+    """
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    card = models.OneToOneField(
+        Card, on_delete=models.CASCADE, related_name="due_entry"
+    )
+    due_day = models.DateField()
+    priority = models.IntegerField()
+
+    objects = DueQueueManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "due_day", "priority"])]
+
+
+class DueQueueState(models.Model):
+    """The last day through which a user's due queue was materialized."""
+
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True)
+    built_through = models.DateField()
+    built_at = models.DateTimeField(auto_now=True)
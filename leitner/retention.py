@@ -0,0 +1,171 @@
+"""
+Per-user forgetting curves fitted from review history.
+
+Every review records how long the card rested (``elapsed_days``) relative to
+the nominal interval it had been scheduled with (``interval_days``). Assuming
+a user recalls a card after ``x = elapsed_days / interval_days`` nominal
+intervals with probability ``RETENTION_TARGET ** (x / k)``, the factor ``k``
+is the multiplier that brings their recall rate at the scheduled time back to
+the target: ``k > 1`` for strong learners, ``k < 1`` for weak ones.
+
+``k`` is estimated per user and per user and language pair by maximum a
+posteriori over a fixed grid of candidate factors. Reviews are first
+histogrammed into log-spaced ratio bins per group, so the likelihood of every
+group at every grid point is a single matrix product.
+"""
+
+import datetime
+
+import numpy as np
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import CustomUser, Review
+
+RETENTION_TARGET = 0.9
+FACTOR_GRID = np.geomspace(0.25, 4.0, 161)
+RATIO_BINS = np.geomspace(0.02, 50.0, 97)
+# Standard deviation of the log-normal prior on k, centred on 1.0
+PRIOR_SIGMA = 0.5
+# Groups with fewer reviews keep the default (or user-wide) factor
+MIN_REVIEWS = 20
+
+
+def _log_likelihood_tables():
+    """Return log P(remembered) and log P(forgotten) per ratio bin and grid point."""
+    centers = np.sqrt(RATIO_BINS[:-1] * RATIO_BINS[1:])
+    rates = -np.log(RETENTION_TARGET) / FACTOR_GRID
+    log_recall = -np.outer(centers, rates)
+    log_forget = np.log(-np.expm1(np.minimum(log_recall, -1e-9)))
+    return log_recall, log_forget
+
+
+LOG_RECALL, LOG_FORGET = _log_likelihood_tables()
+LOG_PRIOR = -np.square(np.log(FACTOR_GRID)) / (2 * PRIOR_SIGMA**2)
+
+
+def fit_factors(groups, ratios, remembered, n_groups):
+    """
+    Fit the retention factor of many groups at once.
+
+    Args:
+        groups (np.ndarray): Group index of every review (0..n_groups-1).
+        ratios (np.ndarray): ``elapsed_days / interval_days`` of every review.
+        remembered (np.ndarray): Boolean outcome of every review.
+        n_groups (int): Number of groups.
+
+    Returns:
+        tuple: Fitted factor and number of reviews for every group.
+    """
+    n_bins = len(RATIO_BINS) - 1
+    bins = np.clip(np.searchsorted(RATIO_BINS, ratios) - 1, 0, n_bins - 1)
+    cells = groups * n_bins + bins
+    size = n_groups * n_bins
+    recalled = np.bincount(cells[remembered], minlength=size).reshape(n_groups, n_bins)
+    forgotten = np.bincount(cells[~remembered], minlength=size).reshape(
+        n_groups, n_bins
+    )
+    posterior = recalled @ LOG_RECALL + forgotten @ LOG_FORGET + LOG_PRIOR
+    factors = FACTOR_GRID[np.argmax(posterior, axis=1)]
+    counts = recalled.sum(axis=1) + forgotten.sum(axis=1)
+    return factors, counts
+
+
+def _fit_chunk(users, since):
+    """Fit and store the factors of one chunk of users."""
+    rows = np.array(
+        list(
+            Review.objects.filter(
+                user__in=users,
+                created_at__gte=since,
+                elapsed_days__isnull=False,
+                interval_days__gt=0,
+            ).values_list(
+                "user_id",
+                "card__box__source_language_id",
+                "card__box__target_language_id",
+                "elapsed_days",
+                "interval_days",
+                "remembered",
+            )
+        ),
+        dtype=np.float64,
+    ).reshape(-1, 6)
+
+    user_ids = rows[:, 0].astype(np.int64)
+    pairs = rows[:, 1:3].astype(np.int64)
+    ratios = rows[:, 3] / rows[:, 4]
+    remembered = rows[:, 5].astype(bool)
+
+    user_keys, user_groups = np.unique(user_ids, return_inverse=True)
+    user_factors, user_counts = fit_factors(
+        user_groups, ratios, remembered, len(user_keys)
+    )
+    pair_keys, pair_groups = np.unique(
+        np.column_stack([user_ids, pairs]), axis=0, return_inverse=True
+    )
+    pair_factors, pair_counts = fit_factors(
+        pair_groups.ravel(), ratios, remembered, len(pair_keys)
+    )
+
+    fitted_user = {
+        int(user_id): float(factor)
+        for user_id, factor, count in zip(user_keys, user_factors, user_counts)
+        if count >= MIN_REVIEWS
+    }
+    fitted_pairs = {}
+    for (user_id, source_id, target_id), factor, count in zip(
+        pair_keys, pair_factors, pair_counts
+    ):
+        if count >= MIN_REVIEWS:
+            fitted_pairs.setdefault(int(user_id), {})[f"{source_id}-{target_id}"] = (
+                float(factor)
+            )
+
+    now = timezone.now()
+    for user in users:
+        user.retention_factor = fitted_user.get(user.id, user.retention_factor)
+        user.retention_factors = fitted_pairs.get(user.id, user.retention_factors)
+        user.retention_fitted_at = now
+    CustomUser.objects.bulk_update(
+        users, ["retention_factor", "retention_factors", "retention_fitted_at"]
+    )
+
+
+def fit_retention(chunk_size=500, window_days=365, refit_all=False):
+    """
+    Fit retention factors for all users, one chunk of users at a time.
+
+    Only users with reviews since their last fit are processed unless
+    ``refit_all`` is set. Users are walked in primary key order so memory use
+    is bounded by the reviews of ``chunk_size`` users.
+
+    Args:
+        chunk_size (int): Number of users loaded per chunk.
+        window_days (int): Only reviews from this many recent days are used.
+        refit_all (bool): Refit users even without new reviews.
+
+    Returns:
+        int: The number of users that were fitted.
+    """
+    since = timezone.now() - datetime.timedelta(days=window_days)
+    users = CustomUser.objects.only(
+        "id", "retention_factor", "retention_factors", "retention_fitted_at"
+    ).order_by("id")
+    if not refit_all:
+        reviews = Review.objects.filter(user=OuterRef("pk"))
+        new_reviews = reviews.filter(created_at__gt=OuterRef("retention_fitted_at"))
+        users = users.filter(
+            (Q(retention_fitted_at__isnull=True) & Exists(reviews))
+            | Exists(new_reviews)
+        )
+
+    fitted = 0
+    last_id = 0
+    while True:
+        chunk = list(users.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return fitted
+        _fit_chunk(chunk, since)
+        fitted += len(chunk)
+        last_id = chunk[-1].id
@@ -0,0 +1,274 @@
+"""
+Spaced-repetition schedulers.
+
+Every scheduler works on whole columns of card state at once: it receives
+NumPy arrays for a batch of cards and returns the updated arrays together with
+the next interval of every card (in days). Recording a single recall is just a
+batch of one, so bulk recalls and rescheduling jobs share the same code path.
+
+The state columns map one-to-one onto ``Card`` fields:
+
+- ``recall_count``: number of consecutive successful recalls.
+- ``ease``: SM-2 ease factor.
+- ``stability``: the nominal interval in days the card was last scheduled
+  with (for FSRS this is the memory stability at 90% retention).
+- ``difficulty``: FSRS difficulty on a 1-10 scale.
+"""
+
+import dataclasses
+import datetime
+
+import numpy as np
+
+from .constants import DEFAULT_SCHEDULER, RECALL_INTERVALS
+
+STATE_FIELDS = ("recall_count", "ease", "stability", "difficulty")
+
+
+@dataclasses.dataclass
+class SchedulingState:
+    """Column-oriented scheduling state for a batch of cards."""
+
+    recall_count: np.ndarray
+    ease: np.ndarray
+    stability: np.ndarray
+    difficulty: np.ndarray
+
+    @classmethod
+    def from_cards(cls, cards):
+        return cls(
+            recall_count=np.fromiter(
+                (card.recall_count for card in cards), dtype=np.int64, count=len(cards)
+            ),
+            ease=np.fromiter(
+                (card.ease for card in cards), dtype=np.float64, count=len(cards)
+            ),
+            stability=np.fromiter(
+                (card.stability for card in cards), dtype=np.float64, count=len(cards)
+            ),
+            difficulty=np.fromiter(
+                (card.difficulty for card in cards), dtype=np.float64, count=len(cards)
+            ),
+        )
+
+    def __len__(self):
+        return len(self.recall_count)
+
+
+class Scheduler:
+    """Base class for schedulers. Subclasses implement ``schedule``."""
+
+    name = None
+
+    def schedule(self, state, remembered, elapsed_days):
+        """
+        Compute the next state and interval for a batch of cards.
+
+        Args:
+            state (SchedulingState): Current state of the cards.
+            remembered (np.ndarray): Boolean array, one entry per card.
+            elapsed_days (np.ndarray): Days since each card was last recalled
+                                       (0 for cards that were never recalled).
+
+        Returns:
+            tuple: The new ``SchedulingState`` and an array of intervals in days.
+        """
+        raise NotImplementedError
+
+
+class LeitnerScheduler(Scheduler):
+    """The classic Leitner ladder: move up one box on success, back to the start on failure."""
+
+    name = "leitner"
+
+    def __init__(self, intervals=RECALL_INTERVALS):
+        self.intervals = np.asarray(intervals, dtype=np.float64)
+
+    def schedule(self, state, remembered, elapsed_days):
+        recall_count = np.where(
+            remembered,
+            np.minimum(state.recall_count + 1, len(self.intervals) - 1),
+            0,
+        )
+        intervals = self.intervals[recall_count]
+        new_state = dataclasses.replace(
+            state, recall_count=recall_count, stability=intervals
+        )
+        return new_state, intervals
+
+
+class SM2Scheduler(Scheduler):
+    """
+    SuperMemo-2 with binary grading.
+
+    A successful recall is graded 4, which keeps the ease factor unchanged; a
+    lapse lowers the ease factor by ``lapse_penalty`` (as Anki does) and
+    restarts the repetition sequence.
+    """
+
+    name = "sm2"
+    min_ease = 1.3
+    lapse_penalty = 0.2
+
+    def schedule(self, state, remembered, elapsed_days):
+        ease = np.where(
+            remembered,
+            state.ease,
+            np.maximum(state.ease - self.lapse_penalty, self.min_ease),
+        )
+        recall_count = np.where(remembered, state.recall_count + 1, 0)
+        previous = np.maximum(state.stability, 1.0)
+        intervals = np.select(
+            [recall_count <= 1, recall_count == 2],
+            [1.0, 6.0],
+            default=np.maximum(np.rint(previous * ease), 1.0),
+        )
+        new_state = dataclasses.replace(
+            state, recall_count=recall_count, ease=ease, stability=intervals
+        )
+        return new_state, intervals
+
+
+class FSRSScheduler(Scheduler):
+    """
+    A memory model in the style of FSRS-4.5 with two grades (again / good).
+
+    Retrievability decays as a power law of elapsed time over stability, and
+    each review updates stability and difficulty from the current
+    retrievability. Intervals target ``desired_retention``.
+    """
+
+    name = "fsrs"
+    weights = (
+        0.4, 0.6, 2.4, 5.8, 4.93, 0.94, 0.86, 0.01, 1.49,
+        0.14, 0.94, 2.18, 0.05, 0.34, 1.26, 0.29, 2.61,
+    )  # fmt: skip
+    decay = -0.5
+    factor = 19 / 81
+
+    def __init__(self, desired_retention=0.9, maximum_interval=36500):
+        self.desired_retention = desired_retention
+        self.maximum_interval = maximum_interval
+
+    def schedule(self, state, remembered, elapsed_days):
+        w = self.weights
+        grade = np.where(remembered, 3, 1)
+        is_new = state.stability <= 0
+        stability = np.maximum(state.stability, 0.01)
+
+        retrievability = np.power(
+            1 + self.factor * elapsed_days / stability, self.decay
+        )
+
+        initial_difficulty = np.clip(w[4] - (grade - 3) * w[5], 1, 10)
+        difficulty = state.difficulty - w[6] * (grade - 3)
+        difficulty = w[7] * w[4] + (1 - w[7]) * difficulty  # mean reversion
+        difficulty = np.clip(np.where(is_new, initial_difficulty, difficulty), 1, 10)
+
+        recalled = stability * (
+            1
+            + np.exp(w[8])
+            * (11 - state.difficulty)
+            * np.power(stability, -w[9])
+            * (np.exp(w[10] * (1 - retrievability)) - 1)
+        )
+        forgotten = np.minimum(
+            w[11]
+            * np.power(state.difficulty, -w[12])
+            * (np.power(stability + 1, w[13]) - 1)
+            * np.exp(w[14] * (1 - retrievability)),
+            stability,
+        )
+        initial_stability = np.where(remembered, w[2], w[0])
+        new_stability = np.where(
+            is_new, initial_stability, np.where(remembered, recalled, forgotten)
+        )
+
+        intervals = (
+            new_stability
+            / self.factor
+            * (np.power(self.desired_retention, 1 / self.decay) - 1)
+        )
+        intervals = np.clip(intervals, 0.01, self.maximum_interval)
+
+        recall_count = np.where(remembered, state.recall_count + 1, 0)
+        new_state = dataclasses.replace(
+            state,
+            recall_count=recall_count,
+            stability=new_stability,
+            difficulty=difficulty,
+        )
+        return new_state, intervals
+
+
+SCHEDULERS = {
+    scheduler.name: scheduler
+    for scheduler in (LeitnerScheduler(), SM2Scheduler(), FSRSScheduler())
+}
+
+
+def get_scheduler(name):
+    """Return the scheduler registered under ``name``, defaulting to Leitner."""
+    return SCHEDULERS.get(name or DEFAULT_SCHEDULER, SCHEDULERS[DEFAULT_SCHEDULER])
+
+
+def schedule_cards(cards, remembered, now):
+    """
+    Apply recalls to a list of cards in memory, one vectorized call per scheduler.
+
+    Cards are grouped by the scheduler of their box (``card.box`` and its user
+    should be loaded with ``select_related``). The scheduled interval is scaled
+    by the retention factor fitted for the box owner and language pair. The
+    instances are updated in place; saving them is left to the caller.
+
+    Args:
+        cards (list[Card]): The cards that were recalled.
+        remembered (Sequence[bool]): Recall outcome for each card.
+        now (datetime): Time of the recall.
+
+    Returns:
+        list[tuple]: ``(elapsed_days, interval_days)`` for every card, where
+        ``interval_days`` is the nominal interval the card was scheduled with
+        before this recall. Both are None for cards that were never recalled.
+    """
+    remembered = np.asarray(remembered, dtype=bool)
+    groups = {}
+    for index, card in enumerate(cards):
+        groups.setdefault(card.box.scheduler, []).append(index)
+
+    reviews = [(None, None)] * len(cards)
+    for name, indexes in groups.items():
+        batch = [cards[i] for i in indexes]
+        elapsed_days = np.fromiter(
+            (
+                (now - card.last_recall).total_seconds() / 86400
+                if card.last_recall
+                else 0.0
+                for card in batch
+            ),
+            dtype=np.float64,
+            count=len(batch),
+        )
+        factors = np.fromiter(
+            (card.box.retention_factor() for card in batch),
+            dtype=np.float64,
+            count=len(batch),
+        )
+        previous = SchedulingState.from_cards(batch)
+        state, intervals = get_scheduler(name).schedule(
+            previous, remembered[indexes], elapsed_days
+        )
+        intervals = intervals * factors
+        for i, card in enumerate(batch):
+            if card.last_recall and previous.stability[i] > 0:
+                reviews[indexes[i]] = (
+                    float(elapsed_days[i]),
+                    float(previous.stability[i]),
+                )
+            card.recall_count = int(state.recall_count[i])
+            card.ease = float(state.ease[i])
+            card.stability = float(state.stability[i])
+            card.difficulty = float(state.difficulty[i])
+            card.last_recall = now
+            card.next_recall = now + datetime.timedelta(days=float(intervals[i]))
+    return reviews
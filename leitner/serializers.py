@@ -93,6 +93,8 @@ class BoxSerializer(serializers.ModelSerializer):
             "target_language",
             "source_language_id",
             "target_language_id",
+            "scheduler",
+            "fuzz",
             "created_at",
             "updated_at",
         ]
@@ -117,6 +119,9 @@ class CardSerializer(serializers.ModelSerializer):
             "recall_count",
             "last_recall",
             "next_recall",
+            "ease",
+            "stability",
+            "difficulty",
             "created_at",
             "updated_at",
         ]
@@ -124,6 +129,9 @@ class CardSerializer(serializers.ModelSerializer):
             "recall_count",
             "last_recall",
             "next_recall",
+            "ease",
+            "stability",
+            "difficulty",
             "created_at",
             "updated_at",
         ]
@@ -146,3 +154,52 @@ class CardRecallSerializer(serializers.Serializer):
         instance.record_recall(remembered=remembered)
 
         return instance
+
+
+class CardBulkRecallItemSerializer(serializers.Serializer):
+    """
+    Serializer for a single entry of a bulk recall request.
+    """
+
+    id = serializers.IntegerField()
+    remembered = serializers.BooleanField(write_only=True, required=True)
+    recall_count = serializers.IntegerField(read_only=True)
+    last_recall = serializers.DateTimeField(read_only=True)
+    next_recall = serializers.DateTimeField(read_only=True)
+
+
+class CardBulkRecallSerializer(serializers.Serializer):
+    """
+    Serializer for recording recall events for many cards in one request.
+    """
+
+    recalls = CardBulkRecallItemSerializer(many=True, allow_empty=False)
+
+    def validate_recalls(self, value):
+        if len(value) > 1000:
+            raise serializers.ValidationError(
+                "At most 1000 recalls can be recorded at once."
+            )
+        ids = [item["id"] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError("Each card may only appear once.")
+        return value
+
+
+class RescheduleSerializer(serializers.Serializer):
+    """
+    Serializer for rescheduling all overdue cards at once.
+
+    mode "shift" makes every overdue card due in ``days`` days; mode
+    "spread" distributes them evenly over the next ``days`` days.
+    """
+
+    mode = serializers.ChoiceField(choices=["shift", "spread"], required=True)
+    days = serializers.IntegerField(min_value=1, max_value=365, required=True)
+
+
+class BoxGenerateSerializer(serializers.Serializer):
+    """Serializer for generating topic cards straight into a box."""
+
+    topic = serializers.CharField(required=True)
+    count = serializers.IntegerField(min_value=1, max_value=200, default=20)
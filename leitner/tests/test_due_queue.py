@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from leitner.due_queue import build_due_queue
+from leitner.models import Card, DueQueue, DueQueueState
+
+
+@pytest.fixture
+def queue_enabled(settings):
+    settings.DUE_QUEUE_ENABLED = True
+
+
+def list_due(client):
+    response = client.get(reverse("card-list"), {"due_only": "true"})
+    assert response.status_code == status.HTTP_200_OK
+    return [item["id"] for item in response.data["results"]]
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures("queue_enabled")
+class TestDueQueue:
+    """Tests for the materialized due queue."""
+
+    def test_build_queues_cards_due_through_tomorrow(
+        self, test_user, due_card, card, not_due_card
+    ):
+        """Test the job queues due and soon-due cards only."""
+        users, queued = build_due_queue()
+
+        assert users >= 1
+        assert queued == 2
+        assert set(DueQueue.objects.values_list("card_id", flat=True)) == {
+            due_card.id,
+            card.id,
+        }
+        state = DueQueueState.objects.get(user=test_user)
+        assert state.built_through == timezone.localdate() + timedelta(days=1)
+
+    def test_list_reads_queue_when_fresh(self, authenticated_client, due_card, box):
+        """Test due cards come from the queue once it is built."""
+        call_command("build_due_queue")
+        # Bypasses the queue on purpose: only the queue path would miss it
+        hidden = Card.objects.create(
+            source_text="Hidden",
+            target_text="Oculto",
+            box=box,
+            next_recall=timezone.now() - timedelta(hours=1),
+        )
+
+        assert list_due(authenticated_client) == [due_card.id]
+
+        DueQueue.objects.sync([hidden])
+        assert list_due(authenticated_client) == [due_card.id, hidden.id]
+
+    def test_recall_moves_card_out_of_queue(self, authenticated_client, due_card):
+        """Test record_recall removes and reinserts the queue entry."""
+        build_due_queue()
+        due_card.record_recall(remembered=True)
+
+        # Remembered: due in two days, beyond the horizon
+        assert not DueQueue.objects.filter(card=due_card).exists()
+        assert list_due(authenticated_client) == []
+
+        due_card.record_recall(remembered=False)
+        entry = DueQueue.objects.get(card=due_card)
+        assert entry.due_day == timezone.localdate() + timedelta(days=1)
+
+    def test_created_cards_are_queued(self, authenticated_client, box):
+        """Test cards created through the API join the queue immediately."""
+        build_due_queue()
+        response = authenticated_client.post(
+            reverse("card-list"),
+            {"source_text": "New", "target_text": "Nuevo", "box_id": box.id},
+        )
+        assert response.status_code == status.HTTP_201_CREATED
+        assert list_due(authenticated_client) == [response.data["id"]]
+
+    def test_stale_queue_falls_back_to_live_query(
+        self, authenticated_client, test_user, due_card
+    ):
+        """Test a queue not built through today is ignored."""
+        build_due_queue()
+        DueQueueState.objects.filter(user=test_user).update(
+            built_through=timezone.localdate() - timedelta(days=1)
+        )
+        DueQueue.objects.all().delete()
+
+        assert list_due(authenticated_client) == [due_card.id]
+
+    def test_reschedule_invalidates_queue(
+        self, authenticated_client, test_user, due_card
+    ):
+        """Test bulk rescheduling marks the queue stale."""
+        build_due_queue()
+        authenticated_client.post(
+            reverse("card-reschedule"), {"mode": "shift", "days": 3}
+        )
+        assert not DueQueueState.objects.filter(user=test_user).exists()
+        assert list_due(authenticated_client) == []
+
+
+@pytest.mark.django_db
+@override_settings(DUE_QUEUE_ENABLED=False)
+def test_disabled_queue_is_not_maintained(due_card):
+    """Test nothing is written while the feature is off."""
+    due_card.record_recall(remembered=False)
+    assert not DueQueue.objects.exists()
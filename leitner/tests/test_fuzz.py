@@ -0,0 +1,120 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from leitner.fuzz import DueLoad, day_ordinal, fuzz_days, place_on_least_loaded_day
+from leitner.models import Card
+
+
+def test_fuzz_days_grows_with_interval():
+    """Test short intervals are kept and long ones get wider windows."""
+    assert fuzz_days(1) == 0
+    assert fuzz_days(2) == 0
+    assert fuzz_days(5) == 1
+    assert fuzz_days(20) == 3
+    assert fuzz_days(100) == 7
+
+
+def test_place_on_least_loaded_day():
+    """Test cards go to the emptiest day of their window, deterministically."""
+    now = timezone.now()
+    base = now + timedelta(days=20)
+    load = {(base + timedelta(days=offset)).toordinal(): 10 for offset in range(-3, 4)}
+    load[(base + timedelta(days=2)).toordinal()] = 1
+
+    cards = [SimpleNamespace(pk=pk, recall_count=5, next_recall=base) for pk in (1, 2)]
+    place_on_least_loaded_day(cards, [None, None], load, now)
+
+    # The first card takes the free slot, the second one the next best day
+    assert cards[0].next_recall == base + timedelta(days=2)
+    assert load[(base + timedelta(days=2)).toordinal()] == 3
+    assert abs((cards[1].next_recall - base).days) <= 3
+
+    again = [SimpleNamespace(pk=2, recall_count=5, next_recall=base)]
+    place_on_least_loaded_day(again, [None], dict(load), now)
+    assert abs((again[0].next_recall - base).days) <= 3
+
+
+@pytest.mark.django_db
+class TestBoxFuzz:
+    """Tests for load smoothing on boxes with fuzz enabled."""
+
+    def test_disabled_by_default(self, card):
+        """Test intervals stay exact unless the box enables fuzz."""
+        card.recall_count = 5
+        card.record_recall(remembered=True)
+        assert (
+            abs((card.next_recall - card.last_recall).total_seconds() - 18 * 86400) < 1
+        )
+
+    def test_cards_reviewed_together_are_spread(self, box):
+        """Test a batch of identical cards no longer lands on one day."""
+        box.fuzz = True
+        box.save()
+        Card.objects.bulk_create(
+            Card(source_text=f"w{i}", target_text="t", box=box, recall_count=5)
+            for i in range(20)
+        )
+        cards = list(Card.objects.filter(box=box).select_related("box__user"))
+
+        Card.objects.record_recalls(cards, [True] * len(cards))
+
+        days = {card.next_recall.date() for card in Card.objects.filter(box=box)}
+        assert len(days) > 1
+        # Every card stays within its fuzz window around the 18-day interval
+        now = timezone.now()
+        assert all(15 <= (day - now.date()).days <= 21 for day in days)
+
+    def test_load_is_read_from_cache(self, box, card):
+        """Test only the first placement runs the aggregate query."""
+        box.fuzz = True
+        box.save()
+        card.recall_count = 5
+        card.save()
+
+        card.record_recall(remembered=True)
+        assert cache.get(DueLoad.cache_key(box.user_id))
+
+        with CaptureQueriesContext(connection) as queries:
+            card.record_recall(remembered=True)
+        assert not any("GROUP BY" in q["sql"] for q in queries.captured_queries)
+
+    def test_days_are_counted_in_the_current_time_zone(self, box, card):
+        """Test the aggregate and the placement put a card on the same day."""
+        now = timezone.now()
+        due = (now + timedelta(days=5)).replace(hour=2, minute=0)
+        Card.objects.filter(pk=card.pk).update(next_recall=due)
+
+        with timezone.override("America/New_York"):
+            load = DueLoad.get(box.user_id)
+            card = SimpleNamespace(pk=card.pk, recall_count=0, next_recall=due)
+            # A one-day interval is not fuzzed, so the card keeps its day
+            place_on_least_loaded_day([card], [due], load, due - timedelta(days=1))
+
+            assert load == {day_ordinal(due): 1}
+            assert day_ordinal(due) == due.toordinal() - 1
+
+    def test_card_changes_drop_the_cached_load(self, authenticated_client, box, card):
+        """Test creating and deleting cards invalidates the cached due counts."""
+        key = DueLoad.cache_key(box.user_id)
+        cache.set(key, {})
+
+        response = authenticated_client.post(
+            reverse("card-list"),
+            {"source_text": "New", "target_text": "Nuevo", "box_id": box.id},
+        )
+        assert response.status_code == 201
+        assert cache.get(key) is None
+
+        cache.set(key, {})
+        response = authenticated_client.delete(
+            reverse("card-detail", kwargs={"pk": card.pk})
+        )
+        assert response.status_code == 204
+        assert cache.get(key) is None
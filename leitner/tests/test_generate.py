@@ -0,0 +1,134 @@
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from ai.schemas import TopicCard, TopicGenerationResponse
+from leitner.fuzz import DueLoad
+from leitner.models import Card, DueQueue
+
+
+def topic_response(*pairs):
+    return TopicGenerationResponse(
+        cards=[TopicCard(front=front, back=back) for front, back in pairs]
+    )
+
+
+@pytest.mark.django_db
+class TestBoxGenerate:
+    """Tests for generating topic cards straight into a box."""
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_cards_are_created(self, mock_generate, authenticated_client, box):
+        mock_generate.return_value = topic_response(
+            ("apple", "manzana"), ("bread", "pan")
+        )
+
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+        response = authenticated_client.post(url, {"topic": "Food", "count": 2})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        cards = Card.objects.filter(box=box).order_by("id")
+        assert response.data["created"] == [card.id for card in cards]
+        assert response.data["skipped"] == []
+        assert response.data["duplicates"]["duplicate_rate"] == {
+            "before": 0.0,
+            "after": 0.0,
+        }
+        assert [(card.source_text, card.target_text) for card in cards] == [
+            ("apple", "manzana"),
+            ("bread", "pan"),
+        ]
+        mock_generate.assert_called_once_with("Food", "en", "es", 2, [])
+
+    @patch("ai.usecases.generate_topic_usecase.generate")
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_existing_and_duplicate_cards_are_skipped(
+        self, mock_generate, mock_top_up, authenticated_client, box, card
+    ):
+        mock_generate.return_value = topic_response(
+            (" hello ", "hola"),
+            ("apple", "manzana"),
+            ("Apple", "manzana"),
+            ("bread", None),
+        )
+        mock_top_up.return_value = topic_response(("cheese", "queso"))
+
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+        response = authenticated_client.post(url, {"topic": "Food"})
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["skipped"] == ["bread"]
+        assert response.data["duplicates"] == {
+            "generated": 5,
+            "duplicates": 1,
+            "top_up_calls": 1,
+            "duplicate_rate": {"before": 0.2, "after": 0.0},
+        }
+        assert list(
+            Card.objects.filter(box=box)
+            .order_by("id")
+            .values_list("source_text", flat=True)
+        ) == ["Hello", "apple", "cheese"]
+        mock_generate.assert_called_once_with("Food", "en", "es", 20, ["hello"])
+        assert mock_top_up.call_args.kwargs["count"] == 18
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_cards_are_one_insert(self, mock_generate, authenticated_client, box):
+        mock_generate.return_value = topic_response(
+            *((f"word {i}", f"palabra {i}") for i in range(30))
+        )
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            authenticated_client.post(url, {"topic": "Food", "count": 30})
+
+        inserts = [
+            q for q in queries if q["sql"].startswith('INSERT INTO "leitner_card"')
+        ]
+        assert len(inserts) == 1
+        assert Card.objects.filter(box=box).count() == 30
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_new_cards_join_the_due_queue(
+        self, mock_generate, authenticated_client, box, settings
+    ):
+        settings.DUE_QUEUE_ENABLED = True
+        mock_generate.return_value = topic_response(("apple", "manzana"))
+
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+        authenticated_client.post(url, {"topic": "Food", "count": 1})
+
+        assert DueQueue.objects.filter(card__box=box).count() == 1
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_new_cards_drop_the_cached_due_load(
+        self, mock_generate, authenticated_client, box
+    ):
+        mock_generate.return_value = topic_response(("apple", "manzana"))
+        cache.set(DueLoad.cache_key(box.user_id), {})
+
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+        authenticated_client.post(url, {"topic": "Food", "count": 1})
+
+        assert cache.get(DueLoad.cache_key(box.user_id)) is None
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_other_users_box(self, mock_generate, authenticated_client, other_box):
+        url = reverse("box-generate", kwargs={"pk": other_box.pk})
+        response = authenticated_client.post(url, {"topic": "Food"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        mock_generate.assert_not_called()
+
+    @patch("ai.usecases.generate_topic_usecase.generate_many")
+    def test_invalid_count(self, mock_generate, authenticated_client, box):
+        url = reverse("box-generate", kwargs={"pk": box.pk})
+        response = authenticated_client.post(url, {"topic": "Food", "count": 500})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        mock_generate.assert_not_called()
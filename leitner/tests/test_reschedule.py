@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from leitner.models import Card
+
+
+@pytest.fixture
+def overdue_cards(box):
+    """Creates ten cards that have been due for two weeks."""
+    past = timezone.now() - timedelta(days=14)
+    return Card.objects.bulk_create(
+        Card(
+            source_text=f"word {i}",
+            target_text=f"palabra {i}",
+            box=box,
+            next_recall=past,
+        )
+        for i in range(10)
+    )
+
+
+@pytest.mark.django_db
+class TestCardQuerySetReschedule:
+    """Tests for the set-based rescheduling helpers."""
+
+    def test_shift_due(self, box, overdue_cards, not_due_card):
+        """Test shifting moves only overdue cards, in one statement."""
+        with CaptureQueriesContext(connection) as queries:
+            rescheduled = Card.objects.filter(box=box).reschedule_overdue("shift", 20)
+
+        assert rescheduled == len(overdue_cards)
+        assert sum("UPDATE" in q["sql"] for q in queries.captured_queries) == 1
+        for card in Card.objects.filter(pk__in=[c.pk for c in overdue_cards]):
+            assert card.next_recall > timezone.now() + timedelta(days=5)
+        not_due_card_before = not_due_card.next_recall
+        not_due_card.refresh_from_db()
+        assert not_due_card.next_recall == not_due_card_before
+
+    def test_shift_moves_long_overdue_cards_past_now(self, box, overdue_cards):
+        """Test cards overdue for longer than the shift are no longer due."""
+        now = timezone.now()
+        Card.objects.filter(box=box).reschedule_overdue("shift", 7)
+
+        assert not Card.objects.filter(box=box).overdue().exists()
+        for card in Card.objects.filter(box=box):
+            assert card.next_recall - now >= timedelta(days=7)
+
+    def test_spread_due(self, box, overdue_cards):
+        """Test spreading distributes overdue cards evenly over the next days."""
+        now = timezone.now()
+        rescheduled = Card.objects.filter(box=box).reschedule_overdue("spread", 5)
+
+        assert rescheduled == len(overdue_cards)
+        days = [(card.next_recall - now).days for card in Card.objects.filter(box=box)]
+        assert all(0 <= day < 5 for day in days)
+        assert sorted(days.count(day) for day in range(5)) == [2, 2, 2, 2, 2]
+
+
+@pytest.mark.django_db
+class TestRescheduleViews:
+    """Tests for the reschedule endpoints."""
+
+    def test_box_reschedule(self, authenticated_client, box, overdue_cards):
+        """Test rescheduling the overdue cards of a box."""
+        url = reverse("box-reschedule", kwargs={"pk": box.pk})
+        response = authenticated_client.post(url, {"mode": "spread", "days": 7})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"rescheduled": len(overdue_cards)}
+        assert (
+            not Card.objects.filter(box=box)
+            .overdue(timezone.now() - timedelta(days=1))
+            .exists()
+        )
+
+    def test_box_reschedule_invalid(self, authenticated_client, box):
+        """Test invalid modes are rejected."""
+        url = reverse("box-reschedule", kwargs={"pk": box.pk})
+        response = authenticated_client.post(url, {"mode": "sideways", "days": 7})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_account_reschedule_only_touches_own_cards(
+        self, authenticated_client, overdue_cards, other_box
+    ):
+        """Test the account-wide variant leaves other users' cards alone."""
+        past = timezone.now() - timedelta(days=3)
+        foreign_card = Card.objects.create(
+            source_text="Other", target_text="Otro", box=other_box, next_recall=past
+        )
+        url = reverse("card-reschedule")
+        response = authenticated_client.post(url, {"mode": "shift", "days": 14})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data == {"rescheduled": len(overdue_cards)}
+        foreign_card.refresh_from_db()
+        assert foreign_card.next_recall == past
@@ -0,0 +1,129 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from leitner.constants import RECALL_INTERVALS
+from leitner.models import Card, Review
+from leitner.retention import RETENTION_TARGET, fit_factors, fit_retention
+
+
+def simulate_reviews(factor, size, seed=0):
+    """Draw review outcomes for a learner whose true factor is ``factor``."""
+    rng = np.random.default_rng(seed)
+    ratios = rng.uniform(0.5, 3.0, size)
+    remembered = rng.random(size) < RETENTION_TARGET ** (ratios / factor)
+    return ratios, remembered
+
+
+class TestFitFactors:
+    """Tests for the vectorized factor fit."""
+
+    def test_recovers_factor_per_group(self):
+        """Test strong and weak learners are told apart in one call."""
+        strong_ratios, strong_remembered = simulate_reviews(2.0, 4000, seed=1)
+        weak_ratios, weak_remembered = simulate_reviews(0.5, 4000, seed=2)
+        groups = np.repeat([0, 1], 4000)
+
+        factors, counts = fit_factors(
+            groups,
+            np.concatenate([strong_ratios, weak_ratios]),
+            np.concatenate([strong_remembered, weak_remembered]),
+            n_groups=2,
+        )
+
+        assert counts.tolist() == [4000, 4000]
+        assert factors[0] == pytest.approx(2.0, rel=0.2)
+        assert factors[1] == pytest.approx(0.5, rel=0.2)
+
+    def test_prior_keeps_sparse_groups_near_one(self):
+        """Test a handful of reviews barely moves the factor."""
+        factors, _ = fit_factors(
+            np.zeros(3, dtype=np.int64),
+            np.array([1.0, 1.0, 1.0]),
+            np.array([True, True, True]),
+            n_groups=1,
+        )
+        assert 1.0 <= factors[0] < 1.5
+
+
+@pytest.mark.django_db
+class TestFitRetention:
+    """Tests for the retention fitting job."""
+
+    def test_fit_updates_user_and_pair(self, card, test_user):
+        """Test the job stores user-wide and per-pair factors."""
+        ratios, remembered = simulate_reviews(2.0, 300)
+        Review.objects.bulk_create(
+            Review(
+                card=card,
+                user=test_user,
+                remembered=bool(outcome),
+                elapsed_days=float(ratio) * 10,
+                interval_days=10.0,
+            )
+            for ratio, outcome in zip(ratios, remembered)
+        )
+
+        assert fit_retention(chunk_size=1) == 1
+
+        test_user.refresh_from_db()
+        pair = f"{card.box.source_language_id}-{card.box.target_language_id}"
+        assert test_user.retention_factor > 1.3
+        assert test_user.retention_factors[pair] == test_user.retention_factor
+        assert test_user.retention_fitted_at is not None
+
+        # Nothing new to fit on the next run
+        assert fit_retention() == 0
+
+    def test_command(self, card, test_user):
+        """Test the management command runs the job."""
+        Review.objects.create(
+            card=card,
+            user=test_user,
+            remembered=True,
+            elapsed_days=1.0,
+            interval_days=1.0,
+        )
+        call_command("fit_retention", "--chunk-size", "10")
+
+        test_user.refresh_from_db()
+        assert test_user.retention_fitted_at is not None
+        # Too few reviews to move away from the default
+        assert test_user.retention_factor == 1.0
+
+
+@pytest.mark.django_db
+class TestRecallScaling:
+    """Tests for applying retention factors when recording recalls."""
+
+    def test_record_recall_scales_interval(self, card, test_user):
+        """Test the next interval is multiplied by the pair factor."""
+        pair = f"{card.box.source_language_id}-{card.box.target_language_id}"
+        test_user.retention_factors = {pair: 2.0}
+        test_user.save()
+
+        card.record_recall(remembered=True)
+
+        expected = card.last_recall + timedelta(days=2 * RECALL_INTERVALS[1])
+        assert abs((card.next_recall - expected).total_seconds()) < 1
+        # The nominal interval is kept unscaled
+        assert card.stability == RECALL_INTERVALS[1]
+
+    def test_record_recall_logs_review(self, card):
+        """Test every recall is kept as review history."""
+        card.record_recall(remembered=True)
+        first = Review.objects.get(card=card)
+        assert first.elapsed_days is None
+
+        card.last_recall = timezone.now() - timedelta(days=3)
+        card.save()
+        card.record_recall(remembered=False)
+
+        latest = Review.objects.filter(card=card).latest("id")
+        assert latest.remembered is False
+        assert latest.elapsed_days == pytest.approx(3, abs=0.01)
+        assert latest.interval_days == RECALL_INTERVALS[1]
+        assert Card.objects.get(pk=card.pk).recall_count == 0
@@ -0,0 +1,190 @@
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from leitner.constants import RECALL_INTERVALS
+from leitner.models import Card
+from leitner.schedulers import (
+    FSRSScheduler,
+    LeitnerScheduler,
+    SchedulingState,
+    SM2Scheduler,
+    get_scheduler,
+)
+
+
+def make_state(recall_count, ease=2.5, stability=0.0, difficulty=5.0):
+    """Build a SchedulingState with broadcast defaults."""
+    recall_count = np.asarray(recall_count, dtype=np.int64)
+    size = len(recall_count)
+    return SchedulingState(
+        recall_count=recall_count,
+        ease=np.full(size, ease, dtype=np.float64),
+        stability=np.broadcast_to(np.asarray(stability, dtype=np.float64), size).copy(),
+        difficulty=np.full(size, difficulty, dtype=np.float64),
+    )
+
+
+class TestLeitnerScheduler:
+    """Tests for the LeitnerScheduler."""
+
+    def test_batch_matches_ladder(self):
+        """Test remembered cards move up the ladder and forgotten ones reset."""
+        top = len(RECALL_INTERVALS) - 1
+        state = make_state([0, 3, top, 4])
+        remembered = np.array([True, True, True, False])
+
+        new_state, intervals = LeitnerScheduler().schedule(
+            state, remembered, np.zeros(4)
+        )
+
+        assert new_state.recall_count.tolist() == [1, 4, top, 0]
+        assert intervals.tolist() == [
+            RECALL_INTERVALS[1],
+            RECALL_INTERVALS[4],
+            RECALL_INTERVALS[top],
+            RECALL_INTERVALS[0],
+        ]
+        assert new_state.stability.tolist() == intervals.tolist()
+
+
+class TestSM2Scheduler:
+    """Tests for the SM2Scheduler."""
+
+    def test_interval_sequence(self):
+        """Test the 1, 6, previous * ease interval sequence."""
+        state = make_state([0, 1, 2], stability=[0.0, 1.0, 6.0])
+
+        new_state, intervals = SM2Scheduler().schedule(
+            state, np.ones(3, dtype=bool), np.zeros(3)
+        )
+
+        assert intervals.tolist() == [1.0, 6.0, 15.0]
+        assert new_state.recall_count.tolist() == [1, 2, 3]
+
+    def test_lapse_lowers_ease(self):
+        """Test a lapse resets repetitions and lowers ease down to the minimum."""
+        state = make_state([5, 5], stability=30.0)
+        state.ease = np.array([2.5, 1.35])
+
+        new_state, intervals = SM2Scheduler().schedule(
+            state, np.zeros(2, dtype=bool), np.full(2, 30.0)
+        )
+
+        assert new_state.recall_count.tolist() == [0, 0]
+        assert new_state.ease.tolist() == pytest.approx([2.3, 1.3])
+        assert intervals.tolist() == [1.0, 1.0]
+
+
+class TestFSRSScheduler:
+    """Tests for the FSRSScheduler."""
+
+    def test_new_cards_get_initial_stability(self):
+        """Test new cards start from the initial stability of their grade."""
+        scheduler = FSRSScheduler()
+        state = make_state([0, 0])
+
+        new_state, intervals = scheduler.schedule(
+            state, np.array([True, False]), np.zeros(2)
+        )
+
+        assert new_state.stability.tolist() == [
+            scheduler.weights[2],
+            scheduler.weights[0],
+        ]
+        # At 90% desired retention the interval equals the stability
+        assert intervals == pytest.approx(new_state.stability)
+
+    def test_success_grows_and_lapse_shrinks_stability(self):
+        """Test stability grows after a success and shrinks after a lapse."""
+        state = make_state([3, 3], stability=10.0)
+
+        new_state, _ = FSRSScheduler().schedule(
+            state, np.array([True, False]), np.full(2, 10.0)
+        )
+
+        assert new_state.stability[0] > 10.0
+        assert new_state.stability[1] < 10.0
+        assert new_state.difficulty[1] > new_state.difficulty[0]
+
+
+def test_get_scheduler_defaults_to_leitner():
+    """Test unknown or empty names fall back to the Leitner scheduler."""
+    assert isinstance(get_scheduler(None), LeitnerScheduler)
+    assert isinstance(get_scheduler("unknown"), LeitnerScheduler)
+    assert isinstance(get_scheduler("sm2"), SM2Scheduler)
+
+
+@pytest.mark.django_db
+class TestBoxScheduler:
+    """Tests for scheduling cards according to their box."""
+
+    def test_record_recall_uses_box_scheduler(self, card):
+        """Test record_recall uses the scheduler configured on the box."""
+        card.box.scheduler = "sm2"
+        card.box.save()
+        card.recall_count = 2
+        card.stability = 6.0
+        card.save()
+
+        card.record_recall(remembered=True)
+
+        assert card.recall_count == 3
+        assert card.stability == 15.0
+        expected_next_recall = card.last_recall + timedelta(days=15)
+        assert abs((card.next_recall - expected_next_recall).total_seconds()) < 1
+
+    def test_record_recalls_bulk(self, box):
+        """Test the manager reschedules many cards in one call."""
+        cards = [
+            Card.objects.create(source_text=f"w{i}", target_text=f"t{i}", box=box)
+            for i in range(4)
+        ]
+        cards = list(Card.objects.filter(box=box).select_related("box").order_by("id"))
+
+        Card.objects.record_recalls(cards, [True, False, True, False])
+
+        stored = list(Card.objects.filter(box=box).order_by("id"))
+        assert [c.recall_count for c in stored] == [1, 0, 1, 0]
+        assert all(c.last_recall is not None for c in stored)
+        assert all(c.next_recall > timezone.now() for c in stored)
+
+    def test_bulk_recall_view(self, authenticated_client, card, due_card):
+        """Test recording recalls for several cards through the API."""
+        url = reverse("card-bulk-recall")
+        data = {
+            "recalls": [
+                {"id": card.id, "remembered": True},
+                {"id": due_card.id, "remembered": False},
+            ]
+        }
+        response = authenticated_client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_200_OK
+        by_id = {item["id"]: item for item in response.data}
+        assert by_id[card.id]["recall_count"] == 1
+        assert by_id[due_card.id]["recall_count"] == 0
+
+    def test_bulk_recall_view_rejects_foreign_cards(
+        self, authenticated_client, card, other_box
+    ):
+        """Test cards of other users cannot be recalled."""
+        foreign_card = Card.objects.create(
+            source_text="Other", target_text="Otro", box=other_box
+        )
+        url = reverse("card-bulk-recall")
+        data = {
+            "recalls": [
+                {"id": card.id, "remembered": True},
+                {"id": foreign_card.id, "remembered": True},
+            ]
+        }
+        response = authenticated_client.post(url, data, format="json")
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        card.refresh_from_db()
+        assert card.recall_count == 0
@@ -4,16 +4,24 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
-from .models import CustomUser, Language, Box, Card
+from .models import CustomUser, Language, Box, Card, DueQueue
 from .serializers import (
     UserSerializer,
     LanguageSerializer,
     BoxSerializer,
+    BoxGenerateSerializer,
     CardSerializer,
     CardRecallSerializer,
+    CardBulkRecallSerializer,
+    CardBulkRecallItemSerializer,
+    RescheduleSerializer,
     CustomTokenObtainPairSerializer,
 )
 from .constants import SUPPORTED_LANGUAGES
+from .fuzz import DueLoad
+from ai import usage
+from ai.cache import normalize_text
+from ai.throttling import QuotaHeadersMixin
 
 
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -58,7 +66,7 @@ class LanguageViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class BoxViewSet(viewsets.ModelViewSet):
+class BoxViewSet(QuotaHeadersMixin, viewsets.ModelViewSet):
     queryset = Box.objects.all().order_by("id")
     serializer_class = BoxSerializer
     permission_classes = [IsAuthenticated]
@@ -73,12 +81,108 @@ class BoxViewSet(viewsets.ModelViewSet):
             return Box.objects.filter(user=user).order_by("id")
         return Box.objects.none()  # Return empty queryset for anonymous users
 
+    def get_serializer_class(self):
+        if self.action == "reschedule":
+            return RescheduleSerializer
+        if self.action == "generate":
+            return BoxGenerateSerializer
+        return BoxSerializer
+
     def perform_create(self, serializer):
         """
         Set the user to the current authenticated user when creating a box.
         """
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        DueLoad.invalidate(self.request.user.id)
+
+    @action(detail=True, methods=["post"])
+    def reschedule(self, request, pk=None):
+        """
+        Shift or spread all overdue cards of this box.
+
+        Uses a single UPDATE statement, so it stays cheap for very large boxes.
+        """
+        box = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        rescheduled = Card.objects.filter(box=box).reschedule_overdue(
+            **serializer.validated_data
+        )
+        DueLoad.invalidate(request.user.id)
+        DueQueue.objects.invalidate(request.user)
+        return Response({"rescheduled": rescheduled})
+
+    @action(detail=True, methods=["post"], quota_kind="topic")
+    def generate(self, request, pk=None):
+        """
+        Generate cards for a topic and add them to this box.
+
+        The topic cards are generated in the box's language pair; ``front``
+        becomes the card's source text and ``back`` its target text. The
+        box's words are loaded as one column and passed to the usecase, which
+        names the most recent ones in the prompt and leaves out cards the box
+        already has. Cards that came back twice or without a translation are
+        skipped, and the rest are inserted with one query. ``duplicates``
+        reports how many generated cards were already in the box.
+        """
+        from ai.usecases import generate_topic_usecase
+
+        box = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        existing = dict.fromkeys(
+            normalize_text(source_text)
+            for source_text in Card.objects.filter(box=box)
+            .order_by("-id")
+            .values_list("source_text", flat=True)
+        )
+        with usage.scope(request.user.id, "box-generate") as calls:
+            request.usage_calls = calls
+            response_model, duplicates = generate_topic_usecase.generate_excluding(
+                topic=serializer.validated_data["topic"],
+                source_language=box.source_language.code,
+                target_language=box.target_language.code,
+                count=serializer.validated_data["count"],
+                existing=list(existing),
+            )
+
+        generated = {}
+        skipped = []
+        for topic_card in response_model.cards:
+            key = normalize_text(topic_card.front)
+            if not topic_card.back or not key or key in generated:
+                skipped.append(topic_card.front)
+            else:
+                generated[key] = topic_card
+
+        cards = Card.objects.bulk_create(
+            [
+                Card(
+                    box=box,
+                    source_text=topic_card.front.strip(),
+                    target_text=topic_card.back.strip(),
+                )
+                for topic_card in generated.values()
+            ]
+        )
+        DueLoad.invalidate(request.user.id)
+        DueQueue.objects.sync(cards)
+        return Response(
+            {
+                "created": [card.id for card in cards],
+                "skipped": skipped,
+                "duplicates": duplicates,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
 
 class CardViewSet(viewsets.ModelViewSet):
     """
@@ -101,6 +205,10 @@ class CardViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action == "recall":
             return CardRecallSerializer
+        if self.action == "bulk_recall":
+            return CardBulkRecallSerializer
+        if self.action == "reschedule":
+            return RescheduleSerializer
         return CardSerializer
 
     def get_queryset(self):
@@ -121,7 +229,11 @@ class CardViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Card.objects.none()
 
-        queryset = Card.objects.filter(box__user=user).order_by("id")
+        queryset = (
+            Card.objects.filter(box__user=user)
+            .select_related("box__user")
+            .order_by("id")
+        )
 
         box_id = self.request.query_params.get("box", None)
         if box_id is not None:
@@ -129,7 +241,13 @@ class CardViewSet(viewsets.ModelViewSet):
 
         due_only = self.request.query_params.get("due_only", None)
         if due_only == "true":
-            queryset = queryset.filter(next_recall__lte=timezone.now())
+            now = timezone.now()
+            if DueQueue.objects.is_fresh(user):
+                # Read the candidates from the materialized queue
+                queryset = queryset.filter(
+                    due_entry__due_day__lte=timezone.localdate(now)
+                ).order_by("due_entry__due_day", "due_entry__priority", "id")
+            queryset = queryset.filter(next_recall__lte=now)
 
         # Only apply count limit for list action
         if self.action == "list":
@@ -144,6 +262,15 @@ class CardViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def perform_create(self, serializer):
+        card = serializer.save()
+        DueLoad.invalidate(self.request.user.id)
+        DueQueue.objects.sync([card])
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        DueLoad.invalidate(self.request.user.id)
+
     @action(detail=True, methods=["post"])
     def recall(self, request, pk=None):
         """
@@ -156,3 +283,53 @@ class CardViewSet(viewsets.ModelViewSet):
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=["post"])
+    def bulk_recall(self, request):
+        """
+        Record recall events for many cards at once.
+
+        All cards are rescheduled with one vectorized scheduler call per box
+        scheduler and saved with a single bulk update.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        remembered_by_id = {
+            item["id"]: item["remembered"]
+            for item in serializer.validated_data["recalls"]
+        }
+        cards = list(
+            Card.objects.filter(box__user=request.user, id__in=remembered_by_id)
+            .select_related("box__user")
+            .order_by("id")
+        )
+        if len(cards) != len(remembered_by_id):
+            return Response(
+                {"error": "One or more cards were not found."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        Card.objects.record_recalls(
+            cards, [remembered_by_id[card.id] for card in cards]
+        )
+        return Response(CardBulkRecallItemSerializer(cards, many=True).data)
+
+    @action(detail=False, methods=["post"])
+    def reschedule(self, request):
+        """
+        Shift or spread all overdue cards of the authenticated user.
+
+        Uses a single UPDATE statement across all of the user's boxes.
+        """
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        rescheduled = Card.objects.filter(box__user=request.user).reschedule_overdue(
+            **serializer.validated_data
+        )
+        DueLoad.invalidate(request.user.id)
+        DueQueue.objects.invalidate(request.user)
+        return Response({"rescheduled": rescheduled})
@@ -166,6 +166,10 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Configure Django to use our custom user model
 AUTH_USER_MODEL = "leitner.CustomUser"
 
+# Serve due_only card lists from the materialized due queue
+# (rebuilt nightly with `manage.py build_due_queue`)
+DUE_QUEUE_ENABLED = os.getenv("DUE_QUEUE_ENABLED", "False") == "True"
+
 # OpenAI API Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-nano")